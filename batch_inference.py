@@ -0,0 +1,208 @@
+# batch_inference.py
+
+import operator
+import queue
+import threading
+import time
+
+import numpy as np
+
+FEATURE_NAMES = [
+    "engine_load", "coolant_temp", "fuel_pressure", "intake_manifold_p",
+    "rpm", "speed", "timing_advance", "intake_air_temp", "air_flow_rate",
+    "throttle_pos", "engine_run_time", "fuel_level", "warmups_since_clear",
+    "barometric_p", "ambient_air_temp", "cmd_throttle_act",
+    "time_with_mil_on", "time_since_codes", "hybrid_batt_life", "fuel_rate"
+]
+
+_END = object()
+
+
+def load_interpreter(model_path=None, model_content=None):
+    """
+    TFLite interpreter for a .tflite file or flatbuffer bytes, from
+    `tflite_runtime` when that is installed (the Pi image) and from full
+    TensorFlow otherwise.
+    """
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    interpreter = Interpreter(model_path=model_path, model_content=model_content)
+    interpreter.allocate_tensors()
+    return interpreter
+
+
+class ArrayScaler:
+    """`StandardScaler.transform` from saved mean/scale arrays, without sklearn."""
+
+    def __init__(self, mean, scale):
+        self.mean_  = np.asarray(mean, dtype=np.float64)
+        self.scale_ = np.asarray(scale, dtype=np.float64)
+
+    def transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.mean_) / self.scale_
+
+
+_FEATURES = operator.itemgetter(*FEATURE_NAMES)
+
+
+def readings_to_matrix(readings):
+    """Stack a list of reading dicts into an (n, 20) float32 feature matrix."""
+    return np.array(list(map(_FEATURES, readings)), dtype=np.float32).reshape(-1, len(FEATURE_NAMES))
+
+
+def top_faults(probs, fault_codes):
+    """Most likely fault and its probability for each row of `probs`."""
+    idx  = probs.argmax(axis=1)
+    conf = probs[np.arange(len(idx)), idx]
+    return [(fault_codes[i], c) for i, c in zip(idx.tolist(), conf.tolist())]
+
+
+class BatchPredictor:
+    """
+    Runs the TFLite fault classifier over many readings per `invoke()`.
+
+    The input tensor is resized to a power-of-two bucket (capped at
+    `max_batch_size`) and short batches are zero-padded. Given
+    `make_interpreter`, each bucket gets its own interpreter, allocated once
+    when that size is first seen, so alternating batch sizes never
+    re-allocate; without it the one interpreter is resized on every bucket
+    change. Integer-quantized models (int8 in/out) are fed and read through
+    the tensors' scale and zero point, so callers always see float
+    probabilities.
+    """
+
+    def __init__(self, interpreter, scaler, fault_codes, max_batch_size=64, make_interpreter=None):
+        self.interpreter    = interpreter
+        self.scaler         = scaler
+        self.fault_codes    = list(fault_codes)
+        self.max_batch_size = max_batch_size
+
+        self._make   = make_interpreter
+        self._input  = interpreter.get_input_details()[0]
+        self._output = interpreter.get_output_details()[0]
+        self._rows   = int(self._input["shape"][0])
+        self._by_rows = {self._rows: (interpreter, self._input, self._output)}
+
+    def _bucket(self, n):
+        size = 1
+        while size < n:
+            size *= 2
+        return min(size, self.max_batch_size)
+
+    def _resize(self, rows):
+        if rows == self._rows:
+            return
+        if rows in self._by_rows:
+            self.interpreter, self._input, self._output = self._by_rows[rows]
+            self._rows = rows
+            return
+        if self._make is not None:
+            self.interpreter = self._make()
+        self.interpreter.resize_tensor_input(
+            self._input["index"], [rows, len(FEATURE_NAMES)]
+        )
+        self.interpreter.allocate_tensors()
+        self._input  = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._rows   = rows
+        if self._make is not None:
+            self._by_rows[rows] = (self.interpreter, self._input, self._output)
+        else:
+            self._by_rows = {rows: (self.interpreter, self._input, self._output)}
+
+    def _quantize(self, x):
+        """Map float inputs onto an integer input tensor (int8 models)."""
+        dtype = self._input["dtype"]
+        if dtype == np.float32:
+            return x
+        scale, zero = self._input["quantization"]
+        info = np.iinfo(dtype)
+        return np.clip(np.round(x / scale + zero), info.min, info.max).astype(dtype)
+
+    def _dequantize(self, y):
+        if self._output["dtype"] == np.float32:
+            return y
+        scale, zero = self._output["quantization"]
+        return (y.astype(np.float32) - zero) * scale
+
+    def predict_scaled(self, x_scaled):
+        """Return the (n, num_classes) probability matrix for scaled inputs."""
+        n = len(x_scaled)
+        out = np.empty((n, len(self.fault_codes)), dtype=np.float32)
+        for start in range(0, n, self.max_batch_size):
+            chunk = x_scaled[start:start + self.max_batch_size]
+            count = len(chunk)
+            rows  = self._bucket(count)
+            self._resize(rows)
+            if count < rows:
+                pad = np.zeros((rows - count, chunk.shape[1]), dtype=np.float32)
+                chunk = np.vstack([chunk, pad])
+            self.interpreter.set_tensor(self._input["index"], self._quantize(chunk))
+            self.interpreter.invoke()
+            probs = self.interpreter.get_tensor(self._output["index"])
+            out[start:start + count] = self._dequantize(probs[:count])
+        return out
+
+    def predict_matrix(self, X):
+        """Classify an (n, 20) raw feature matrix, returning `(fault, confidence)` rows."""
+        if not len(X):
+            return []
+        return top_faults(self.predict_scaled(self.scaler.transform(X).astype(np.float32)), self.fault_codes)
+
+    def predict(self, readings):
+        """Classify a list of readings, returning `(fault, confidence)` in order."""
+        if not readings:
+            return []
+        return self.predict_matrix(readings_to_matrix(readings))
+
+
+def micro_batches(readings, max_batch_size=64, max_wait_s=0.5, queue_size=1024):
+    """
+    Group an iterable of readings into lists of up to `max_batch_size`.
+
+    A batch is emitted as soon as it is full or `max_wait_s` has passed since
+    its first reading arrived, whichever comes first. The source iterable is
+    drained on a background thread so a slow producer never holds back a
+    batch that has already hit its deadline.
+    """
+    q = queue.Queue(maxsize=queue_size)
+
+    def _pump():
+        try:
+            for r in readings:
+                q.put(r)
+        except BaseException as e:  # re-raised on the consumer side
+            q.put(e)
+        q.put(_END)
+
+    threading.Thread(target=_pump, name="micro-batch-source", daemon=True).start()
+
+    done = False
+    while not done:
+        item = q.get()
+        if item is _END:
+            return
+        if isinstance(item, BaseException):
+            raise item
+
+        batch    = [item]
+        deadline = time.monotonic() + max_wait_s
+        while len(batch) < max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = q.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _END:
+                done = True
+                break
+            if isinstance(item, BaseException):
+                yield batch
+                raise item
+            batch.append(item)
+        yield batch
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Per-row `car_data` inserts vs the store's bulk sync (`SupabaseSync`),
+against the local PostgREST stand-in (no real Supabase traffic). The sync
+upserts on `unique_id` as main.py does, and a replayed batch must not add
+rows.
+
+    python bench_bulk_writer.py --n 2000 --latency-ms 20 --batch-size 200
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from supabase import create_client
+
+from bulk_writer import supabase_insert, supabase_upsert
+from reading_store import ReadingStore, SupabaseSync
+from standins import PostgRESTStandIn
+
+
+def make_row(i):
+    return {
+        "timestamp":   "2025-01-01 00:00:00",
+        "fault":       "none",
+        "confidence":  0.9,
+        "sensor_data": {"rpm": 2000 + i},
+        "unique_id":   str(i),
+        "ipfs_link":   f"https://gateway.pinata.cloud/ipfs/cid{i}",
+    }
+
+
+def to_remote(row):
+    return {k: row[k] for k in ("timestamp", "fault", "confidence", "sensor_data", "unique_id", "ipfs_link")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk Supabase sync against a PostgREST stand-in")
+    parser.add_argument("--n",          type=int,   default=2000)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Stand-in latency per request")
+    parser.add_argument("--batch-size", type=int,   default=200)
+    args = parser.parse_args()
+
+    with PostgRESTStandIn(latency_s=args.latency_ms / 1000) as standin, tempfile.TemporaryDirectory() as tmp:
+        client = create_client(standin.url, "local-key")
+
+        t0 = time.perf_counter()
+        for i in range(args.n):
+            client.table("car_data").insert(make_row(i)).execute()
+        single_s = time.perf_counter() - t0
+        print(f"per-row inserts: {args.n / single_s:8.0f} rows/s  ({standin.requests} requests)")
+
+        standin.tables.clear()
+        standin.requests = 0
+        store = ReadingStore(os.path.join(tmp, "bench.db"), aggregates=False)
+        upsert = supabase_upsert(client, "car_data", on_conflict="unique_id")
+        sync   = SupabaseSync(store, {"readings": upsert},
+                             to_remote=to_remote, batch_size=args.batch_size)
+        t0 = time.perf_counter()
+        store.add_readings([dict(make_row(i), vin="BENCHVIN") for i in range(args.n)])
+        sync.drain()
+        bulk_s = time.perf_counter() - t0
+        print(f"store + sync:    {args.n / bulk_s:8.0f} rows/s  ({standin.requests} requests)")
+
+        stored = len(standin.tables.get("car_data", []))
+        assert stored == args.n, f"stand-in holds {stored} rows, expected {args.n}"
+        upsert([to_remote(make_row(i)) for i in range(args.batch_size)])
+        stored = len(standin.tables["car_data"])
+        assert stored == args.n, f"replayed batch duplicated rows: {stored}, expected {args.n}"
+        print("stats:", sync.stats())
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
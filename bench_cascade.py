@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tune the rule-first cascade: fast-path share, agreement with the model and
+throughput for a range of margins.
+
+    python bench_cascade.py --csv training_data.csv --margins 0 0.5 1 2 4
+
+Checks first that every reading the rules decide at margin 0 gets the label
+the generator's thresholds would give it (on naturally labelled synthetic
+data). Then, for each margin scale, it reports:
+
+    fast %       share of readings answered by the rules alone
+    agree %      rule verdict == model prediction, on those readings
+    acc fast     rule accuracy against the CSV labels, on those readings
+    acc cascade  end-to-end accuracy (model-only accuracy printed once)
+    readings/s   cascade throughput at --batch-size
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from batch_inference import FEATURE_NAMES, readings_to_matrix
+from cascade import VERDICTS, CascadeClassifier, rule_labels
+from generate_fake_training_data import LABELS, generate_chunk
+from model_registry import load_version
+
+
+def check_rule_parity(n=200_000, seed=7):
+    cols, labels = generate_chunk(seed, 0, n, chunk_size=n, balance_labels=False)
+    X       = np.column_stack([cols[c] for c in FEATURE_NAMES])
+    verdict = rule_labels(X, margin_scale=0.0)
+    decided = verdict != -2
+    ok      = bool((VERDICTS[verdict[decided] + 1] == np.array(LABELS)[labels[decided]]).all())
+    print(f"{'✅' if ok else '❌'} rule parity with generator thresholds: "
+          f"{decided.mean():.2%} of {n} rows decided at margin 0")
+    return ok
+
+
+def throughput(classify, readings, batch_size, repeats=3):
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for start in range(0, len(readings), batch_size):
+            classify(readings[start:start + batch_size])
+        best = min(best, time.perf_counter() - t0)
+    return len(readings) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rule-first cascade: share, agreement, throughput")
+    parser.add_argument("--csv", default="training_data.csv")
+    parser.add_argument("--run", default="run_1", help="Run under logs/fit to use as the model")
+    parser.add_argument("--backend", choices=["tflite", "numpy"], default="tflite")
+    parser.add_argument("--margins", type=float, nargs="+", default=[0.0, 0.5, 1.0, 2.0, 4.0])
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    ok = check_rule_parity()
+
+    model    = load_version("logs/fit", args.run, args.backend, max_batch_size=args.batch_size).predictor
+    df       = pd.read_csv(args.csv)
+    readings = df[FEATURE_NAMES].to_dict("records")
+    truth    = df["fault_code"].to_numpy()
+
+    model_faults = np.array([f for f, _ in model.predict(readings)])
+    model_rate   = throughput(model.predict, readings, args.batch_size)
+    print(f"\nmodel only: accuracy {np.mean(model_faults == truth):.4f}, {model_rate:,.0f} readings/s\n")
+
+    print(f"{'margin':>6} {'fast %':>7} {'agree %':>8} {'acc fast':>9} {'acc cascade':>12} {'readings/s':>11} {'speedup':>8}")
+    X = readings_to_matrix(readings)
+    for scale in args.margins:
+        verdict = rule_labels(X, scale)
+        fast    = verdict != -2
+        rule_f  = VERDICTS[verdict + 1]
+        cascade = CascadeClassifier(model, margin_scale=scale, audit_rate=0.0)
+        faults  = np.array([f for f, _ in cascade.predict(readings)])
+        rate    = throughput(cascade.predict, readings, args.batch_size)
+        agree   = np.mean(rule_f[fast] == model_faults[fast]) if fast.any() else float("nan")
+        acc     = np.mean(rule_f[fast] == truth[fast]) if fast.any() else float("nan")
+        print(f"{scale:6.2f} {fast.mean():7.2%} {agree:8.2%} {acc:9.4f} "
+              f"{np.mean(faults == truth):12.4f} {rate:11,.0f} {rate / model_rate:8.2f}")
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
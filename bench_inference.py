@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark: single-row TFLite path (as in the original main.py loop)
+versus the micro-batched BatchPredictor.
+
+    python bench_inference.py --n 5000 --batch-sizes 1 8 32 64 128
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from batch_inference import FEATURE_NAMES, BatchPredictor
+from model_bundle import ModelBundle
+from simulate_obd import generate_reading
+
+BUNDLE_PATH = "logs/fit/run_1/model.bundle"
+
+
+def make_readings(n, num_vins=200, seed=0):
+    random.seed(seed)
+    vins = [f"BENCHVIN{i:09d}" for i in range(num_vins)]
+    readings = []
+    for i in range(n):
+        r = generate_reading()
+        r["vin"] = vins[i % num_vins]
+        readings.append(r)
+    return readings
+
+
+def run_single(interpreter, scaler, fault_codes, readings):
+    inp = interpreter.get_input_details()[0]
+    out = interpreter.get_output_details()[0]
+    results = []
+    for reading in readings:
+        arr = np.array([reading[n] for n in FEATURE_NAMES], dtype=np.float32)
+        x_scaled = scaler.transform(arr.reshape(1, -1)).astype(np.float32)
+        interpreter.set_tensor(inp["index"], x_scaled)
+        interpreter.invoke()
+        probs = interpreter.get_tensor(out["index"])[0]
+        idx = int(np.argmax(probs))
+        results.append((fault_codes[idx], float(probs[idx])))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched vs single-row inference")
+    parser.add_argument("--n", type=int, default=5000, help="Number of readings")
+    parser.add_argument("--vins", type=int, default=200, help="Distinct VINs in the stream")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 32, 64, 128])
+    args = parser.parse_args()
+
+    bundle      = ModelBundle(BUNDLE_PATH)
+    scaler      = bundle.scaler
+    fault_codes = bundle.fault_codes
+    readings    = make_readings(args.n, args.vins)
+
+    interpreter = bundle.interpreter()
+    run_single(interpreter, scaler, fault_codes, readings[:50])  # warm-up
+    t0 = time.perf_counter()
+    baseline = run_single(interpreter, scaler, fault_codes, readings)
+    single_s = time.perf_counter() - t0
+    single_rate = args.n / single_s
+
+    print(f"{'path':>14} {'readings/s':>12} {'speedup':>8} {'match':>7}")
+    print(f"{'single-row':>14} {single_rate:12.0f} {1.0:8.2f} {'-':>7}")
+
+    for bs in args.batch_sizes:
+        predictor = BatchPredictor(bundle.interpreter(), scaler, fault_codes, max_batch_size=bs)
+        predictor.predict(readings[:bs])  # warm-up / allocate bucket
+        t0 = time.perf_counter()
+        results = []
+        for start in range(0, args.n, bs):
+            results.extend(predictor.predict(readings[start:start + bs]))
+        batch_s = time.perf_counter() - t0
+        rate = args.n / batch_s
+        match = np.mean([a[0] == b[0] for a, b in zip(results, baseline)])
+        print(f"{'batch=' + str(bs):>14} {rate:12.0f} {rate / single_rate:8.2f} {match:7.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Scaling of the multi-process inference pool from 1 to N workers, against
+the in-process registry, on VIN-tagged readings from the fleet simulator.
+
+    python bench_inference_pool.py --max-workers 4 --batch-size 256 --seconds 20
+
+Every configuration scores the same batches; the pool's output is checked
+against the in-process predictor (same faults, confidences within 1e-5).
+Worker start-up (process spawn + model load) is reported separately and
+not counted in readings/s.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from fleet_sim import FleetSimulator
+from inference_pool import InferencePool
+from model_registry import load_version
+
+
+def same(a, b):
+    return [f for f, _ in a] == [f for f, _ in b] and np.allclose([c for _, c in a], [c for _, c in b], atol=1e-5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark InferencePool scaling")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch-size",  type=int, default=256)
+    parser.add_argument("--vehicles",    type=int, default=5000)
+    parser.add_argument("--seconds",     type=float, default=20.0, help="Simulated fleet time to score")
+    parser.add_argument("--in-flight",   type=int, default=4)
+    parser.add_argument("--backend",     choices=["tflite", "numpy"], default="tflite")
+    args = parser.parse_args()
+
+    sim      = FleetSimulator(args.vehicles, realtime=False, seed=11)
+    readings = [r for block in sim.blocks(args.seconds) for r in block.readings()]
+    batches  = [readings[i:i + args.batch_size] for i in range(0, len(readings), args.batch_size)]
+    print(f"{len(readings):,} readings from {args.vehicles} VINs in {len(batches)} batches "
+          f"of {args.batch_size}; {os.cpu_count()} CPUs\n")
+
+    model = load_version("logs/fit", "run_1", args.backend, max_batch_size=args.batch_size).predictor
+    t0    = time.perf_counter()
+    expected = [model.predict(b) for b in batches]
+    base  = len(readings) / (time.perf_counter() - t0)
+    print(f"{'workers':>7} {'startup s':>9} {'readings/s':>11} {'speedup':>8}  match")
+    print(f"{'in-proc':>7} {'-':>9} {base:11,.0f} {1.0:8.2f}  -")
+
+    for workers in range(1, args.max_workers + 1):
+        t0   = time.perf_counter()
+        pool = InferencePool(workers, in_flight=args.in_flight, max_rows=args.batch_size,
+                             base_dir="logs/fit", default_run="run_1", backend=args.backend,
+                             max_batch_size=args.batch_size, shadow_rate=0.0).start()
+        startup = time.perf_counter() - t0
+        try:
+            t0   = time.perf_counter()
+            out  = list(pool.imap(batches))
+            rate = len(readings) / (time.perf_counter() - t0)
+        finally:
+            pool.close()
+        ok = all(same(a, b) for a, b in zip(out, expected))
+        print(f"{workers:>7} {startup:9.1f} {rate:11,.0f} {rate / base:8.2f}  {'✅' if ok else '❌'}")
+
+
+if __name__ == "__main__":
+    main()
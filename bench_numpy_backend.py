@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Parity and cost check for the NumPy backend against the TFLite model.
+
+    python numpy_backend.py export          # once, writes model_folded.npz
+    python bench_numpy_backend.py --csv training_data.csv
+
+Parity: every row of the CSV is classified by both backends; the script
+exits non-zero if any predicted class differs or a probability drifts more
+than --atol. Latency is measured single-row and batched, and each backend's
+import + load time and peak RSS are taken in a fresh subprocess.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from batch_inference import FEATURE_NAMES
+
+BUNDLE_PATH = "logs/fit/run_1/model.bundle"
+FOLDED_PATH = "logs/fit/run_1/model_folded.npz"
+
+# Run in a clean interpreter so import cost and RSS are the backend's alone.
+_STARTUP_SNIPPETS = {
+    "tflite": f"""
+from model_bundle import ModelBundle
+p = ModelBundle({BUNDLE_PATH!r}).predictor()
+""",
+    "numpy": f"""
+from numpy_backend import NumpyPredictor
+p = NumpyPredictor.load({FOLDED_PATH!r})
+""",
+}
+_STARTUP_WRAPPER = """
+import json, resource, time
+t0 = time.perf_counter()
+{body}
+startup = time.perf_counter() - t0
+p.predict([dict(zip({names!r}, [0.0] * {n}))])
+try:  # VmHWM resets on exec; ru_maxrss on Linux carries over the parent's peak
+    rss_kb = int(next(l for l in open("/proc/self/status") if l.startswith("VmHWM")).split()[1])
+except (OSError, StopIteration):
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{"startup_s": startup, "max_rss_mb": rss_kb / 1024}}))
+"""
+
+
+def tflite_probs(bundle, X_scaled):
+    interp = bundle.interpreter()
+    inp = interp.get_input_details()[0]
+    interp.resize_tensor_input(inp["index"], list(X_scaled.shape))
+    interp.allocate_tensors()
+    interp.set_tensor(inp["index"], X_scaled.astype(np.float32))
+    interp.invoke()
+    return interp.get_tensor(interp.get_output_details()[0]["index"])
+
+
+def time_per_row(fn, readings, batch_size, repeats=3):
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for start in range(0, len(readings), batch_size):
+            fn(readings[start:start + batch_size])
+        best = min(best, time.perf_counter() - t0)
+    return best / len(readings) * 1e6
+
+
+def measure_startup(backend):
+    code = _STARTUP_WRAPPER.format(body=_STARTUP_SNIPPETS[backend],
+                                   names=FEATURE_NAMES, n=len(FEATURE_NAMES))
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NumPy backend parity + latency vs TFLite")
+    parser.add_argument("--csv", default="training_data.csv")
+    parser.add_argument("--atol", type=float, default=1e-4, help="Max allowed probability difference")
+    parser.add_argument("--latency-rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    from model_bundle import ModelBundle
+    from numpy_backend import NumpyPredictor
+
+    bundle      = ModelBundle(BUNDLE_PATH)
+    df          = pd.read_csv(args.csv)
+    X           = df[FEATURE_NAMES].to_numpy(dtype=np.float32)
+
+    # ─── Parity ──────────────────────────────────────────────────────────────
+    np_pred  = NumpyPredictor.load(FOLDED_PATH)
+    p_tflite = tflite_probs(bundle, bundle.scaler.transform(X))
+    p_numpy  = np_pred.predict_raw(X)
+    agree    = np.mean(p_tflite.argmax(1) == p_numpy.argmax(1))
+    max_diff = float(np.abs(p_tflite - p_numpy).max())
+    ok       = agree == 1.0 and max_diff <= args.atol
+    print(f"{'✅' if ok else '❌'} parity on {len(X)} rows: "
+          f"argmax agreement {agree:.4%}, max |Δp| {max_diff:.2e} (atol {args.atol:.0e})")
+
+    # ─── Latency ─────────────────────────────────────────────────────────────
+    readings = df[FEATURE_NAMES].head(args.latency_rows).to_dict("records")
+    tfl_pred = bundle.predictor(max_batch_size=64)
+    tfl_pred.predict(readings[:64])
+    np_pred.predict(readings[:64])
+
+    print(f"\n{'backend':>8} {'µs/row @1':>10} {'µs/row @64':>11} {'startup s':>10} {'peak RSS MB':>12}")
+    for name, pred in (("tflite", tfl_pred), ("numpy", np_pred)):
+        single  = time_per_row(pred.predict, readings, 1)
+        batched = time_per_row(pred.predict, readings, 64)
+        cost    = measure_startup(name)
+        print(f"{name:>8} {single:10.1f} {batched:11.1f} "
+              f"{cost['startup_s']:10.2f} {cost['max_rss_mb']:12.0f}")
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
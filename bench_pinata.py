@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Pinata upload throughput: the original one-`requests.post`-per-pin path
+versus PinataUploader (pooled Session, concurrent pins, local CID skip),
+against the local pinJSONToIPFS stand-in.
+
+    python bench_pinata.py --n 200 --latency-ms 100 --in-flight 8
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from pinata_uploader import PinataUploader
+from standins import PinataStandIn
+
+
+def make_doc(i):
+    return {"name": "2025 Honda Prologue", "attributes": [{"trait_type": "rpm", "value": 2000 + i}]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PinataUploader against a local stand-in")
+    parser.add_argument("--n",          type=int,   default=200)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--in-flight",  type=int,   default=8)
+    parser.add_argument("--fail-rate",  type=float, default=0.05, help="Injected 503 rate")
+    args = parser.parse_args()
+
+    docs = [make_doc(i) for i in range(args.n)]
+    with PinataStandIn(latency_s=args.latency_ms / 1000, fail_rate=args.fail_rate) as standin:
+        hdr = {"Content-Type": "application/json", "pinata_api_key": "k", "pinata_secret_api_key": "s"}
+        t0, ok = time.perf_counter(), 0
+        for i, doc in enumerate(docs):
+            payload = {"pinataOptions": {"cidVersion": 1}, "pinataMetadata": {"name": f"d{i}"},
+                       "pinataContent": doc}
+            resp = requests.post(f"{standin.url}/pinning/pinJSONToIPFS", data=json.dumps(payload), headers=hdr)
+            ok += resp.status_code == 200
+        base_s = time.perf_counter() - t0
+        print(f"requests.post per pin: {args.n / base_s:7.1f} pins/s  ok={ok}/{args.n}")
+
+        uploader = PinataUploader("k", "s", api_url=standin.url, max_in_flight=args.in_flight, backoff=0.05)
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(args.in_flight) as pool:
+            urls = list(pool.map(lambda p: uploader.pin_json(p[1], f"d{p[0]}"), enumerate(docs)))
+        pool_s = time.perf_counter() - t0
+        ok = sum(u is not None for u in urls)
+        print(f"PinataUploader:        {args.n / pool_s:7.1f} pins/s  ok={ok}/{args.n}")
+
+        t0 = time.perf_counter()
+        for i, doc in enumerate(docs):
+            uploader.pin_json(doc, f"d{i}")
+        print(f"re-pin (local CID hit): {args.n / (time.perf_counter() - t0):7.0f} pins/s")
+        print("stats:", uploader.stats)
+        uploader.close()
+
+
+if __name__ == "__main__":
+    main()
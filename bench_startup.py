@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Startup cost of the inference process, tracked over time.
+
+    python bench_startup.py                     # every backend / variant, 5 runs each
+    python bench_startup.py --runs 10 --no-record
+
+Each configuration is measured in fresh interpreters: `import main` (which
+should stay cheap — everything heavy is lazy) and the time from there to the
+first `predictor.predict()` result, plus which heavy modules that pulled in.
+Medians are appended as one JSON line to logs/bench/startup.jsonl together
+with the commit and host, and compared against the previous entry.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from batch_inference import FEATURE_NAMES
+
+HISTORY_PATH = "logs/bench/startup.jsonl"
+
+CONFIGS = {
+    "numpy":          {"INFERENCE_BACKEND": "numpy"},
+    "tflite-float32": {"INFERENCE_BACKEND": "tflite", "MODEL_VARIANT": "float32"},
+    "tflite-float16": {"INFERENCE_BACKEND": "tflite", "MODEL_VARIANT": "float16"},
+    "tflite-int8":    {"INFERENCE_BACKEND": "tflite", "MODEL_VARIANT": "int8"},
+}
+
+HEAVY_MODULES = ["tensorflow", "tflite_runtime", "sklearn", "joblib", "supabase", "requests"]
+
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+main.predictor.predict([dict(zip({names!r}, [0.0] * {n}))])
+t2 = time.perf_counter()
+print(json.dumps({{
+    "import_s":           t1 - t0,
+    "first_prediction_s": t2 - t1,
+    "heavy_modules":      [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def probe(env_overrides):
+    """One fresh-process measurement for a configuration."""
+    code = _PROBE.format(names=FEATURE_NAMES, n=len(FEATURE_NAMES), heavy=HEAVY_MODULES)
+    env  = {**os.environ, "TF_CPP_MIN_LOG_LEVEL": "3", **env_overrides}
+    out  = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, env=env)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure(env_overrides, runs):
+    samples = [probe(env_overrides) for _ in range(runs)]
+    import_s = statistics.median(s["import_s"] for s in samples)
+    first_s  = statistics.median(s["first_prediction_s"] for s in samples)
+    return {
+        "import_ms":           round(import_s * 1e3, 1),
+        "first_prediction_ms": round(first_s * 1e3, 1),
+        "total_ms":            round((import_s + first_s) * 1e3, 1),
+        "heavy_modules":       samples[-1]["heavy_modules"],
+        "runs":                runs,
+    }
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def last_entry(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        lines = [l for l in f if l.strip()]
+    return json.loads(lines[-1]) if lines else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time and time-to-first-prediction for main.py")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per configuration (median reported)")
+    parser.add_argument("--configs", nargs="+", default=list(CONFIGS), choices=list(CONFIGS))
+    parser.add_argument("--history", default=HISTORY_PATH)
+    parser.add_argument("--no-record", action="store_true", help="Don't append to the history file")
+    args = parser.parse_args()
+
+    previous = last_entry(args.history)
+    results  = {}
+    print(f"{'config':>15} {'import ms':>10} {'first pred ms':>14} {'total ms':>9} {'Δ total':>9}  heavy modules")
+    for name in args.configs:
+        r = results[name] = measure(CONFIGS[name], args.runs)
+        before = (previous or {}).get("results", {}).get(name)
+        delta  = f"{r['total_ms'] - before['total_ms']:+9.1f}" if before else f"{'-':>9}"
+        print(f"{name:>15} {r['import_ms']:10.1f} {r['first_prediction_ms']:14.1f} {r['total_ms']:9.1f} {delta}  "
+              f"{', '.join(r['heavy_modules']) or '-'}")
+    if previous:
+        print(f"\nΔ vs {previous['timestamp']} ({previous.get('commit') or 'unknown commit'})")
+
+    if not args.no_record:
+        entry = {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit":    git_commit(),
+            "host":      platform.node(),
+            "python":    platform.python_version(),
+            "results":   results,
+        }
+        os.makedirs(os.path.dirname(args.history), exist_ok=True)
+        with open(args.history, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        print(f"📄 Appended to {args.history}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+# bulk_writer.py
+"""
+Multi-row Supabase writes: `insert_fn(rows)` factories for
+`reading_store.SupabaseSync`, one PostgREST request per batch.
+"""
+
+
+def supabase_insert(client, table, **kwargs):
+    """`insert_fn` for a Supabase/PostgREST table: one POST per batch."""
+    def insert(rows):
+        client.table(table).insert(rows, returning="minimal", **kwargs).execute()
+    return insert
+
+
+def supabase_upsert(client, table, on_conflict, ignore_duplicates=True):
+    """`insert_fn` that upserts on `on_conflict`, so replays are harmless."""
+    def upsert(rows):
+        client.table(table).upsert(
+            rows, on_conflict=on_conflict, ignore_duplicates=ignore_duplicates,
+            returning="minimal"
+        ).execute()
+    return upsert
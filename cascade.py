@@ -0,0 +1,149 @@
+# cascade.py
+"""
+Rule-first cascade in front of the fault classifier.
+
+The labels in `generate_fake_training_data` come from explicit thresholds
+(coolant_temp > 115, fuel_level < 5, rpm > 5500, ...). For each batch the
+rule stage measures, in one vectorized pass, how far every reading sits
+from every threshold:
+
+    clear "none"   every rule is on its quiet side by at least its margin
+    clear fault    exactly one rule has fired by at least its margin and
+                   every other rule is clearly quiet
+    ambiguous      anything else — sent to the model
+
+Margins are in each feature's own units; `margin_scale` widens (> 1) or
+narrows (< 1, 0 = bare thresholds) all of them at once. A sample of the
+fast-path rows (`audit_rate`) is also scored by the model so the cascade
+can report how often the two agree.
+"""
+import threading
+from collections import Counter
+
+import numpy as np
+
+from batch_inference import FEATURE_NAMES, readings_to_matrix
+
+RULE_CONFIDENCE = 1.0
+
+# (fault, feature, direction, threshold, margin) — same thresholds and
+# priority order as generate_fake_obd_data(); direction +1 fires above the
+# threshold, -1 below it.
+RULES = [
+    ("coolant_overheat", "coolant_temp",     +1, 115.0,  2.0),
+    ("fuel_low",         "fuel_level",       -1,   5.0,  0.5),
+    ("rpm_spike",        "rpm",              +1, 5500.0, 100.0),
+    ("speed_high",       "speed",            +1, 120.0,  2.0),
+    ("throttle_stuck",   "throttle_pos",     -1,   5.0,  1.0),
+    ("throttle_stuck",   "throttle_pos",     +1,  95.0,  1.0),
+    ("intake_temp_high", "intake_air_temp",  +1,  45.0,  1.0),
+    ("air_flow_low",     "air_flow_rate",    -1,  20.0,  2.0),
+    ("barometric_low",   "barometric_p",     -1,  88.0,  0.5),
+    ("ambient_high",     "ambient_air_temp", +1,  30.0,  1.0),
+    ("fuel_rate_high",   "fuel_rate",        +1,  18.0,  0.5),
+]
+
+
+_COLS      = [FEATURE_NAMES.index(feature) for _, feature, _, _, _ in RULES]
+_DIRECTION = np.array([d for _, _, d, _, _ in RULES], dtype=np.float64)
+_THRESHOLD = np.array([t for _, _, _, t, _ in RULES], dtype=np.float64)
+_MARGIN    = np.array([m for _, _, _, _, m in RULES], dtype=np.float64)
+VERDICTS   = np.array(["none"] + [fault for fault, *_ in RULES], dtype=object)  # indexed by verdict + 1
+
+
+def rule_labels(X, margin_scale=1.0):
+    """
+    Rule verdicts for an (n, 20) raw feature matrix: an int array indexing
+    `RULES` for a clear fault, -1 for clear "none" and -2 for ambiguous.
+    """
+    excess  = (np.asarray(X, dtype=np.float64)[:, _COLS] - _THRESHOLD) * _DIRECTION  # > 0: rule fired
+    fired   = excess > 0
+    decided = (np.abs(excess) >= _MARGIN * margin_scale).all(axis=1)  # no rule inside its margin band
+    n_fired = fired.sum(axis=1)
+    return np.where(decided & (n_fired == 0), -1,
+                    np.where(decided & (n_fired == 1), fired.argmax(axis=1), -2))
+
+
+class CascadeClassifier:
+    """
+    `predict(readings)` with the same `(fault, confidence)` output as the
+    model it wraps; only ambiguous readings (plus the audit sample) reach
+    `model.predict_matrix`. The feature matrix is built once per batch and
+    shared by both stages.
+    """
+
+    def __init__(self, model, margin_scale=1.0, audit_rate=0.02, enabled=True, seed=None):
+        self.model        = model
+        self.margin_scale = margin_scale
+        self.audit_rate   = audit_rate
+        self.enabled      = enabled
+        self._rng         = np.random.default_rng(seed)
+        self._lock        = threading.Lock()
+        self._stats       = Counter()
+        self._verdicts    = np.zeros(len(VERDICTS) + 1, dtype=np.int64)
+        self._disagree    = Counter()
+
+    def predict(self, readings):
+        if not readings:
+            return []
+        if not self.enabled:
+            self._count(rows=len(readings), model_rows=len(readings))
+            return self.model.predict(readings)  # keeps VINs for models that shard on them
+        return self.predict_matrix(readings_to_matrix(readings))
+
+    def predict_matrix(self, X):
+        n = len(X)
+        if not n:
+            return []
+        if not self.enabled:
+            self._count(rows=n, model_rows=n)
+            return self.model.predict_matrix(X)
+
+        verdict  = rule_labels(X, self.margin_scale)
+        fast     = verdict != -2
+        audited  = fast & (self._rng.random(n) < self.audit_rate) if self.audit_rate else np.zeros(n, bool)
+        to_model = np.flatnonzero(~fast | audited).tolist()
+
+        results = list(zip(VERDICTS[verdict + 1].tolist(), [RULE_CONFIDENCE] * n))
+        agree   = 0
+        if to_model:
+            for i, out in zip(to_model, self.model.predict_matrix(X[to_model])):
+                if not audited[i]:
+                    results[i] = out
+                elif out[0] == results[i][0]:
+                    agree += 1
+                else:
+                    self._note_disagreement(results[i][0], out[0])
+
+        counts = np.bincount(verdict + 2, minlength=len(VERDICTS) + 1)  # [ambiguous, none, rule 0, …]
+        with self._lock:
+            self._verdicts += counts
+            self._stats.update(rows=n, fast_rows=n - int(counts[0]), model_rows=int(counts[0]),
+                               audited=int(audited.sum()), agree=agree)
+        return results
+
+    def _count(self, **counts):
+        with self._lock:
+            self._stats.update(counts)
+
+    def _note_disagreement(self, rule_fault, model_fault):
+        with self._lock:
+            self._disagree[f"{rule_fault}→{model_fault}"] += 1
+
+    def stats(self):
+        """Fast-path share, rule/model agreement on the audit sample, per-rule hits."""
+        with self._lock:
+            s = dict(self._stats)
+            rows, audited = s.get("rows", 0), s.get("audited", 0)
+            by_verdict = Counter()
+            for fault, count in zip(VERDICTS.tolist(), self._verdicts[1:].tolist()):
+                by_verdict[fault] += count
+            return {
+                "rows":            rows,
+                "fast_share":      round(s.get("fast_rows", 0) / rows, 4) if rows else None,
+                "model_rows":      s.get("model_rows", 0),
+                "audited":         audited,
+                "agreement":       round(s.get("agree", 0) / audited, 4) if audited else None,
+                "fast_by_verdict": {f: c for f, c in by_verdict.most_common() if c},
+                "disagreements":   dict(self._disagree.most_common(5)),
+            }
@@ -1,65 +1,59 @@
 import os
 import io
+import json
+import time
+import argparse
 import itertools
-import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
-import pandas as pd
 import tensorflow as tf
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
-from sklearn.utils import class_weight
-from sklearn.metrics import confusion_matrix
+from shard_dataset import (
+    balanced_class_weights, ensure_shards, load_meta, make_dataset,
+    sample_split, streaming_stats,
+)
+from quantize_export import VARIANTS, export_variants, write_report
+from model_bundle import BUNDLE_NAME, write_bundle
+from numpy_backend import NumpyPredictor
 
-# ─── 1. Numbered run directory ────────────────────────────────────────────────
 BASE_LOG_DIR = "logs/fit"
-os.makedirs(BASE_LOG_DIR, exist_ok=True)
-existing = [
-    d for d in os.listdir(BASE_LOG_DIR)
-    if os.path.isdir(os.path.join(BASE_LOG_DIR, d)) and d.startswith("run_")
-]
-run_number = len(existing) + 1
-run_name = f"run_{run_number}"
-log_dir = os.path.join(BASE_LOG_DIR, run_name)
-os.makedirs(log_dir, exist_ok=True)
-print(f"📝 Logging to {log_dir}")
-
-# ─── 2. Data loading & prep for multi-class ─────────────────────────────────
-df = pd.read_csv("training_data.csv")
-# Drop non-feature columns
-X = df.drop(columns=["timestamp", "verdict", "fault_code"], errors="ignore").values
-
-# Capture and save the list of fault codes
-fault_codes = sorted(df["fault_code"].unique())
-num_classes = len(fault_codes)
-code_to_idx = {code: idx for idx, code in enumerate(fault_codes)}
-y_idx = df["fault_code"].map(code_to_idx).values
-y = tf.keras.utils.to_categorical(y_idx, num_classes=num_classes)
-
-# Standardize features
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
-
-# Stratified train/test split
-X_train, X_test, y_train, y_test, y_train_idx, y_test_idx = train_test_split(
-    X_scaled, y, y_idx,
-    test_size=0.2,
-    random_state=42,
-    stratify=y_idx
-)
 
-# Compute class weights for imbalanced classes
-weights = class_weight.compute_class_weight(
-    class_weight="balanced",
-    classes=np.arange(num_classes),
-    y=y_train_idx
-)
-class_weights = {i: w for i, w in enumerate(weights)}
-print("Class weights:", class_weights)
+# Architecture / loss / optimiser settings; the defaults are the original model.
+# `dropout` is the first hidden layer's rate, tapering by 0.1 per layer.
+DEFAULT_HPARAMS = {
+    "widths":        [128, 64, 32],
+    "dropout":       0.5,
+    "gamma":         2.0,
+    "alpha":         0.25,
+    "learning_rate": 1e-3,
+}
 
-# ─── 3. Focal Loss definition ─────────────────────────────────────────────────
+# ─── 1. Numbered run directory ────────────────────────────────────────────────
+def new_run_dir(base_log_dir=BASE_LOG_DIR, prefix="run_"):
+    """
+    Create the next free `<prefix>N` directory. `os.mkdir` either creates it
+    or fails, so concurrent trainings never end up sharing one.
+    """
+    os.makedirs(base_log_dir, exist_ok=True)
+    taken = [
+        int(d[len(prefix):]) for d in os.listdir(base_log_dir)
+        if d.startswith(prefix) and d[len(prefix):].isdigit()
+    ]
+    n = max(taken, default=0) + 1
+    while True:
+        run_name = f"{prefix}{n}"
+        log_dir = os.path.join(base_log_dir, run_name)
+        try:
+            os.mkdir(log_dir)
+            break
+        except FileExistsError:
+            n += 1
+    print(f"📝 Logging to {log_dir}")
+    return run_name, log_dir
+
+# ─── 2. Focal Loss definition ─────────────────────────────────────────────────
 def focal_loss(gamma=2.0, alpha=0.25):
     def loss_fn(y_true, y_pred):
         y_true = tf.cast(y_true, tf.float32)
@@ -70,52 +64,76 @@ def focal_loss(gamma=2.0, alpha=0.25):
         return tf.reduce_mean(alpha_factor * modulating * ce)
     return loss_fn
 
+# ─── 3. Streaming confusion matrix ───────────────────────────────────────────
+class StreamingConfusionMatrix(tf.keras.metrics.Metric):
+    """
+    Confusion matrix accumulated batch by batch inside the train/test step.
+
+    Keras resets compiled metrics before the validation pass, so when
+    `on_epoch_end` runs, `matrix` holds the validation confusion matrix and
+    no second `predict` is needed. `result()` is the balanced accuracy (mean
+    per-class recall) so it logs as a scalar. Sample (class) weights are
+    ignored: the matrix counts rows.
+    """
+
+    def __init__(self, num_classes, name="balanced_accuracy", **kwargs):
+        super().__init__(name=name, **kwargs)
+        self.num_classes = num_classes
+        self.matrix = self.add_variable(
+            shape=(num_classes, num_classes), initializer="zeros", dtype="int64", name="matrix"
+        )
+
+    def update_state(self, y_true, y_pred, sample_weight=None):
+        self.matrix.assign_add(tf.math.confusion_matrix(
+            tf.argmax(y_true, axis=-1), tf.argmax(y_pred, axis=-1),
+            num_classes=self.num_classes, dtype=tf.int64,
+        ))
+
+    def result(self):
+        m = tf.cast(self.matrix, tf.float32)
+        support = tf.reduce_sum(m, axis=1)
+        recall = tf.math.divide_no_nan(tf.linalg.diag_part(m), support)
+        present = tf.reduce_sum(tf.cast(support > 0, tf.float32))
+        return tf.math.divide_no_nan(tf.reduce_sum(recall), present)
+
+    def reset_state(self):
+        self.matrix.assign(tf.zeros_like(self.matrix))
+
+    def get_config(self):
+        return {**super().get_config(), "num_classes": self.num_classes}
+
 # ─── 4. Build & compile a deeper multi-class model ──────────────────────────
-model = tf.keras.Sequential([
-    tf.keras.layers.InputLayer(input_shape=(X_train.shape[1],)),
-    tf.keras.layers.GaussianNoise(0.1),
-
-    tf.keras.layers.Dense(128, activation="relu"),
-    tf.keras.layers.BatchNormalization(),
-    tf.keras.layers.Dropout(0.5),
-
-    tf.keras.layers.Dense(64, activation="relu"),
-    tf.keras.layers.BatchNormalization(),
-    tf.keras.layers.Dropout(0.4),
-
-    tf.keras.layers.Dense(32, activation="relu"),
-    tf.keras.layers.BatchNormalization(),
-    tf.keras.layers.Dropout(0.3),
-
-    tf.keras.layers.Dense(num_classes, activation="softmax"),
-])
-model.compile(
-    optimizer=tf.keras.optimizers.Adam(learning_rate=1e-3),
-    loss=focal_loss(gamma=2.0, alpha=0.25),
-    metrics=[tf.keras.metrics.CategoricalAccuracy(name="accuracy")]
-)
-model.summary()
+def build_model(num_features, num_classes, cm_metric=None, widths=(128, 64, 32), dropout=0.5,
+                gamma=2.0, alpha=0.25, learning_rate=1e-3):
+    layers = [
+        tf.keras.layers.InputLayer(input_shape=(num_features,)),
+        tf.keras.layers.GaussianNoise(0.1),
+    ]
+    for i, width in enumerate(widths):
+        layers += [
+            tf.keras.layers.Dense(width, activation="relu"),
+            tf.keras.layers.BatchNormalization(),
+            tf.keras.layers.Dropout(max(dropout - 0.1 * i, 0.0)),
+        ]
+    layers.append(tf.keras.layers.Dense(num_classes, activation="softmax"))
 
-# ─── 5. Callbacks ─────────────────────────────────────────────────────────────
-tb_cb = tf.keras.callbacks.TensorBoard(
-    log_dir=log_dir, histogram_freq=1, write_graph=True, write_images=True
-)
-reduce_lr_cb = tf.keras.callbacks.ReduceLROnPlateau(
-    monitor="val_accuracy", factor=0.5, patience=3, min_lr=1e-6, verbose=1
-)
-es_cb = tf.keras.callbacks.EarlyStopping(
-    monitor="val_accuracy", patience=7, restore_best_weights=True, verbose=1
-)
-print_cb = tf.keras.callbacks.LambdaCallback(
-    on_epoch_end=lambda ep, logs: print(
-        f"Epoch {ep+1:02d} — loss: {logs['loss']:.4f}, acc: {logs['accuracy']:.4f}, "
-        f"val_loss: {logs['val_loss']:.4f}, val_acc: {logs['val_accuracy']:.4f}"
+    model = tf.keras.Sequential(layers)
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+        loss=focal_loss(gamma=gamma, alpha=alpha),
+        metrics=[
+            tf.keras.metrics.CategoricalAccuracy(name="accuracy"),
+            cm_metric or StreamingConfusionMatrix(num_classes),
+        ]
     )
-)
+    return model
 
-def plot_confusion_matrix(cm, labels, title="Confusion Matrix"):
-    fig, ax = plt.subplots(figsize=(8, 8))
-    im = ax.imshow(cm, interpolation="nearest", cmap=plt.cm.Blues)
+# ─── 5. Callbacks ─────────────────────────────────────────────────────────────
+def plot_confusion_matrix(cm, labels, title="Confusion Matrix", run_name=""):
+    # Figure() rather than pyplot: this runs on the render thread.
+    fig = Figure(figsize=(8, 8))
+    ax = fig.subplots()
+    im = ax.imshow(cm, interpolation="nearest", cmap="Blues")
     ax.set_title(f"{title} ({run_name})")
     fig.colorbar(im, ax=ax)
 
@@ -136,55 +154,222 @@ def plot_confusion_matrix(cm, labels, title="Confusion Matrix"):
     return fig
 
 class ConfusionMatrixLogger(tf.keras.callbacks.Callback):
-    def __init__(self, X_test, y_test_idx, log_dir):
+    """
+    Saves the validation confusion matrix from `StreamingConfusionMatrix` to
+    `cm/epoch_NNN.npy` every epoch, and every `every` epochs (plus the last)
+    renders it to a TensorBoard image on a background thread.
+    """
+
+    def __init__(self, cm_metric, log_dir, labels, run_name="", every=5, render=True):
         super().__init__()
-        self.X_test, self.y_test_idx = X_test, y_test_idx
-        self.writer = tf.summary.create_file_writer(os.path.join(log_dir, "cm"))
+        self.cm_metric, self.labels, self.run_name = cm_metric, labels, run_name
+        self.every = max(1, every) if render else None
+        self.cm_dir = os.path.join(log_dir, "cm")
+        os.makedirs(self.cm_dir, exist_ok=True)
+        self.writer = tf.summary.create_file_writer(self.cm_dir)
+        self.renderer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cm-render")
+        self.last = None
 
-    def on_epoch_end(self, epoch, logs=None):
-        preds = self.model.predict(self.X_test, verbose=0)
-        pred_idx = preds.argmax(axis=1)
-        cm = confusion_matrix(self.y_test_idx, pred_idx)
-        print("Confusion Matrix:\n", cm)
-        fig = plot_confusion_matrix(cm, fault_codes)
+    def _render(self, cm, epoch):
+        fig = plot_confusion_matrix(cm, self.labels, run_name=self.run_name)
         buf = io.BytesIO()
-        plt.savefig(buf, format="png"); plt.close(fig); buf.seek(0)
+        fig.savefig(buf, format="png")
         img = tf.image.decode_png(buf.getvalue(), channels=4)
         img = tf.expand_dims(img, 0)
         with self.writer.as_default():
             tf.summary.image("Confusion Matrix", img, step=epoch)
 
-conf_cb = ConfusionMatrixLogger(X_test, y_test_idx, log_dir)
+    def on_epoch_end(self, epoch, logs=None):
+        cm = self.cm_metric.matrix.numpy()
+        np.save(os.path.join(self.cm_dir, f"epoch_{epoch + 1:03d}.npy"), cm)
+        if self.every is None:
+            return
+        self.last = (cm, epoch)
+        if (epoch + 1) % self.every == 0:
+            print("Confusion Matrix:\n", cm)
+            self.renderer.submit(self._render, cm, epoch)
+            self.last = None
+
+    def on_train_end(self, logs=None):
+        if self.last is not None:
+            print("Confusion Matrix:\n", self.last[0])
+            self.renderer.submit(self._render, *self.last)
+        self.renderer.shutdown(wait=True)
+
+class EpochTimer(tf.keras.callbacks.Callback):
+    """
+    Splits each epoch's wall time into training, the validation pass and
+    the epoch-end callbacks listed before it (confusion matrix, TensorBoard),
+    printing the split and appending it to `epoch_timing.csv`.
+    """
+
+    def __init__(self, log_dir):
+        super().__init__()
+        self.path = os.path.join(log_dir, "epoch_timing.csv")
+        with open(self.path, "w") as f:
+            f.write("epoch,train_s,eval_s,callbacks_s,eval_share\n")
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.t_epoch = time.perf_counter()
+        self.t_test = self.t_test_end = None
+
+    def on_test_begin(self, logs=None):
+        self.t_test = time.perf_counter()
+
+    def on_test_end(self, logs=None):
+        self.t_test_end = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        now = time.perf_counter()
+        test_begin = self.t_test or now
+        test_end   = self.t_test_end or test_begin
+        train_s, eval_s, cb_s = test_begin - self.t_epoch, test_end - test_begin, now - test_end
+        share = (eval_s + cb_s) / max(now - self.t_epoch, 1e-9)
+        print(f"⏱️  Epoch {epoch+1:02d} — train {train_s:.2f}s, validation {eval_s:.2f}s, "
+              f"epoch-end callbacks {cb_s:.2f}s ({share:.0%} of the epoch outside training)")
+        with open(self.path, "a") as f:
+            f.write(f"{epoch + 1},{train_s:.4f},{eval_s:.4f},{cb_s:.4f},{share:.4f}\n")
+
+def make_callbacks(log_dir, run_name, cm_metric, labels, every=5, tensorboard=True):
+    tb_cb = tf.keras.callbacks.TensorBoard(
+        log_dir=log_dir, histogram_freq=every, write_graph=True, write_images=True
+    ) if tensorboard else None
+    reduce_lr_cb = tf.keras.callbacks.ReduceLROnPlateau(
+        monitor="val_accuracy", factor=0.5, patience=3, min_lr=1e-6, verbose=1
+    )
+    es_cb = tf.keras.callbacks.EarlyStopping(
+        monitor="val_accuracy", patience=7, restore_best_weights=True, verbose=1
+    )
+    print_cb = tf.keras.callbacks.LambdaCallback(
+        on_epoch_end=lambda ep, logs: print(
+            f"Epoch {ep+1:02d} — loss: {logs['loss']:.4f}, acc: {logs['accuracy']:.4f}, "
+            f"val_loss: {logs['val_loss']:.4f}, val_acc: {logs['val_accuracy']:.4f}"
+        )
+    )
+    conf_cb = ConfusionMatrixLogger(cm_metric, log_dir, labels, run_name, every, render=tensorboard)
+    # Last, so its on_epoch_end also times the callbacks above.
+    timer_cb = EpochTimer(log_dir)
+    return [cb for cb in (tb_cb, reduce_lr_cb, es_cb, print_cb, conf_cb, timer_cb) if cb]
 
 # ─── 6. Train ────────────────────────────────────────────────────────────────
-history = model.fit(
-    X_train, y_train,
-    validation_split=0.2,
-    epochs=100,
-    batch_size=32,
-    verbose=0,
-    class_weight=class_weights,
-    callbacks=[tb_cb, reduce_lr_cb, es_cb, print_cb, conf_cb]
-)
+def train(data="training_data.csv", epochs=100, batch_size=32, shuffle_buffer=100_000,
+          eval_rows=20_000, cm_every=5, base_log_dir=BASE_LOG_DIR, hparams=None,
+          variants=tuple(VARIANTS), tensorboard=True):
+    """
+    Train on `data` (a CSV, a generator .cols directory or a shard
+    directory) without loading it into memory: it is sharded once, one
+    NumPy pass computes the scaler and class weights, and `model.fit` reads
+    the shards through tf.data. The validation confusion matrix is
+    accumulated in-graph; it is rendered (and weight histograms written)
+    every `cm_every` epochs.
+
+    `hparams` overrides `DEFAULT_HPARAMS`. The run directory gets a
+    `summary.json` with the settings, best validation scores and the
+    TFLite report; the run directory is returned.
+    """
+    hparams = {**DEFAULT_HPARAMS, **(hparams or {})}
+    run_name, log_dir = new_run_dir(base_log_dir)
+    with open(os.path.join(log_dir, "hparams.json"), "w") as f:
+        json.dump(hparams, f, indent=2)
+
+    shards_dir = ensure_shards(data)
+    fault_codes = load_meta(shards_dir)["labels"]
+    num_classes = len(fault_codes)
+
+    scaler, split_rows, train_labels = streaming_stats(shards_dir)
+    class_weights = balanced_class_weights(train_labels)
+    print("Split sizes:", split_rows)
+    print("Class weights:", class_weights)
 
-# ─── 7. Save artifacts ───────────────────────────────────────────────────────
-import joblib
-# Save scaler
-joblib.dump(scaler, os.path.join(log_dir, "scaler.pkl"))
-# Save fault_codes list for inference mapping
-joblib.dump(fault_codes, os.path.join(log_dir, "fault_codes.pkl"))
-
-# 1) Native Keras format
-keras_path = os.path.join(log_dir, "model.keras")
-model.save(keras_path)
-print(f"✅ Saved Keras model to {keras_path}")
-
-# 2) TFLite flatbuffer
-converter = tf.lite.TFLiteConverter.from_keras_model(model)
-tflite_model = converter.convert()
-tflite_path = os.path.join(log_dir, "model.tflite")
-with open(tflite_path, "wb") as f:
-    f.write(tflite_model)
-print(f"✅ Saved TFLite model to {tflite_path}")
-
-print("All artifacts saved under", log_dir)
+    train_ds = make_dataset(shards_dir, "train", scaler, batch_size, shuffle_buffer,
+                            rows=split_rows["train"])
+    val_ds   = make_dataset(shards_dir, "validation", scaler, batch_size,
+                            rows=split_rows["validation"])
+
+    # Bounded in-memory samples for int8 calibration and the TFLite variant report.
+    X_test, y_test_idx = sample_split(shards_dir, "test", eval_rows)
+    X_test  = scaler.transform(X_test).astype(np.float32)
+    X_calib = scaler.transform(sample_split(shards_dir, "train", 2_000)[0]).astype(np.float32)
+
+    cm_metric = StreamingConfusionMatrix(num_classes)
+    model = build_model(len(scaler.mean_), num_classes, cm_metric, **hparams)
+    model.summary()
+
+    t0 = time.perf_counter()
+    history = model.fit(
+        train_ds,
+        validation_data=val_ds,
+        epochs=epochs,
+        verbose=0,
+        class_weight=class_weights,
+        callbacks=make_callbacks(log_dir, run_name, cm_metric, fault_codes, cm_every, tensorboard)
+    )
+    train_s = time.perf_counter() - t0
+
+    # ─── 7. Save artifacts ───────────────────────────────────────────────────
+    # 1) Native Keras format
+    keras_path = os.path.join(log_dir, "model.keras")
+    model.save(keras_path)
+    print(f"✅ Saved Keras model to {keras_path}")
+    # Folded NumPy copy, so INFERENCE_BACKEND=numpy can serve this run too
+    NumpyPredictor.from_keras(keras_path, scaler.mean_, scaler.scale_, fault_codes).save(
+        os.path.join(log_dir, "model_folded.npz"))
+
+    # 2) TFLite flatbuffers (float32 / float16 / int8) + variant report
+    tflite_paths = export_variants(model, log_dir, X_calib, variants)
+    report = write_report(log_dir, tflite_paths, X_test, y_test_idx, fault_codes)
+
+    # 3) Inference bundle: scaler, fault codes, feature order and the TFLite
+    #    variants in one checksummed file (replaces scaler.pkl / fault_codes.pkl)
+    tflite_models = {}
+    for variant, path in tflite_paths.items():
+        with open(path, "rb") as f:
+            tflite_models[variant] = f.read()
+    bundle_path = os.path.join(log_dir, BUNDLE_NAME)
+    bundle = write_bundle(bundle_path, scaler.mean_, scaler.scale_, fault_codes, tflite_models,
+                          metadata={"run": run_name, "hparams": hparams})
+    print(f"✅ Saved model bundle to {bundle_path} (sha256 {bundle['sha256'][:12]})")
+
+    summary = {
+        "run":                        run_name,
+        "hparams":                    hparams,
+        "epochs_run":                 len(history.history["loss"]),
+        "train_s":                    round(train_s, 2),
+        "best_val_accuracy":          max(history.history["val_accuracy"]),
+        "best_val_balanced_accuracy": max(history.history["val_balanced_accuracy"]),
+        "tflite":                     report,
+    }
+    with open(os.path.join(log_dir, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+
+    print("All artifacts saved under", log_dir)
+    return log_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the OBD fault classifier")
+    parser.add_argument("--data", default="training_data.csv",
+                        help="Training CSV, generator .cols directory, or shard directory")
+    parser.add_argument("--epochs", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--shuffle-buffer", type=int, default=100_000,
+                        help="Rows held in the training shuffle buffer")
+    parser.add_argument("--eval-rows", type=int, default=20_000,
+                        help="Test rows kept in memory for the confusion matrix and report")
+    parser.add_argument("--cm-every", type=int, default=5,
+                        help="Render the confusion matrix / weight histograms every N epochs")
+    parser.add_argument("--log-dir", default=BASE_LOG_DIR, help="Parent directory for run_N")
+    parser.add_argument("--hparams", type=json.loads, default=None,
+                        help='JSON overrides, e.g. \'{"widths": [256, 128], "gamma": 1.5}\'')
+    args = parser.parse_args()
+
+    train(
+        data=args.data,
+        epochs=args.epochs,
+        batch_size=args.batch_size,
+        shuffle_buffer=args.shuffle_buffer,
+        eval_rows=args.eval_rows,
+        cm_every=args.cm_every,
+        base_log_dir=args.log_dir,
+        hparams=args.hparams,
+    )
@@ -0,0 +1,53 @@
+# clients.py
+"""
+Process-wide service clients, created on first use and shared by every
+module that imports them (main.py, supabase_client.py, ...).
+
+    from clients import supabase
+    supabase.table("car_data").select("*").execute()   # client built here
+"""
+import os
+import threading
+
+from dotenv import load_dotenv
+
+
+class Lazy:
+    """
+    Stands in for an object that is only built when first used.
+
+    Attribute access runs `factory()` once (under a lock, in whichever thread
+    gets there first) and forwards to the result, so module-level
+    singletons cost nothing at import time.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._obj     = None
+        self._lock    = threading.Lock()
+
+    def get(self):
+        obj = self._obj
+        if obj is None:
+            with self._lock:
+                if self._obj is None:
+                    self._obj = self._factory()
+                obj = self._obj
+        return obj
+
+    @property
+    def created(self):
+        return self._obj is not None
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+def _create_supabase():
+    from supabase import create_client  # ~0.3 s of imports; only when a query is made
+
+    load_dotenv()
+    return create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+
+
+supabase = Lazy(_create_supabase)
@@ -7,7 +7,7 @@ export async function GET(request: Request) {
     const { searchParams } = new URL(request.url);
     const vin = searchParams.get('vin');
 
-    let query = supabase.from('car_nfts').select('*');
+    let query = supabase.from('car_nft_lists').select('*');
 
     if (vin) {
       query = query.eq('vin', vin);
@@ -6,8 +6,8 @@ const supabase = createClient(
   process.env.SUPABASE_KEY!
 );
 
-interface CarNFT {
-  id: string;
+interface CarNFTToken {
+  token_id: number;
   vin: string;
 }
 
@@ -43,14 +43,17 @@ export async function GET(request: Request) {
         startDate = new Date(0);
     }
 
-    // First get all NFTs with their VINs
-    const { data: nfts } = await supabase
-      .from('car_nfts')
-      .select('id, vin')
-      .not('vin', 'is', null);
+    // One row per minted token; car_data.unique_id holds the token ID
+    const { data: tokens, error: tokensError } = await supabase
+      .from('car_nft_tokens')
+      .select('token_id, vin');
 
-    const nftData = (nfts || []) as CarNFT[];
-    const nftToVin = new Map(nftData.map(nft => [nft.id, nft.vin]));
+    if (tokensError) {
+      throw tokensError;
+    }
+
+    const tokenData = (tokens || []) as CarNFTToken[];
+    const nftToVin = new Map(tokenData.map(token => [String(token.token_id), token.vin]));
 
     // Get fault data with time range filter
     const { data: carData } = await supabase
@@ -65,7 +68,8 @@ export async function GET(request: Request) {
     // Transform the data to include VIN information
     const history = faultRecords
       .map(record => {
-        const vin = nftToVin.get(record.unique_id);
+        // Merkle-batched readings are stored as "<token_id>:<leaf index>"
+        const vin = nftToVin.get(String(record.unique_id).split(':')[0]);
         if (!vin) return null;
 
         return {
@@ -40,120 +40,123 @@ interface FleetAnalytics {
   };
 }
 
-export async function GET() {
-  try {
-    // Get all NFTs with their VINs
-    const { data: nfts } = await supabase
-      .from('car_nfts')
-      .select('vin, nfts');
-
-    if (!nfts || nfts.length === 0) {
-      return NextResponse.json({ error: 'No fleet data available' }, { status: 404 });
+type StatsRow = Record<string, any>;
+
+// Sums the rows of every gateway that share `key`; `merge` folds row `b` into `a`.
+function sumByKey(rows: StatsRow[], key: string, fields: string[],
+                  merge?: (a: StatsRow, b: StatsRow) => void): StatsRow[] {
+  const totals = new Map<string, StatsRow>();
+  rows.forEach(row => {
+    const total = totals.get(row[key]);
+    if (!total) {
+      totals.set(row[key], { ...row });
+      return;
     }
+    fields.forEach(f => { total[f] += row[f]; });
+    merge?.(total, row);
+  });
+  return Array.from(totals.values());
+}
 
-    // Create a map of NFT IDs to VINs
-    const nftToVin = new Map();
-    nfts.forEach(({ vin, nfts: nftIds }) => {
-      nftIds.split(',').forEach((id: string) => nftToVin.set(id.trim(), vin));
-    });
-
-    // Get all fault data
-    const { data: carData } = await supabase
-      .from('car_data')
-      .select('*')
-      .order('timestamp', { ascending: false });
-
-    if (!carData) {
-      return NextResponse.json({ error: 'No fault data available' }, { status: 404 });
+// PostgREST caps each response (1000 rows by default on Supabase), so read
+// the table a page at a time in a stable order until `count` rows are in.
+const PAGE_SIZE = 1000;
+
+async function fetchAll(table: string, key: string): Promise<StatsRow[]> {
+  const rows: StatsRow[] = [];
+  for (;;) {
+    const { data, error, count } = await supabase
+      .from(table)
+      .select('*', { count: 'exact' })
+      .order('gateway_id')
+      .order(key)
+      .range(rows.length, rows.length + PAGE_SIZE - 1);
+    if (error) {
+      throw error;
     }
+    rows.push(...(data ?? []));
+    if (!data || data.length === 0 || rows.length >= (count ?? 0)) {
+      return rows;
+    }
+  }
+}
 
-    // Process data for fleet analytics
-    const vehicleData = new Map();
-    const faultDistribution: Record<string, number> = {};
-    let totalConfidence = 0;
-    let totalFaults = 0;
-
-    carData.forEach(record => {
-      const vin = nftToVin.get(record.unique_id);
-      if (!vin) return;
+const VEHICLE_SUMS = ['readings', 'confidence_sum', 'speed_sum', 'speed_n', 'fuel_rate_sum',
+                      'fuel_rate_n', 'high_speed', 'high_fuel_rate', 'engine_issues'];
+const LAST_FIELDS  = ['last_timestamp', 'last_fault', 'last_confidence', 'last_sensor_data'];
 
-      // Update fault distribution
-      faultDistribution[record.fault] = (faultDistribution[record.fault] || 0) + 1;
-      totalConfidence += record.confidence;
-      totalFaults++;
+// Totals are maintained by each gateway (fleet_aggregates.py) in small
+// summary tables keyed by (gateway_id, key), so this reads one row per
+// gateway and vehicle / fault / day / sensor instead of every car_data row,
+// and adds up the gateways.
+export async function GET() {
+  try {
+    const [vehicles, faults, days, sensors] = await Promise.all([
+      fetchAll('fleet_vehicle_stats', 'vin'),
+      fetchAll('fleet_fault_stats', 'fault'),
+      fetchAll('fleet_daily_stats', 'day'),
+      fetchAll('fleet_sensor_stats', 'sensor'),
+    ]);
+
+    if (vehicles.length === 0) {
+      return NextResponse.json({ error: 'No fleet data available' }, { status: 404 });
+    }
 
-      // Process vehicle-specific data
-      if (!vehicleData.has(vin)) {
-        vehicleData.set(vin, {
-          vin,
-          faultCount: 0,
-          lastFault: null,
-          totalSpeed: 0,
-          speedReadings: 0,
-          totalFuelRate: 0,
-          fuelRateReadings: 0,
-          criticalMetrics: {
-            highSpeedCount: 0,
-            highFuelRateCount: 0,
-            engineIssuesCount: 0
-          }
-        });
+    const vehicleRows = sumByKey(vehicles, 'vin', VEHICLE_SUMS, (a, b) => {
+      if ((b.last_timestamp ?? '') > (a.last_timestamp ?? '')) {
+        LAST_FIELDS.forEach(f => { a[f] = b[f]; });
       }
+    }).sort((a, b) => (a.vin < b.vin ? -1 : 1));
+    const faultRows  = sumByKey(faults, 'fault', ['readings', 'confidence_sum']);
+    const dayRows    = sumByKey(days, 'day', ['readings', 'confidence_sum'])
+      .sort((a, b) => (a.day < b.day ? 1 : -1));
+    const sensorRows = sumByKey(sensors, 'sensor', ['total', 'n']);
 
-      const vehicleStats = vehicleData.get(vin);
-      vehicleStats.faultCount++;
-
-      // Update last fault if this is the most recent
-      if (!vehicleStats.lastFault || new Date(record.timestamp) > new Date(vehicleStats.lastFault.timestamp)) {
-        vehicleStats.lastFault = {
-          fault: record.fault,
-          timestamp: record.timestamp,
-          confidence: record.confidence,
-          sensor_data: record.sensor_data
-        };
-      }
+    const faultDistribution: Record<string, number> = {};
+    let totalFaults = 0;
+    let totalConfidence = 0;
+    faultRows.forEach(f => {
+      faultDistribution[f.fault] = f.readings;
+      totalFaults += f.readings;
+      totalConfidence += f.confidence_sum;
+    });
 
-      // Process sensor data
-      if (record.sensor_data) {
-        if (record.sensor_data.speed) {
-          vehicleStats.totalSpeed += record.sensor_data.speed;
-          vehicleStats.speedReadings++;
-          if (record.sensor_data.speed > 120) { // High speed threshold
-            vehicleStats.criticalMetrics.highSpeedCount++;
-          }
-        }
-        if (record.sensor_data.fuel_rate) {
-          vehicleStats.totalFuelRate += record.sensor_data.fuel_rate;
-          vehicleStats.fuelRateReadings++;
-          if (record.sensor_data.fuel_rate > 30) { // High fuel rate threshold
-            vehicleStats.criticalMetrics.highFuelRateCount++;
-          }
-        }
-        if (record.sensor_data.engine_load > 90 || record.sensor_data.coolant_temp > 100) {
-          vehicleStats.criticalMetrics.engineIssuesCount++;
-        }
-      }
+    const sensorAverages: Record<string, number> = {};
+    sensorRows.forEach(s => {
+      sensorAverages[s.sensor] = s.n > 0 ? s.total / s.n : 0;
     });
 
-    // Calculate fleet analytics
     const fleetAnalytics: FleetAnalytics = {
       fleetOverview: {
-        totalVehicles: nfts.length,
+        totalVehicles: vehicleRows.length,
         totalFaults,
         averageConfidence: totalFaults > 0 ? (totalConfidence / totalFaults) * 100 : 0,
         faultDistribution
       },
-      vehicleStats: Array.from(vehicleData.values()).map(vehicle => ({
-        vin: vehicle.vin,
-        faultCount: vehicle.faultCount,
-        lastFault: vehicle.lastFault,
-        averageSpeed: vehicle.speedReadings > 0 ? vehicle.totalSpeed / vehicle.speedReadings : 0,
-        averageFuelRate: vehicle.fuelRateReadings > 0 ? vehicle.totalFuelRate / vehicle.fuelRateReadings : 0,
-        criticalMetrics: vehicle.criticalMetrics
+      vehicleStats: vehicleRows.map(v => ({
+        vin: v.vin,
+        faultCount: v.readings,
+        lastFault: {
+          fault: v.last_fault,
+          timestamp: v.last_timestamp,
+          confidence: v.last_confidence,
+          sensor_data: v.last_sensor_data
+        },
+        averageSpeed: v.speed_n > 0 ? v.speed_sum / v.speed_n : 0,
+        averageFuelRate: v.fuel_rate_n > 0 ? v.fuel_rate_sum / v.fuel_rate_n : 0,
+        criticalMetrics: {
+          highSpeedCount: v.high_speed,
+          highFuelRateCount: v.high_fuel_rate,
+          engineIssuesCount: v.engine_issues
+        }
       })),
       trendAnalysis: {
-        faultTrends: processFaultTrends(carData),
-        sensorAverages: calculateSensorAverages(carData)
+        faultTrends: dayRows.map(d => ({
+          date: d.day,
+          faultCount: d.readings,
+          avgConfidence: d.readings > 0 ? (d.confidence_sum / d.readings) * 100 : 0
+        })),
+        sensorAverages
       }
     };
 
@@ -166,46 +169,3 @@ export async function GET() {
     );
   }
 }
-
-function processFaultTrends(carData: any[]) {
-  const dailyFaults = new Map();
-  
-  carData.forEach(record => {
-    const date = record.timestamp.split(' ')[0];
-    if (!dailyFaults.has(date)) {
-      dailyFaults.set(date, { count: 0, totalConfidence: 0 });
-    }
-    const daily = dailyFaults.get(date);
-    daily.count++;
-    daily.totalConfidence += record.confidence;
-  });
-
-  return Array.from(dailyFaults.entries()).map(([date, data]) => ({
-    date,
-    faultCount: data.count,
-    avgConfidence: (data.totalConfidence / data.count) * 100
-  }));
-}
-
-function calculateSensorAverages(carData: any[]) {
-  const sensorTotals: Record<string, { sum: number; count: number }> = {};
-  
-  carData.forEach(record => {
-    if (record.sensor_data) {
-      Object.entries(record.sensor_data).forEach(([sensor, value]) => {
-        if (!sensorTotals[sensor]) {
-          sensorTotals[sensor] = { sum: 0, count: 0 };
-        }
-        sensorTotals[sensor].sum += value as number;
-        sensorTotals[sensor].count++;
-      });
-    }
-  });
-
-  const averages: Record<string, number> = {};
-  Object.entries(sensorTotals).forEach(([sensor, { sum, count }]) => {
-    averages[sensor] = count > 0 ? sum / count : 0;
-  });
-
-  return averages;
-} 
\ No newline at end of file
@@ -6,8 +6,8 @@ const supabase = createClient(
   process.env.SUPABASE_KEY!
 );
 
-interface CarNFT {
-  id: string;
+interface CarNFTToken {
+  token_id: number;
   vin: string;
 }
 
@@ -19,14 +19,17 @@ interface CarData {
 
 export async function GET() {
   try {
-    // First get all NFTs with their VINs
-    const { data: nfts } = await supabase
-      .from('car_nfts')
-      .select('id, vin')
-      .not('vin', 'is', null);
+    // One row per minted token: (vin, token_id)
+    const { data: tokens, error: tokensError } = await supabase
+      .from('car_nft_tokens')
+      .select('token_id, vin');
 
-    const nftData = (nfts || []) as CarNFT[];
-    const totalVehicles = new Set(nftData.map(nft => nft.vin)).size;
+    if (tokensError) {
+      throw tokensError;
+    }
+
+    const tokenData = (tokens || []) as CarNFTToken[];
+    const totalVehicles = new Set(tokenData.map(token => token.vin)).size;
 
     // Get all fault data
     const { data: faultData } = await supabase
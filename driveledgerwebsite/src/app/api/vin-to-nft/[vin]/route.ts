@@ -15,7 +15,7 @@ export async function GET(
 
     // Get NFTs for the VIN
     const { data: nftData } = await supabase
-      .from('car_nfts')
+      .from('car_nft_lists')
       .select('nfts')
       .eq('vin', vin)
       .single();
@@ -80,7 +80,7 @@ export async function getCarDataByDateRange(startDate: string, endDate: string)
 export async function getCarNFTs(vin?: string) {
   if (vin) {
     const { data, error } = await supabase
-      .from('car_nfts')
+      .from('car_nft_lists')
       .select('*')
       .eq('vin', vin)
       .single();
@@ -90,7 +90,7 @@ export async function getCarNFTs(vin?: string) {
   }
 
   const { data, error } = await supabase
-    .from('car_nfts')
+    .from('car_nft_lists')
     .select('*');
   
   if (error) throw error;
@@ -5,8 +5,12 @@ module.exports = {
   solidity: "0.8.20",
   networks: {
     mumbai: {
-      url: process.env.POLYGON_RPC,
-      accounts: [process.env.PRIVATE_KEY]
+      url: process.env.POLYGON_RPC || "",
+      accounts: process.env.PRIVATE_KEY ? [process.env.PRIVATE_KEY] : []
+    },
+    // `npx hardhat node` — local chain for exercising scripts/mint_service.js
+    localhost: {
+      url: "http://127.0.0.1:8545"
     }
   }
 };
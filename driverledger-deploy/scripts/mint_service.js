@@ -0,0 +1,116 @@
+// driverledger-deploy/scripts/mint_service.js
+//
+// Long-lived mint worker. Started once by main.py:
+//
+//   npx hardhat run scripts/mint_service.js --network mumbai
+//
+// Protocol (newline-delimited JSON):
+//   stdin  ← {"id": 1, "token_id": 123, "ipfs_url": "https://.../ipfs/<cid>"}
+//   stdout → {"ready": true, "signer": "0x..", "nonce": 42}            (once)
+//   stdout → {"id": 1, "ok": true, "tx_hash": "0x..", "nonce": 42, "block": 1234}
+//   stdout → {"id": 1, "ok": true, "tx_hash": null, "already_minted": true}   (same URI on chain)
+//   stdout → {"id": 1, "ok": false, "error": "..."}
+//
+// Submissions are serialised so every tx gets the next local nonce, but the
+// worker does not wait for one receipt before sending the next transaction,
+// so several safeMint calls can be pending at once. All human-readable logging
+// goes to stderr; stdout carries only protocol lines.
+
+const hre = require("hardhat");
+const readline = require("readline");
+
+const CONTRACT_ADDRESS = process.env.MINT_CONTRACT_ADDRESS || "0xB6D0cECcb62541fFe71D5CA7776920D8ABf2705D";
+const TO_ADDRESS       = process.env.MINT_TO_ADDRESS       || "0x1a0a593AA9206c55b05Da21E048a456258Ee02Dc";
+const CONFIRMATIONS    = parseInt(process.env.MINT_CONFIRMATIONS || "1", 10);
+
+function reply(msg) {
+  process.stdout.write(JSON.stringify(msg) + "\n");
+}
+
+async function main() {
+  const [signer] = await hre.ethers.getSigners();
+  const DriverLedger = await hre.ethers.getContractAt("DriverLedger", CONTRACT_ADDRESS, signer);
+
+  let nonce = await signer.getNonce("pending");
+  let submitChain = Promise.resolve();
+  const inFlight = new Set();
+
+  reply({ ready: true, signer: signer.address, nonce });
+  console.error(`🔌 Mint service ready (signer ${signer.address}, nonce ${nonce})`);
+
+  function tokenURIFor(job) {
+    return `ipfs://${job.ipfs_url.split("/").pop()}`;
+  }
+
+  async function submit(job) {
+    const tokenURI = tokenURIFor(job);
+    const txNonce = nonce;
+    try {
+      const tx = await DriverLedger.safeMint(TO_ADDRESS, job.token_id, tokenURI, { nonce: txNonce });
+      nonce = txNonce + 1;
+      console.error(`🔑 Sent tokenId ${job.token_id} (nonce ${txNonce}) ${tx.hash}`);
+      return { tx, txNonce };
+    } catch (err) {
+      // Nothing was broadcast (e.g. the gas estimate reverted), so the local
+      // nonce is still free; resync in case the node disagrees with us.
+      nonce = Math.max(nonce, await signer.getNonce("pending"));
+      throw err;
+    }
+  }
+
+  async function handle(job) {
+    let sent;
+    const submitted = submitChain.then(() => submit(job));
+    submitChain = submitted.catch(() => {});
+    try {
+      sent = await submitted;
+      const receipt = await sent.tx.wait(CONFIRMATIONS);
+      reply({ id: job.id, ok: true, tx_hash: sent.tx.hash, nonce: sent.txNonce, block: receipt.blockNumber });
+    } catch (err) {
+      // Replays after a crash may re-send a token that already made it on
+      // chain; OpenZeppelin rejects it with ERC721InvalidSender. It is only
+      // ours if it carries this job's URI; any other owner is a collision.
+      if (!sent && err.revert && err.revert.name === "ERC721InvalidSender") {
+        const existing = await DriverLedger.tokenURI(job.token_id).catch(() => null);
+        if (existing === tokenURIFor(job)) {
+          reply({ id: job.id, ok: true, tx_hash: null, already_minted: true });
+        } else {
+          reply({
+            id: job.id, ok: false, tx_hash: null,
+            error: `token ${job.token_id} already minted with another URI (${existing})`
+          });
+        }
+        return;
+      }
+      reply({
+        id: job.id, ok: false,
+        tx_hash: sent ? sent.tx.hash : null,
+        error: err.shortMessage || err.message || String(err)
+      });
+    }
+  }
+
+  const rl = readline.createInterface({ input: process.stdin, terminal: false });
+  rl.on("line", (line) => {
+    if (!line.trim()) return;
+    let job;
+    try {
+      job = JSON.parse(line);
+    } catch (err) {
+      reply({ id: null, ok: false, error: `bad job: ${line}` });
+      return;
+    }
+    const p = handle(job).finally(() => inFlight.delete(p));
+    inFlight.add(p);
+  });
+
+  // stdin closed by Python: finish whatever is still pending, then exit.
+  await new Promise((resolve) => rl.on("close", resolve));
+  await Promise.all([...inFlight]);
+  console.error("👋 Mint service stopped.");
+}
+
+main().catch((error) => {
+  console.error(error);
+  process.exitCode = 1;
+});
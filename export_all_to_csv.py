@@ -1,12 +1,21 @@
 #!/usr/bin/env python3
+"""
+Dump a training run's artifacts to CSV for offline analysis.
+
+    python export_all_to_csv.py --run logs/fit/run_1
+
+Scaler parameters, fault codes, feature order and TFLite tensors all come
+from the run's `model.bundle`, the same file main.py serves from.
+"""
 import os
 import csv
-import pickle
+import argparse
 import numpy as np
 import tensorflow as tf
 
-# CHANGE THIS to the full path if needed
-BASE_DIR = os.path.expanduser("/Users/abdulaaqib/Developer/Github/DriveLedger/logs/fit/run_1")
+from model_bundle import BUNDLE_NAME, ModelBundle
+
+BASE_DIR = "logs/fit/run_1"
 
 def dump_model_keras(model_path):
     model = tf.keras.models.load_model(model_path, compile=False)
@@ -22,9 +31,8 @@ def dump_model_keras(model_path):
         np.savetxt(csv_path, combined, delimiter=",", header=f"{layer.name} weights", comments='')
         print("Wrote", csv_path)
 
-def dump_tflite(model_path):
-    interpreter = tf.lite.Interpreter(model_path=model_path)
-    interpreter.allocate_tensors()
+def dump_tflite(bundle, variant="float32"):
+    interpreter = bundle.interpreter(variant)
     rows = []
     for tensor in interpreter.get_tensor_details():
         rows.append([
@@ -32,42 +40,32 @@ def dump_tflite(model_path):
             str(tensor["shape"].tolist()),
             str(tensor["dtype"])
         ])
-    out_path = os.path.join(BASE_DIR, "tflite_tensors.csv")
+    suffix = "" if variant == "float32" else f"_{variant}"
+    out_path = os.path.join(BASE_DIR, f"tflite_tensors{suffix}.csv")
     with open(out_path, "w", newline="") as f:
         writer = csv.writer(f)
         writer.writerow(["name", "shape", "dtype"])
         writer.writerows(rows)
-    print("Wrote tflite_tensors.csv")
+    print("Wrote", out_path)
 
-def dump_scaler(pkl_path):
-    with open(pkl_path, "rb") as f:
-        scaler = pickle.load(f)
-    rows = []
-    for attr in ("mean_", "scale_", "var_", "data_min_", "data_max_"):
-        if hasattr(scaler, attr):
-            val = getattr(scaler, attr)
-            rows.append([attr, *val.tolist()])
+def dump_scaler(bundle):
+    # One column per feature, in the order the model expects them
+    rows = [["mean_", *bundle.array("mean").tolist()],
+            ["scale_", *bundle.array("scale").tolist()],
+            ["var_", *(bundle.array("scale") ** 2).tolist()]]
     out_path = os.path.join(BASE_DIR, "scaler_params.csv")
     with open(out_path, "w", newline="") as f:
         writer = csv.writer(f)
-        writer.writerow(["parameter", *[f"f{i}" for i in range(len(rows[0])-1)]])
+        writer.writerow(["parameter", *bundle.features])
         writer.writerows(rows)
     print("Wrote scaler_params.csv")
 
-def dump_fault_codes(pkl_path):
-    with open(pkl_path, "rb") as f:
-        codes = pickle.load(f)
-    if isinstance(codes, dict):
-        rows = [[k, v] for k, v in codes.items()]
-        header = ["code", "description"]
-    else:
-        rows = [[c] for c in codes]
-        header = ["code"]
+def dump_fault_codes(bundle):
     out_path = os.path.join(BASE_DIR, "fault_codes.csv")
     with open(out_path, "w", newline="") as f:
         writer = csv.writer(f)
-        writer.writerow(header)
-        writer.writerows(rows)
+        writer.writerow(["index", "code"])
+        writer.writerows(enumerate(bundle.fault_codes))
     print("Wrote fault_codes.csv")
 
 def summarize_image_dirs():
@@ -100,10 +98,18 @@ def dump_confusion_matrices():
             print("Wrote", out_path)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a training run's artifacts to CSV")
+    parser.add_argument("--run", default=BASE_DIR, help="Training run directory")
+    args = parser.parse_args()
+    BASE_DIR = args.run
+
+    bundle = ModelBundle(os.path.join(BASE_DIR, BUNDLE_NAME))
+    print(f"📦 {BUNDLE_NAME} sha256 {bundle.sha256[:12]}, variants: {', '.join(bundle.variants)}")
     dump_model_keras(os.path.join(BASE_DIR, "model.keras"))
-    dump_tflite(os.path.join(BASE_DIR, "model.tflite"))
-    dump_scaler(os.path.join(BASE_DIR, "scaler.pkl"))
-    dump_fault_codes(os.path.join(BASE_DIR, "fault_codes.pkl"))
+    for variant in bundle.variants:
+        dump_tflite(bundle, variant)
+    dump_scaler(bundle)
+    dump_fault_codes(bundle)
     summarize_image_dirs()
     dump_confusion_matrices()
     print("✅ All CSV exports complete.")
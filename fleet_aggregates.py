@@ -0,0 +1,369 @@
+# fleet_aggregates.py
+"""
+Fleet dashboard aggregates, kept current as readings are stored instead of
+recomputed from every `car_data` row on each `/api/fleet/overview` request.
+
+    fleet_vehicle_stats   per VIN: readings, confidence / speed / fuel-rate
+                          sums and counts, threshold counters, latest reading
+    fleet_fault_stats     per fault: readings, confidence sum
+    fleet_daily_stats     per day:   readings, confidence sum
+    fleet_sensor_stats    per sensor: sum and count, for fleet-wide averages
+
+The tables live next to the readings in the local store and are updated in
+the same transaction as each `add_readings()` batch, from the rows that
+batch actually inserted, so an outbox replay never counts a reading
+twice. Only running sums and counts are stored; means are taken at read
+time. Every update bumps a row's `version`; the Supabase sync pushes rows
+whose version is ahead of `synced_version`, i.e. each dirty key once per
+sync batch as an upsert of its absolute values. Remote rows are keyed by
+(gateway_id, key), so each gateway only overwrites its own totals and the
+dashboard sums across gateways. Reading the dashboard is then
+O(gateways × (vehicles + days + faults)).
+
+The definitions follow the overview route: speed and fuel-rate averages
+skip zero values, "high speed" is > 120, "high fuel rate" > 30, "engine
+issue" is engine_load > 90 or coolant_temp > 100. Totals are cumulative:
+`reading_store.py prune` does not subtract from them. A rebuild recomputes
+them from the stored readings, so it refuses to run once readings have
+been pruned unless this gateway's `car_data` rows are first reloaded from
+Supabase. Afterwards the rebuilt rows are pushed and this gateway's remote
+keys that no longer exist are deleted.
+
+    python fleet_aggregates.py rebuild                   # from the stored readings
+    python fleet_aggregates.py rebuild --from-supabase   # reload car_data first
+    python fleet_aggregates.py rebuild --from-supabase --claim-legacy
+    python fleet_aggregates.py overview                  # the dashboard's JSON, from the aggregates
+
+`--claim-legacy` assigns `car_data` rows written before rows carried a
+`gateway_id` to this gateway; run it on one gateway only.
+"""
+import argparse
+import json
+import os
+import socket
+from collections import defaultdict
+
+from bulk_writer import supabase_upsert
+
+SCHEMA = """
+create table if not exists fleet_vehicle_stats (
+    vin               text primary key,
+    readings          integer not null default 0,
+    confidence_sum    real    not null default 0,
+    speed_sum         real    not null default 0,
+    speed_n           integer not null default 0,
+    fuel_rate_sum     real    not null default 0,
+    fuel_rate_n       integer not null default 0,
+    high_speed        integer not null default 0,
+    high_fuel_rate    integer not null default 0,
+    engine_issues     integer not null default 0,
+    last_ts           integer not null default 0,
+    last_timestamp    text,
+    last_fault        text,
+    last_confidence   real,
+    last_sensor_data  text,
+    version           integer not null default 1,
+    synced_version    integer not null default 0
+);
+create table if not exists fleet_fault_stats (
+    fault             text primary key,
+    readings          integer not null default 0,
+    confidence_sum    real    not null default 0,
+    version           integer not null default 1,
+    synced_version    integer not null default 0
+);
+create table if not exists fleet_daily_stats (
+    day               text primary key,
+    readings          integer not null default 0,
+    confidence_sum    real    not null default 0,
+    version           integer not null default 1,
+    synced_version    integer not null default 0
+);
+create table if not exists fleet_sensor_stats (
+    sensor            text primary key,
+    total             real    not null default 0,
+    n                 integer not null default 0,
+    version           integer not null default 1,
+    synced_version    integer not null default 0
+);
+"""
+
+TABLES = {  # table → key column
+    "fleet_vehicle_stats": "vin",
+    "fleet_fault_stats":   "fault",
+    "fleet_daily_stats":   "day",
+    "fleet_sensor_stats":  "sensor",
+}
+
+HIGH_SPEED     = 120
+HIGH_FUEL_RATE = 30
+
+_VEHICLE_SUMS = ["readings", "confidence_sum", "speed_sum", "speed_n", "fuel_rate_sum", "fuel_rate_n",
+                 "high_speed", "high_fuel_rate", "engine_issues"]
+_LAST         = ["last_ts", "last_timestamp", "last_fault", "last_confidence", "last_sensor_data"]
+
+
+def fold(rows):
+    """
+    Per-key deltas for a batch of stored readings (`vin`, `ts`, `timestamp`,
+    `fault`, `confidence`, `sensor_data` dict).
+    """
+    vehicles = defaultdict(lambda: dict.fromkeys(_VEHICLE_SUMS, 0) | {"last": None})
+    faults   = defaultdict(lambda: [0, 0.0])
+    days     = defaultdict(lambda: [0, 0.0])
+    sensors  = defaultdict(lambda: [0.0, 0])
+    for r in rows:
+        sd, conf = r["sensor_data"] or {}, float(r["confidence"])
+        v = vehicles[r["vin"]]
+        v["readings"]       += 1
+        v["confidence_sum"] += conf
+        speed, fuel_rate = float(sd.get("speed") or 0), float(sd.get("fuel_rate") or 0)
+        if speed:
+            v["speed_sum"]  += speed
+            v["speed_n"]    += 1
+            v["high_speed"] += speed > HIGH_SPEED
+        if fuel_rate:
+            v["fuel_rate_sum"]  += fuel_rate
+            v["fuel_rate_n"]    += 1
+            v["high_fuel_rate"] += fuel_rate > HIGH_FUEL_RATE
+        v["engine_issues"] += (sd.get("engine_load") or 0) > 90 or (sd.get("coolant_temp") or 0) > 100
+        if v["last"] is None or r["ts"] >= v["last"]["ts"]:
+            v["last"] = r
+
+        faults[r["fault"]][0] += 1
+        faults[r["fault"]][1] += conf
+        day = r["timestamp"][:10]
+        days[day][0] += 1
+        days[day][1] += conf
+        for sensor, value in sd.items():
+            sensors[sensor][0] += float(value)
+            sensors[sensor][1] += 1
+    return vehicles, faults, days, sensors
+
+
+def apply(db, rows):
+    """Add a batch of newly stored readings to the aggregates (inside the caller's transaction)."""
+    if not rows:
+        return
+    vehicles, faults, days, sensors = fold(rows)
+    sums = ", ".join(f"{c} = {c} + excluded.{c}" for c in _VEHICLE_SUMS)
+    last = ", ".join(f"{c} = case when excluded.last_ts >= last_ts then excluded.{c} else {c} end" for c in _LAST)
+    db.executemany(
+        f"insert into fleet_vehicle_stats (vin, {', '.join(_VEHICLE_SUMS + _LAST)}) "
+        f"values ({', '.join('?' * (1 + len(_VEHICLE_SUMS) + len(_LAST)))}) "
+        f"on conflict (vin) do update set {sums}, {last}, version = version + 1",
+        [(vin, *(v[c] for c in _VEHICLE_SUMS), v["last"]["ts"], v["last"]["timestamp"], v["last"]["fault"],
+          float(v["last"]["confidence"]), json.dumps(v["last"]["sensor_data"]))
+         for vin, v in vehicles.items()])
+    for table, key, cols, deltas in (("fleet_fault_stats", "fault", ("readings", "confidence_sum"), faults),
+                                     ("fleet_daily_stats", "day", ("readings", "confidence_sum"), days),
+                                     ("fleet_sensor_stats", "sensor", ("total", "n"), sensors)):
+        db.executemany(
+            f"insert into {table} ({key}, {cols[0]}, {cols[1]}) values (?, ?, ?) on conflict ({key}) do update "
+            f"set {cols[0]} = {cols[0]} + excluded.{cols[0]}, {cols[1]} = {cols[1]} + excluded.{cols[1]}, "
+            f"version = version + 1",
+            [(k, a, b) for k, (a, b) in deltas.items()])
+
+
+# ─── Sync bookkeeping (see reading_store.SupabaseSync) ──────────────────────
+def remote_upsert(client, table, gateway_id):
+    """`insert_fn` upserting this gateway's rows of `table` on (gateway_id, key)."""
+    upsert = supabase_upsert(client, table, on_conflict=f"gateway_id,{TABLES[table]}", ignore_duplicates=False)
+    return lambda rows: upsert([dict(row, gateway_id=gateway_id) for row in rows])
+
+
+def dirty(db, table, limit=500):
+    """Rows changed since they were last pushed, as `((key, version), row)`."""
+    cur  = db.execute(f"select * from {table} where version > synced_version limit ?", (limit,))
+    cols = [d[0] for d in cur.description]
+    out  = []
+    for values in cur.fetchall():
+        row = dict(zip(cols, values))
+        key = (row[TABLES[table]], row.pop("version"))
+        row.pop("synced_version")
+        if table == "fleet_vehicle_stats":
+            row.pop("last_ts")
+            row["last_sensor_data"] = json.loads(row["last_sensor_data"] or "null")
+        out.append((key, row))
+    return out
+
+
+def mark_pushed(db, table, keys):
+    """Record the version that was pushed; a row updated meanwhile stays dirty."""
+    db.executemany(f"update {table} set synced_version = ? where {TABLES[table]} = ? and synced_version < ?",
+                   [(version, k, version) for k, version in keys])
+
+
+def dirty_count(db, table):
+    return db.execute(f"select count(*) from {table} where version > synced_version").fetchone()[0]
+
+
+# ─── Rebuild & read ─────────────────────────────────────────────────────────
+def rebuild(store, chunk=10_000, allow_pruned=False):
+    """
+    Recompute every aggregate from the stored readings in one transaction.
+    Versions are carried over and bumped, so every rebuilt row is pushed
+    again on the next sync. Raises RuntimeError if readings were pruned,
+    since their totals would be lost, unless `allow_pruned` (after
+    `backfill()`).
+    """
+    from reading_store import _COLUMNS, _row
+
+    if store.pruned() and not allow_pruned:
+        raise RuntimeError(f"{store.pruned():,} readings were pruned from the local store; "
+                           f"rebuild with --from-supabase")
+    with store._transaction() as db:
+        versions = {t: dict(db.execute(f"select {k}, version from {t}")) for t, k in TABLES.items()}
+        for table in TABLES:
+            db.execute(f"delete from {table}")
+        last_id, total = 0, 0
+        while True:
+            rows = db.execute(f"select {', '.join(_COLUMNS)} from readings where id > ? order by id limit ?",
+                              (last_id, chunk)).fetchall()
+            if not rows:
+                break
+            apply(db, [_row(r) for r in rows])
+            last_id, total = rows[-1][0], total + len(rows)
+        for table, key in TABLES.items():
+            db.executemany(f"update {table} set version = version + ? where {key} = ?",
+                           [(v, k) for k, v in versions[table].items()])
+    return total
+
+
+def _pages(query, page):
+    start = 0
+    while True:
+        rows = query().range(start, start + page - 1).execute().data or []
+        yield from rows
+        if len(rows) < page:
+            return
+        start += page
+
+
+def claim_legacy(client, gateway_id):
+    """Assign `car_data` rows without a `gateway_id` to this gateway; returns how many."""
+    result = (client.table("car_data").update({"gateway_id": gateway_id}, count="exact", returning="minimal")
+              .is_("gateway_id", "null").execute())
+    return result.count or 0
+
+
+def backfill(store, client, gateway_id, page=1000):
+    """
+    Load this gateway's `car_data` rows from Supabase into the store (as
+    synced), so a rebuild also covers pruned history. Rows without a `vin`
+    take it from `car_nft_tokens` when their token covers a single VIN.
+    Returns the number of readings added.
+    """
+    vins = defaultdict(set)
+    for t in _pages(lambda: client.table("car_nft_tokens").select("vin, token_id").order("token_id"), page):
+        vins[str(t["token_id"])].add(t["vin"])
+
+    added, batch = 0, []
+    for row in _pages(lambda: client.table("car_data")
+                      .select("timestamp, fault, confidence, sensor_data, unique_id, ipfs_link, vin")
+                      .eq("gateway_id", gateway_id).order("unique_id"), page):
+        token = str(row["unique_id"]).split(":")[0]
+        known = vins.get(token, ())
+        vin   = row.get("vin") or (next(iter(known)) if len(known) == 1 else "UNKNOWN_VIN")
+        batch.append(dict(row, vin=vin, token_id=token, sensor_data=row["sensor_data"] or {}))
+        if len(batch) >= page:
+            added += store.add_readings(batch, synced=True)
+            batch = []
+    return added + store.add_readings(batch, synced=True)
+
+
+def delete_stale(store, client, gateway_id, page=1000, chunk=100):
+    """Delete this gateway's remote aggregate rows whose key is not in the store; returns counts per table."""
+    deleted = {}
+    for table, key in TABLES.items():
+        local  = {k for (k,) in store._query(f"select {key} from {table}")}
+        remote = {r[key] for r in _pages(lambda: client.table(table).select(key)
+                                         .eq("gateway_id", gateway_id).order(key), page)}
+        stale  = sorted(remote - local)
+        for i in range(0, len(stale), chunk):
+            client.table(table).delete(returning="minimal").eq("gateway_id", gateway_id) \
+                .in_(key, stale[i:i + chunk]).execute()
+        deleted[table] = len(stale)
+    return deleted
+
+
+def overview(store):
+    """The `/api/fleet/overview` response, built from the aggregate tables only."""
+    def rows(table, order=None):
+        cur  = store._db.execute(f"select * from {table}" + (f" order by {order}" if order else ""))
+        cols = [d[0] for d in cur.description]
+        return [dict(zip(cols, r)) for r in cur.fetchall()]
+
+    with store._lock:
+        vehicles, faults = rows("fleet_vehicle_stats", "vin"), rows("fleet_fault_stats")
+        days, sensors    = rows("fleet_daily_stats", "day desc"), rows("fleet_sensor_stats")
+
+    total    = sum(f["readings"] for f in faults)
+    conf_sum = sum(f["confidence_sum"] for f in faults)
+    return {
+        "fleetOverview": {
+            "totalVehicles":     len(vehicles),
+            "totalFaults":       total,
+            "averageConfidence": conf_sum / total * 100 if total else 0,
+            "faultDistribution": {f["fault"]: f["readings"] for f in faults},
+        },
+        "vehicleStats": [{
+            "vin":             v["vin"],
+            "faultCount":      v["readings"],
+            "lastFault":       {"fault": v["last_fault"], "timestamp": v["last_timestamp"],
+                                "confidence": v["last_confidence"],
+                                "sensor_data": json.loads(v["last_sensor_data"] or "null")},
+            "averageSpeed":    v["speed_sum"] / v["speed_n"] if v["speed_n"] else 0,
+            "averageFuelRate": v["fuel_rate_sum"] / v["fuel_rate_n"] if v["fuel_rate_n"] else 0,
+            "criticalMetrics": {"highSpeedCount": v["high_speed"], "highFuelRateCount": v["high_fuel_rate"],
+                                "engineIssuesCount": v["engine_issues"]},
+        } for v in vehicles],
+        "trendAnalysis": {
+            "faultTrends":    [{"date": d["day"], "faultCount": d["readings"],
+                                "avgConfidence": d["confidence_sum"] / d["readings"] * 100} for d in days],
+            "sensorAverages": {s["sensor"]: s["total"] / s["n"] if s["n"] else 0 for s in sensors},
+        },
+    }
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    from clients import supabase
+    from reading_store import ReadingStore, SupabaseSync
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Rebuild or inspect the fleet aggregates")
+    parser.add_argument("--db", default="logs/store/driveledger.db")
+    parser.add_argument("--gateway", default=os.getenv("GATEWAY_ID") or socket.gethostname(),
+                        help="GATEWAY_ID the remote rows belong to (as in main.py)")
+    parser.add_argument("--from-supabase", action="store_true",
+                        help="reload this gateway's car_data rows before rebuilding")
+    parser.add_argument("--claim-legacy", action="store_true",
+                        help="with --from-supabase: adopt car_data rows that have no gateway_id")
+    parser.add_argument("--local-only", action="store_true",
+                        help="rebuild the store only; the next sync pushes the rows, stale remote keys stay")
+    parser.add_argument("cmd", choices=["rebuild", "overview"])
+    args = parser.parse_args()
+
+    store = ReadingStore(args.db)
+    try:
+        if args.cmd == "overview":
+            print(json.dumps(overview(store), indent=2))
+        else:
+            if args.from_supabase:
+                if args.claim_legacy:
+                    print(f"📥 Claimed {claim_legacy(supabase, args.gateway):,} legacy car_data rows")
+                print(f"📥 Loaded {backfill(store, supabase, args.gateway):,} readings from car_data")
+            try:
+                total = rebuild(store, allow_pruned=args.from_supabase)
+            except RuntimeError as e:
+                raise SystemExit(f"❌ {e}")
+            print(f"✅ Rebuilt fleet aggregates from {total:,} readings")
+            if not args.local_only:
+                sync = SupabaseSync(store, {t: remote_upsert(supabase, t, args.gateway) for t in TABLES})
+                sync.drain()
+                print(f"☁️  Pushed {sum(sync.pushed.values()):,} rows for gateway {args.gateway}; "
+                      f"deleted stale {delete_stale(store, supabase, args.gateway)}")
+    finally:
+        store.close()
@@ -0,0 +1,254 @@
+# fleet_sim.py
+"""
+Fleet-scale load generator: thousands of VINs, each with its own reporting
+rate, jitter and fault profile, generated in vectorized blocks.
+
+    sim = FleetSimulator(vehicles=5000, rate_hz=0.5, target_rps=2000, seed=7)
+    for batch in micro_batches(sim.readings()):   # same dicts as stream_readings()
+        ...
+    for block in sim.blocks():                    # or skip the dicts entirely
+        classifier.predict_matrix(block.X)
+
+    python fleet_sim.py --vehicles 5000 --target-rps 2000 --seconds 10 --infer
+
+Time is simulated in windows of `block_s`. Every vehicle keeps its own
+next-due time; each window collects the readings due in it (one vectorized
+pass per reading-per-vehicle in the window), samples their columns with the
+generator's distributions and applies `FAULT_TYPES` effects from each
+vehicle's profile. Block k always draws from `default_rng([seed, 1, k])`,
+so the same seed gives the same readings however fast they are consumed.
+
+`realtime=True` is open-loop: block k is released when its window ends on
+the wall clock, whether or not the consumer kept up; the delay is reported
+as lag (and, with `to_queue`, a full queue drops the block instead of
+slowing the schedule). `realtime=False` generates as fast as possible.
+"""
+import argparse
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from batch_inference import FEATURE_NAMES
+from generate_fake_training_data import LABELS, _apply_faults, _base_columns, _natural_labels
+
+VIN_CHARS = np.array(list("ABCDEFGHJKLMNPRSTUVWXYZ0123456789"))  # no I, O, Q
+
+# clean:      sample base readings below every fault threshold
+# fault_rate: share of readings that get a forced fault
+# faults:     weights over FAULT_TYPES for forced faults (None = uniform)
+PROFILES = {
+    "healthy":   {"clean": True,  "fault_rate": 0.0,  "faults": None},
+    "normal":    {"clean": False, "fault_rate": 0.0,  "faults": None},
+    "degrading": {"clean": True,  "fault_rate": 0.02, "faults": {"coolant_overheat": 3, "fuel_low": 1,
+                                                                 "air_flow_low": 2, "fuel_rate_high": 2}},
+    "faulty":    {"clean": False, "fault_rate": 0.25, "faults": None},
+}
+DEFAULT_MIX = {"healthy": 0.6, "normal": 0.3, "degrading": 0.08, "faulty": 0.02}
+
+
+def make_vins(rng, n):
+    """`n` distinct 17-character VINs."""
+    vins = set()
+    while len(vins) < n:
+        vins.update("".join(row) for row in rng.choice(VIN_CHARS, (n - len(vins), 17)))
+    return sorted(vins)
+
+
+class FleetBlock:
+    """Readings due in one window: VINs, sim-time offsets, (n, 20) features, injected labels."""
+
+    def __init__(self, index, start, offsets, vins, cols, labels):
+        self.index   = index
+        self.start   = start
+        self.offsets = offsets
+        self.vins    = vins
+        self.cols    = cols
+        self.labels  = labels
+        self.X       = np.column_stack([np.asarray(cols[c], dtype=np.float64) for c in FEATURE_NAMES])
+
+    def __len__(self):
+        return len(self.vins)
+
+    @property
+    def faults(self):
+        return np.array(LABELS, dtype=object)[self.labels]
+
+    def readings(self):
+        """Dicts shaped like `simulate_obd.generate_reading()`."""
+        stamps = [(self.start + timedelta(seconds=s)).isoformat() for s in self.offsets.tolist()]
+        values = [self.cols[c].tolist() for c in FEATURE_NAMES]
+        keys   = ["timestamp"] + FEATURE_NAMES + ["vin"]
+        return [dict(zip(keys, row)) for row in zip(stamps, *values, self.vins.tolist())]
+
+
+class FleetSimulator:
+    """
+    `vehicles` VINs whose rates are drawn around `rate_hz` (lognormal,
+    `rate_spread` sigma) and, with `target_rps`, rescaled so the whole fleet
+    emits that many readings per second. Each interval is stretched by up
+    to ±`jitter` of itself. `mix` assigns `PROFILES` by share.
+    """
+
+    def __init__(self, vehicles=1000, rate_hz=1.0, rate_spread=0.5, jitter=0.2, mix=None,
+                 target_rps=None, block_s=0.1, realtime=True, seed=0, start=None):
+        rng = np.random.default_rng([seed, 0])
+        mix = mix or DEFAULT_MIX
+
+        self.seed      = seed
+        self.block_s   = block_s
+        self.realtime  = realtime
+        self.start     = start or datetime.now(timezone.utc).replace(tzinfo=None)
+        self.vins      = np.array(make_vins(rng, vehicles))
+        self.profiles  = list(mix)
+        self.profile   = rng.choice(len(mix), vehicles, p=np.array(list(mix.values())) / sum(mix.values()))
+        self.rate      = rate_hz * rng.lognormal(0.0, rate_spread, vehicles)
+        if target_rps:
+            self.rate *= target_rps / self.rate.sum()
+        self.jitter    = np.full(vehicles, float(jitter))
+        self._next_t   = rng.uniform(0.0, 1.0 / self.rate)  # stagger first readings
+        self._block    = 0
+
+        self._clean      = np.array([PROFILES[p]["clean"] for p in self.profiles])[self.profile]
+        self._fault_rate = np.array([PROFILES[p]["fault_rate"] for p in self.profiles])[self.profile]
+        self._fault_p    = []
+        for p in self.profiles:
+            weights = PROFILES[p]["faults"] or {}
+            w = np.array([weights.get(f, 0.0 if weights else 1.0) for f in LABELS[1:]], dtype=np.float64)
+            self._fault_p.append(w / w.sum())
+
+        self.emitted = 0
+        self.dropped = 0
+        self.max_lag = 0.0
+
+    @property
+    def aggregate_rps(self):
+        return float(self.rate.sum())
+
+    # ─── Generation ────────────────────────────────────────────────────────
+    def _due(self, rng, t_end):
+        """(vehicle index, sim time) of every reading due before `t_end`, in time order."""
+        idx, times = [], []
+        due = np.flatnonzero(self._next_t < t_end)
+        while due.size:
+            idx.append(due)
+            times.append(self._next_t[due].copy())
+            step = (1.0 + self.jitter[due] * rng.uniform(-1.0, 1.0, due.size)) / self.rate[due]
+            self._next_t[due] += step
+            due = due[self._next_t[due] < t_end]
+        if not idx:
+            return np.empty(0, np.int64), np.empty(0)
+        idx, times = np.concatenate(idx), np.concatenate(times)
+        order = np.argsort(times, kind="stable")
+        return idx[order], times[order]
+
+    def next_block(self):
+        k = self._block
+        self._block += 1
+        rng        = np.random.default_rng([self.seed, 1, k])
+        veh, times = self._due(rng, (k + 1) * self.block_s)
+        n          = len(veh)
+
+        cols   = _base_columns(rng, n, clean=self._clean[veh])
+        labels = _natural_labels(cols)
+        forced = np.flatnonzero(rng.random(n) < self._fault_rate[veh])
+        for p, probs in enumerate(self._fault_p):
+            rows = forced[self.profile[veh[forced]] == p]
+            if rows.size:
+                labels[rows] = rng.choice(np.arange(1, len(LABELS)), rows.size, p=probs)
+        _apply_faults(rng, cols, labels)
+        self.emitted += n
+        return FleetBlock(k, self.start, times, self.vins[veh], cols, labels)
+
+    # ─── Feeding ───────────────────────────────────────────────────────────
+    def blocks(self, duration_s=None):
+        """Blocks for `duration_s` of simulated time (forever if None), paced by `realtime`."""
+        wall0 = time.monotonic()
+        while duration_s is None or self._block * self.block_s < duration_s:
+            block = self.next_block()
+            if self.realtime:
+                delay = wall0 + (block.index + 1) * self.block_s - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    self.max_lag = max(self.max_lag, -delay)
+            yield block
+
+    def readings(self, duration_s=None):
+        """Reading dicts one at a time, e.g. for `micro_batches()` in place of `stream_readings()`."""
+        for block in self.blocks(duration_s):
+            yield from block.readings()
+
+    def to_queue(self, q, duration_s=None, as_readings=False):
+        """
+        Put blocks (or lists of reading dicts) on `q` from a daemon thread.
+        A full queue drops the block rather than delaying the schedule; None
+        is put at the end. Returns the thread.
+        """
+        def run():
+            for block in self.blocks(duration_s):
+                try:
+                    q.put_nowait(block.readings() if as_readings else block)
+                except queue.Full:
+                    self.dropped += len(block)
+            q.put(None)
+
+        t = threading.Thread(target=run, name="fleet-sim", daemon=True)
+        t.start()
+        return t
+
+    def stats(self):
+        return {
+            "vehicles":      len(self.vins),
+            "aggregate_rps": round(self.aggregate_rps, 1),
+            "sim_s":         round(self._block * self.block_s, 3),
+            "emitted":       self.emitted,
+            "dropped":       self.dropped,
+            "max_lag_s":     round(self.max_lag, 4),
+            "profiles":      dict(Counter(np.array(self.profiles)[self.profile].tolist())),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate fleet-scale OBD load")
+    parser.add_argument("--vehicles", type=int, default=1000)
+    parser.add_argument("--rate-hz", type=float, default=1.0, help="Median per-vehicle rate")
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--target-rps", type=float, default=None, help="Rescale rates to this fleet total")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Simulated duration")
+    parser.add_argument("--asap", action="store_true", help="Ignore the wall clock")
+    parser.add_argument("--dicts", action="store_true", help="Also build reading dicts (as main.py consumes them)")
+    parser.add_argument("--infer", action="store_true", help="Classify every block with the active model")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sim = FleetSimulator(args.vehicles, args.rate_hz, jitter=args.jitter, target_rps=args.target_rps,
+                         realtime=not args.asap, seed=args.seed)
+    model = None
+    if args.infer:
+        from model_registry import load_version
+        model = load_version("logs/fit", "run_1").predictor
+
+    print(f"🚗 {args.vehicles} vehicles, {sim.aggregate_rps:,.0f} readings/s scheduled, "
+          f"{'as fast as possible' if args.asap else 'real time'}")
+    truth, correct = Counter(), 0
+    t0 = time.perf_counter()
+    for block in sim.blocks(args.seconds):
+        if args.dicts:
+            block.readings()
+        truth.update(dict(zip(LABELS, np.bincount(block.labels, minlength=len(LABELS)).tolist())))
+        if model is not None and len(block):
+            faults   = np.array([f for f, _ in model.predict_matrix(block.X)], dtype=object)
+            correct += int((faults == block.faults).sum())
+    elapsed = time.perf_counter() - t0
+
+    st = sim.stats()
+    print(f"✅ {st['emitted']:,} readings in {elapsed:.2f}s wall ({st['emitted'] / elapsed:,.0f}/s), "
+          f"max lag {st['max_lag_s']}s")
+    print(f"   profiles {st['profiles']}")
+    print(f"   labels   { {k: v for k, v in truth.most_common() if v} }")
+    if model is not None and st["emitted"]:
+        print(f"   model accuracy vs injected labels {correct / st['emitted']:.4f}")
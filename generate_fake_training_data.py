@@ -1,9 +1,15 @@
-import random
+import os
 import csv
+import json
+import random
+import shutil
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from typing import Optional, Dict, Any
 
+import numpy as np
+
 # ─── Define the 10 fault types ────────────────────────────────────────────────
 FAULT_TYPES = [
     "coolant_overheat",   # coolant_temp too high
@@ -109,40 +115,272 @@ def generate_fake_obd_data(force_fault: Optional[str] = None) -> Dict[str, Any]:
     return data
 
 
-def save_fake_data_csv(
-    filename: str = "training_data.csv",
+# ─── Vectorized generation ───────────────────────────────────────────────────
+# Same distributions and fault effects as generate_fake_obd_data(), but whole
+# columns are sampled per chunk with NumPy. Chunk k always draws from
+# default_rng([seed, k]), so output is identical for any --workers value.
+FEATURE_COLUMNS = [
+    "engine_load", "coolant_temp", "fuel_pressure", "intake_manifold_p",
+    "rpm", "speed", "timing_advance", "intake_air_temp", "air_flow_rate",
+    "throttle_pos", "engine_run_time", "fuel_level", "warmups_since_clear",
+    "barometric_p", "ambient_air_temp", "cmd_throttle_act",
+    "time_with_mil_on", "time_since_codes", "hybrid_batt_life", "fuel_rate",
+]
+INT_COLUMNS  = {"rpm", "engine_run_time", "warmups_since_clear", "time_with_mil_on", "time_since_codes"}
+LABELS       = ["none"] + FAULT_TYPES        # fault_code index; 0 = none
+CHUNK_SIZE   = 100_000
+
+
+def _uniform(rng, lo, hi, n):
+    return np.round(rng.uniform(lo, hi, n), 2)
+
+
+def _drive_cycle(rng, n):
+    """rpm → speed → throttle, as in generate_fake_obd_data()."""
+    rpm      = rng.normal(2500, 800, n)
+    speed    = rpm / 40 + rng.uniform(-5, 5, n)
+    throttle = np.clip(speed * 0.5 + rng.uniform(-10, 10, n), 0.0, 100.0)
+    return np.trunc(rpm).astype(np.int64), np.round(speed, 2), throttle
+
+
+def _base_columns(rng, n, clean=None):
+    """
+    Normal readings. Rows in the `clean` mask are drawn conditioned on
+    tripping none of the natural fault thresholds: uniform columns use the
+    truncated range directly; the Gaussian-driven coolant and rpm/speed/
+    throttle groups are redrawn in place for the few percent that cross one.
+    """
+    clean = np.zeros(n, dtype=bool) if clean is None else clean
+    cap   = lambda hi, clean_hi: np.where(clean, clean_hi, hi)
+
+    coolant = np.round(rng.normal(95.0, 10.0, n), 2)
+    redraw  = clean & (coolant > 115)
+    while redraw.any():
+        coolant[redraw] = np.round(rng.normal(95.0, 10.0, redraw.sum()), 2)
+        redraw = clean & (coolant > 115)
+
+    rpm, speed, throttle = _drive_cycle(rng, n)
+    redraw = clean & ((rpm > 5500) | (speed > 120) | (np.round(throttle, 2) < 5) | (np.round(throttle, 2) > 95))
+    while redraw.any():
+        rpm[redraw], speed[redraw], throttle[redraw] = _drive_cycle(rng, redraw.sum())
+        redraw = clean & ((rpm > 5500) | (speed > 120) | (np.round(throttle, 2) < 5) | (np.round(throttle, 2) > 95))
+
+    return {
+        "engine_load":          _uniform(rng, 20.0, 90.0, n),
+        "coolant_temp":         coolant,
+        "fuel_pressure":        _uniform(rng, 30.0, 70.0, n),
+        "intake_manifold_p":    _uniform(rng, 30.0, 90.0, n),
+        "rpm":                  rpm,
+        "speed":                speed,
+        "timing_advance":       _uniform(rng, -5.0, 25.0, n),
+        "intake_air_temp":      _uniform(rng, 15.0, cap(50.0, 45.0), n),
+        "air_flow_rate":        _uniform(rng, np.where(clean, 20.0, 10.0), 200.0, n),
+        "throttle_pos":         np.round(throttle, 2),
+        "engine_run_time":      rng.integers(0, 36000, n, endpoint=True),
+        "fuel_level":           _uniform(rng, 5.0, 100.0, n),
+        "warmups_since_clear":  rng.integers(0, 50, n, endpoint=True),
+        "barometric_p":         _uniform(rng, np.where(clean, 88.0, 85.0), 105.0, n),
+        "ambient_air_temp":     _uniform(rng, -5.0, cap(35.0, 30.0), n),
+        "cmd_throttle_act":     np.round(throttle + rng.uniform(-5, 5, n), 2),
+        "time_with_mil_on":     rng.integers(0, 3600 * 2, n, endpoint=True),
+        "time_since_codes":     rng.integers(0, 3600 * 24 * 7, n, endpoint=True),
+        "hybrid_batt_life":     _uniform(rng, 50.0, 100.0, n),
+        "fuel_rate":            _uniform(rng, 1.0, cap(20.0, 18.0), n),
+    }
+
+
+def _natural_labels(cols):
+    """First matching threshold wins, in the same order as generate_fake_obd_data()."""
+    conditions = [
+        cols["coolant_temp"] > 115,
+        cols["fuel_level"] < 5,
+        cols["rpm"] > 5500,
+        cols["speed"] > 120,
+        (cols["throttle_pos"] < 5) | (cols["throttle_pos"] > 95),
+        cols["intake_air_temp"] > 45,
+        cols["air_flow_rate"] < 20,
+        cols["barometric_p"] < 88,
+        cols["ambient_air_temp"] > 30,
+        cols["fuel_rate"] > 18,
+    ]
+    return np.select(conditions, np.arange(1, len(LABELS)), default=0).astype(np.uint8)
+
+
+def _apply_faults(rng, cols, labels):
+    effects = {
+        "coolant_overheat": lambda m: {"coolant_temp": _uniform(rng, 120.0, 140.0, m)},
+        "fuel_low":         lambda m: {"fuel_level": _uniform(rng, 0.0, 4.0, m)},
+        "rpm_spike":        lambda m: {"rpm": rng.integers(5600, 7000, m, endpoint=True)},
+        "speed_high":       lambda m: {"speed": _uniform(rng, 125.0, 180.0, m)},
+        "intake_temp_high": lambda m: {"intake_air_temp": _uniform(rng, 50.0, 70.0, m)},
+        "air_flow_low":     lambda m: {"air_flow_rate": _uniform(rng, 0.0, 10.0, m)},
+        "barometric_low":   lambda m: {"barometric_p": _uniform(rng, 60.0, 87.0, m)},
+        "ambient_high":     lambda m: {"ambient_air_temp": _uniform(rng, 35.0, 50.0, m)},
+        "fuel_rate_high":   lambda m: {"fuel_rate": _uniform(rng, 20.0, 50.0, m)},
+    }
+    for code, fault in enumerate(LABELS[1:], start=1):
+        mask = labels == code
+        m    = int(mask.sum())
+        if not m:
+            continue
+        if fault == "throttle_stuck":
+            stuck = rng.choice([0.0, 100.0], m)
+            cols["throttle_pos"][mask] = stuck
+            cols["cmd_throttle_act"][mask] = stuck
+        else:
+            for col, values in effects[fault](m).items():
+                cols[col][mask] = values
+
+
+def generate_chunk(seed, chunk, n, chunk_size=CHUNK_SIZE, balance_labels=True, start_us=0):
+    """
+    Rows `[chunk * chunk_size, …)` of an `n`-row dataset as `(columns, labels)`.
+
+    With `balance_labels` the first half of the dataset is faults (type drawn
+    uniformly) and the second half clean readings, as save_fake_data_csv()
+    always produced; otherwise labels follow the natural thresholds.
+    """
+    rng   = np.random.default_rng([seed, chunk])
+    first = chunk * chunk_size
+    count = min(chunk_size, n - first)
+    if balance_labels:
+        is_fault = np.arange(first, first + count) < n // 2
+        labels   = np.where(is_fault, rng.integers(1, len(LABELS), count), 0).astype(np.uint8)
+        cols     = _base_columns(rng, count, clean=~is_fault)
+    else:
+        cols   = _base_columns(rng, count)
+        labels = _natural_labels(cols)
+    _apply_faults(rng, cols, labels)
+    cols["timestamp"] = start_us + np.arange(first, first + count, dtype=np.int64)
+    return cols, labels
+
+
+CSV_HEADER = ["timestamp"] + FEATURE_COLUMNS + ["fault_code", "verdict"]
+
+
+def chunk_rows(cols, labels):
+    """A generated chunk as CSV rows in the original column order."""
+    out = [np.datetime_as_string(cols["timestamp"].astype("datetime64[us]")).tolist()]
+    out += [cols[c].tolist() for c in FEATURE_COLUMNS]
+    out.append(np.array(LABELS)[labels].tolist())
+    out.append(np.where(labels > 0, "fault", "OK").tolist())
+    return zip(*out)
+
+
+# ─── Binary columnar output ───────────────────────────────────────────────────
+# <dir>/<column>.npy (memory-mappable) + meta.json; fault_code is stored as a
+# uint8 index into meta["labels"] and timestamp as int64 µs since the epoch.
+def _column_dtype(col):
+    if col == "timestamp":
+        return np.int64
+    if col == "fault_code":
+        return np.uint8
+    return np.int64 if col in INT_COLUMNS else np.float64
+
+
+def _create_columns(path, n):
+    os.makedirs(path, exist_ok=True)
+    for col in ["timestamp"] + FEATURE_COLUMNS + ["fault_code"]:
+        np.lib.format.open_memmap(os.path.join(path, f"{col}.npy"), mode="w+",
+                                  dtype=_column_dtype(col), shape=(n,)).flush()
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump({"rows": n, "columns": ["timestamp"] + FEATURE_COLUMNS + ["fault_code"],
+                   "labels": LABELS}, f, indent=2)
+
+
+def _fill_columns(path, first, cols, labels):
+    values = dict(cols, fault_code=labels)
+    for col, arr in values.items():
+        mm = np.lib.format.open_memmap(os.path.join(path, f"{col}.npy"), mode="r+")
+        mm[first:first + len(arr)] = arr
+        mm.flush()
+        del mm
+
+
+def load_columns(path):
+    """Memory-map a columnar dataset; returns `({column: array}, labels)`."""
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    cols = {c: np.load(os.path.join(path, f"{c}.npy"), mmap_mode="r") for c in meta["columns"]}
+    return cols, meta["labels"]
+
+
+# ─── Writers ─────────────────────────────────────────────────────────────────
+def _write_shard(job):
+    """Generate chunks [lo, hi) into one CSV part file and/or the column files."""
+    csv_path, cols_dir, seed, lo, hi, n, chunk_size, balance_labels, start_us = job
+    counts = np.zeros(len(LABELS), dtype=np.int64)
+    f = open(csv_path, "w", newline="") if csv_path else None
+    try:
+        writer = csv.writer(f) if f else None
+        if writer and lo == 0:
+            writer.writerow(CSV_HEADER)
+        for chunk in range(lo, hi):
+            cols, labels = generate_chunk(seed, chunk, n, chunk_size, balance_labels, start_us)
+            counts += np.bincount(labels, minlength=len(LABELS))
+            if writer:
+                writer.writerows(chunk_rows(cols, labels))
+            if cols_dir:
+                _fill_columns(cols_dir, chunk * chunk_size, cols, labels)
+    finally:
+        if f:
+            f.close()
+    return counts
+
+
+def save_fake_data(
+    filename: Optional[str] = "training_data.csv",
     n: int = 1000,
     balance_labels: bool = True,
-    seed: Optional[int] = None
+    seed: Optional[int] = None,
+    columns_dir: Optional[str] = None,
+    workers: int = 1,
+    chunk_size: int = CHUNK_SIZE,
+    start: Optional[datetime] = None,
 ):
-    if seed is not None:
-        random.seed(seed)
-
-    rows, counts = [], {"OK": 0, "fault": 0}
-    half = n // 2
-
-    while len(rows) < n:
-        if balance_labels:
-            want_fault = len(rows) < half
-            row = generate_fake_obd_data("random" if want_fault else None)
-            # enforce exact balance
-            if want_fault and row["verdict"] == "OK":
-                continue
-            if not want_fault and row["verdict"] == "fault":
-                continue
-        else:
-            row = generate_fake_obd_data()
+    """
+    Stream `n` rows to a CSV (`filename`) and/or a columnar directory, one
+    chunk at a time. With `workers > 1` contiguous shards of chunks are
+    generated in separate processes; CSV parts are concatenated in order.
+    Pass `start` as well as `seed` for byte-identical CSVs across runs.
+    """
+    seed     = random.SystemRandom().randrange(2**32) if seed is None else seed
+    start_us = int(((start or datetime.utcnow()) - datetime(1970, 1, 1)).total_seconds() * 1e6)
+    chunks   = -(-n // chunk_size)
+    workers  = max(1, min(workers, chunks))
+    if columns_dir:
+        _create_columns(columns_dir, n)
 
-        rows.append(row)
-        counts[row["verdict"]] += 1
+    bounds = np.linspace(0, chunks, workers + 1).astype(int)
+    parts  = [f"{filename}.part{i:03d}" if filename and workers > 1 else filename for i in range(workers)]
+    jobs   = [(parts[i], columns_dir, seed, bounds[i], bounds[i + 1], n, chunk_size, balance_labels, start_us)
+              for i in range(workers)]
+    if workers == 1:
+        counts = [_write_shard(jobs[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            counts = list(pool.map(_write_shard, jobs))
+        if filename:
+            with open(filename, "wb") as out:
+                for part in parts:
+                    with open(part, "rb") as f:
+                        shutil.copyfileobj(f, out, 1 << 20)
+                    os.remove(part)
 
-    # ─── Write CSV ───────────────────────────────────────────────────────────────
-    with open(filename, "w", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
-        writer.writeheader()
-        writer.writerows(rows)
+    counts = np.sum(counts, axis=0)
+    ok = int(counts[0])
+    targets = " and ".join(t for t in (filename, columns_dir) if t)
+    print(f"✅ Saved {n} rows to {targets} (OK: {ok}, fault: {n - ok}, seed: {seed})")
+    return seed
 
-    print(f"✅ Saved {n} rows to {filename} (OK: {counts['OK']}, fault: {counts['fault']})")
+
+def save_fake_data_csv(
+    filename: str = "training_data.csv",
+    n: int = 1000,
+    balance_labels: bool = True,
+    seed: Optional[int] = None
+):
+    save_fake_data(filename=filename, n=n, balance_labels=balance_labels, seed=seed)
 
 
 if __name__ == "__main__":
@@ -157,11 +395,29 @@ if __name__ == "__main__":
                         help="Generate half fault, half OK rows")
     parser.add_argument("--seed",     type=int, default=None,
                         help="Random seed for reproducibility")
+    parser.add_argument("--format",   choices=["csv", "columns", "both"], default="csv",
+                        help="CSV, a directory of .npy columns, or both")
+    parser.add_argument("--columns-dir", type=str, default=None,
+                        help="Columnar output directory (default: <filename stem>.cols)")
+    parser.add_argument("--workers",  type=int, default=1,
+                        help="Processes to shard generation across")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help="Rows generated per vectorized chunk")
+    parser.add_argument("--start",    type=datetime.fromisoformat, default=None,
+                        help="Timestamp of the first row (default: now)")
     args = parser.parse_args()
 
-    save_fake_data_csv(
-        filename=args.filename,
+    columns_dir = None
+    if args.format in ("columns", "both"):
+        columns_dir = args.columns_dir or os.path.splitext(args.filename)[0] + ".cols"
+
+    save_fake_data(
+        filename=args.filename if args.format in ("csv", "both") else None,
         n=args.n,
         balance_labels=args.balance,
-        seed=args.seed
+        seed=args.seed,
+        columns_dir=columns_dir,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        start=args.start,
     )
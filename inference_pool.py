@@ -0,0 +1,256 @@
+# inference_pool.py
+"""
+Multi-process inference: N worker processes, each with its own
+`ModelRegistry` (interpreter, scaler, hot swaps), fed through shared memory.
+
+    pool = InferencePool(workers=4).start()
+    results = pool.predict(readings)                # same output as the registry
+    for results in pool.imap(batches): ...          # up to `in_flight` batches queued
+    pool.close()
+
+Rows are sharded by a stable hash of their VIN (`zlib.crc32`, not Python's
+salted `hash`), so one vehicle's readings always go to the same worker and
+are scored in arrival order there. Workers keep no per-vehicle state, so
+this is only a preference: a batch with fewer distinct VINs than workers
+(e.g. one car) is split evenly instead, or a single VIN would keep every
+other worker idle. Every worker owns `slots` input buffers
+of `(max_rows, 20)` float32 and matching output buffers (int16 fault index,
+float32 confidence) in one `SharedMemory` block; only `(slot, rows)` tuples
+cross the process boundary. Results are written back by row position, so
+each batch comes out in input order and `imap` yields batches in
+submission order.
+"""
+import multiprocessing as mp
+import queue
+import time
+import zlib
+from collections import deque
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from batch_inference import FEATURE_NAMES, readings_to_matrix
+
+N_FEATURES = len(FEATURE_NAMES)
+
+
+def shard_of(vin, workers):
+    return zlib.crc32(str(vin).encode()) % workers
+
+
+def _buffers(buf, slots, max_rows):
+    """(inputs, fault indices, confidences) views over one worker's shared block."""
+    x_bytes = slots * max_rows * N_FEATURES * 4
+    X    = np.ndarray((slots, max_rows, N_FEATURES), np.float32, buf, 0)
+    idx  = np.ndarray((slots, max_rows), np.int16, buf, x_bytes)
+    conf = np.ndarray((slots, max_rows), np.float32, buf, x_bytes + slots * max_rows * 2)
+    return X, idx, conf
+
+
+def _block_size(slots, max_rows):
+    return slots * max_rows * (N_FEATURES * 4 + 2 + 4)
+
+
+def _worker(wid, shm_name, slots, max_rows, tasks, results, registry_kwargs):
+    from model_registry import ModelRegistry
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    X, out_idx, out_conf = _buffers(shm.buf, slots, max_rows)
+    registry = ModelRegistry(**registry_kwargs).start()
+    codes, sent = {}, None
+    results.put((wid, None, 0, "ready", None))
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            slot, n = task
+            try:
+                faults = registry.predict_matrix(X[slot, :n])
+                names  = registry.active.predictor.fault_codes
+                if names != sent:
+                    codes, sent = {f: i for i, f in enumerate(names)}, list(names)
+                    update = sent
+                else:
+                    update = None
+                out_idx[slot, :n]  = [codes[f] for f, _ in faults]
+                out_conf[slot, :n] = [c for _, c in faults]
+                results.put((wid, slot, n, None, update))
+            except Exception as e:
+                results.put((wid, slot, n, repr(e), None))
+    finally:
+        registry.close()
+        del X, out_idx, out_conf
+        shm.close()
+
+
+class InferencePool:
+    """
+    `workers` processes scoring VIN-sharded rows. `registry_kwargs` go to
+    each worker's `ModelRegistry`; every worker polls the same ACTIVE
+    pointer, so promotions reach all of them within `poll_s`. Dispatch is
+    not thread-safe: submit and collect from one thread.
+    """
+
+    def __init__(self, workers=None, slots=4, max_rows=256, in_flight=4, start_method="spawn",
+                 **registry_kwargs):
+        self.workers   = workers or mp.cpu_count()
+        self.slots     = slots
+        self.max_rows  = max_rows
+        self.in_flight = in_flight
+        self.registry_kwargs = registry_kwargs
+
+        self._ctx      = mp.get_context(start_method)
+        self._results  = self._ctx.Queue()
+        self._procs    = []
+        self._tasks    = []
+        self._shms     = []
+        self._views    = []
+        self._free     = []
+        self._codes    = [None] * self.workers
+        self._chunks   = {}   # (worker, slot) → (batch, row positions)
+        self._batches  = {}   # batch id → [faults, confs, chunks left, error]
+        self._next_id  = 0
+
+        self.rows_by_worker = [0] * self.workers
+        self.batches        = 0
+
+    # ─── Lifecycle ─────────────────────────────────────────────────────────
+    def start(self):
+        for wid in range(self.workers):
+            shm = shared_memory.SharedMemory(create=True, size=_block_size(self.slots, self.max_rows))
+            tasks = self._ctx.Queue()
+            proc = self._ctx.Process(target=_worker, name=f"inference-{wid}", daemon=True,
+                                     args=(wid, shm.name, self.slots, self.max_rows, tasks, self._results,
+                                           self.registry_kwargs))
+            proc.start()
+            self._shms.append(shm)
+            self._views.append(_buffers(shm.buf, self.slots, self.max_rows))
+            self._tasks.append(tasks)
+            self._procs.append(proc)
+            self._free.append(deque(range(self.slots)))
+        try:
+            for _ in range(self.workers):
+                self._collect()  # "ready" from each worker, or its startup error
+        except Exception:
+            self.close()
+            raise
+        return self
+
+    def close(self):
+        for tasks in self._tasks:
+            tasks.put(None)
+        for proc in self._procs:
+            proc.join(timeout=10)
+            if proc.is_alive():
+                proc.terminate()
+        self._views.clear()
+        for shm in self._shms:
+            shm.close()
+            shm.unlink()
+        self._procs, self._tasks, self._shms = [], [], []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ─── Dispatch ──────────────────────────────────────────────────────────
+    def _collect(self, timeout=30.0):
+        """Apply one worker reply to its batch."""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                wid, slot, n, err, codes = self._results.get(timeout=1.0)
+                break
+            except queue.Empty:
+                dead = [p.name for p in self._procs if not p.is_alive()]
+                if dead or time.monotonic() > deadline:
+                    raise RuntimeError(f"inference workers not responding (dead: {', '.join(dead) or 'none'})")
+        if codes is not None:
+            self._codes[wid] = codes
+        if slot is None:
+            if err and err != "ready":
+                raise RuntimeError(f"inference worker {wid} failed to start: {err}")
+            return
+        batch_id, positions = self._chunks.pop((wid, slot))
+        batch = self._batches[batch_id]
+        if err:
+            batch[3] = err
+        else:
+            _, out_idx, out_conf = self._views[wid]
+            batch[0][positions] = np.asarray(self._codes[wid], dtype=object)[out_idx[slot, :n]]
+            batch[1][positions] = out_conf[slot, :n]
+        batch[2] -= 1
+        self._free[wid].append(slot)
+
+    def submit(self, X, vins=None):
+        """
+        Queue one batch; returns its id. Rows are split evenly across workers
+        without `vins`, or when the batch has fewer distinct VINs than workers.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        n = len(X)
+        if vins is not None and len(set(vins)) < self.workers:
+            vins = None
+        if vins is None:
+            shards = np.arange(n) * self.workers // max(n, 1)
+        else:
+            shards = np.fromiter((shard_of(v, self.workers) for v in vins), np.int64, n)
+
+        batch_id, self._next_id = self._next_id, self._next_id + 1
+        batch = self._batches[batch_id] = [np.empty(n, dtype=object), np.empty(n, np.float32), 0, None]
+        for wid in range(self.workers):
+            rows = np.flatnonzero(shards == wid)
+            for start in range(0, len(rows), self.max_rows):
+                positions = rows[start:start + self.max_rows]
+                while not self._free[wid]:
+                    self._collect()
+                slot = self._free[wid].popleft()
+                self._views[wid][0][slot, :len(positions)] = X[positions]
+                self._chunks[(wid, slot)] = (batch_id, positions)
+                batch[2] += 1
+                self._tasks[wid].put((slot, len(positions)))
+                self.rows_by_worker[wid] += len(positions)
+        self.batches += 1
+        return batch_id
+
+    def result(self, batch_id):
+        """Wait for a submitted batch; `(fault, confidence)` rows in input order."""
+        batch = self._batches[batch_id]
+        while batch[2]:
+            self._collect()
+        del self._batches[batch_id]
+        if batch[3]:
+            raise RuntimeError(f"inference worker error: {batch[3]}")
+        return list(zip(batch[0].tolist(), batch[1].tolist()))
+
+    # ─── Predictor interface ───────────────────────────────────────────────
+    def predict_matrix(self, X, vins=None):
+        if not len(X):
+            return []
+        return self.result(self.submit(X, vins))
+
+    def predict(self, readings):
+        if not readings:
+            return []
+        return self.predict_matrix(readings_to_matrix(readings), [r.get("vin") for r in readings])
+
+    def imap(self, batches):
+        """`predict()` over an iterable of reading lists, keeping up to `in_flight` batches queued."""
+        pending = deque()
+        for readings in batches:
+            pending.append(self.submit(readings_to_matrix(readings), [r.get("vin") for r in readings]))
+            if len(pending) >= self.in_flight:
+                yield self.result(pending.popleft())
+        while pending:
+            yield self.result(pending.popleft())
+
+    def stats(self):
+        return {
+            "workers":        self.workers,
+            "batches":        self.batches,
+            "rows_by_worker": list(self.rows_by_worker),
+            "alive":          sum(p.is_alive() for p in self._procs),
+        }
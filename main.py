@@ -1,116 +1,198 @@
 import os
+import socket
 import time
-import json
-import joblib
-import numpy as np
-import requests
-import tensorflow as tf
-import subprocess
-import hashlib
-import random
+
+from collections import Counter, deque
 
 from datetime import datetime
 from simulate_obd import stream_readings
+from batch_inference import FEATURE_NAMES, micro_batches
+from pipeline import Pipeline, Stage
+from mint_client import MintService
+from token_allocator import TokenAllocator
+from bulk_writer import supabase_upsert
+from outbox import Outbox, Replayer
+import fleet_aggregates
+from reading_store import ReadingStore, SupabaseSync
+from merkle_anchor import AnchorBatcher, MerkleTree
+from clients import Lazy, supabase
+from cascade import CascadeClassifier
+from metrics import Metrics, SummaryReporter
 from colorama import init, Fore, Style
 from dotenv import load_dotenv
-from supabase import create_client, Client
 
 # ─── Environment & Init ─────────────────────────────────────────────────────
+# Importing this module has no side effects beyond reading .env: clients,
+# model artifacts, writer threads and their heavy imports (TensorFlow /
+# tflite_runtime, sklearn, supabase, requests) are created on first use.
 load_dotenv()
-init(autoreset=True)
 
 # Pinata API credentials
 PINATA_API_KEY        = os.getenv("PINATA_API_KEY")
 PINATA_SECRET_API_KEY = os.getenv("PINATA_SECRET_API_KEY")
 
-# Supabase credentials
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Supabase: `clients.supabase`, shared with supabase_client.py and created on
+# first query from SUPABASE_URL / SUPABASE_KEY.
 
 # Configuration
-SCALER_PATH       = "logs/fit/run_1/scaler.pkl"
-TFLITE_PATH       = "logs/fit/run_1/model.tflite"
-CODES_PATH        = "logs/fit/run_1/fault_codes.pkl"
-
-# Where to write the IPFS URL + token ID
-CURRENT_DATA_PATH = "./driverledger-deploy/scripts/current_data.json"
-# Path to local JSON of already-used token IDs
+# Model registry: serves logs/fit/<run>/model.bundle, starting from MODEL_RUN
+# until `python model_registry.py promote run_N` points the ACTIVE file
+# elsewhere; the swap happens between batches without a restart. A run named
+# by `model_registry.py shadow` scores SHADOW_RATE of rows alongside it.
+MODEL_DIR         = "logs/fit"
+MODEL_RUN         = os.getenv("MODEL_RUN", "run_1")
+MODEL_POLL_S      = 10.0
+SHADOW_RATE       = float(os.getenv("SHADOW_RATE", "0.1"))
+
+# Inference backend: "tflite" (default) or "numpy" — the run's folded NumPy
+# model (model_folded.npz), which needs neither TensorFlow nor sklearn
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "tflite")
+
+# TFLite variant for the batched predictor: float32 | float16 | int8
+# (see quant_report.md in the run directory for the accuracy/latency trade-off)
+MODEL_VARIANT     = os.getenv("MODEL_VARIANT", "float32")
+
+# Path to local JSON of already-used token IDs; new IDs are appended to the
+# sibling used_ids.journal and folded back in by TokenAllocator.compact().
+# Gateways minting on the same contract each get their own GATEWAY_SLOT out
+# of GATEWAY_SLOTS and only hand out IDs with id % GATEWAY_SLOTS == slot.
 USED_IDS_PATH     = "./driverledger-deploy/scripts/used_ids.json"
+GATEWAY_SLOT      = int(os.getenv("GATEWAY_SLOT", "0"))
+GATEWAY_SLOTS     = int(os.getenv("GATEWAY_SLOTS", "1"))
+token_allocator   = TokenAllocator(USED_IDS_PATH, max_id=50_000, slot=GATEWAY_SLOT, slots=GATEWAY_SLOTS)
+
+# Micro-batching: flush a batch when it is full or the oldest reading is this old
+BATCH_SIZE        = 64
+BATCH_WAIT_S      = 0.5
+
+# Load testing: FLEET_VEHICLES=N replaces the single simulated car with N
+# VINs from fleet_sim.py, optionally rescaled to FLEET_RPS readings/s in total
+FLEET_VEHICLES    = int(os.getenv("FLEET_VEHICLES", "0"))
+FLEET_RPS         = float(os.getenv("FLEET_RPS", "0")) or None
+FLEET_SEED        = int(os.getenv("FLEET_SEED", "0"))
+
+# Real car: OBD_PORT=/dev/ttyUSB0 polls an ELM327 adapter (obd_poller.py) and
+# assembles a reading every OBD_READING_S from the latest PID values
+OBD_PORT          = os.getenv("OBD_PORT")
+OBD_READING_S     = float(os.getenv("OBD_READING_S", "1.0"))
+
+# Pipeline: per-stage queue bound (backpressure) and concurrent Pinata uploads
+STAGE_QUEUE_SIZE  = 64
+PINATA_WORKERS    = 4
+
+# Local store: every reading, prediction, token ID and IPFS link is written
+# to SQLite on the gateway; a background job upserts unsynced rows to
+# Supabase in batches of SYNC_BATCH_SIZE. Synced rows older than
+# STORE_RETENTION_DAYS are pruned at start-up.
+STORE_PATH           = os.getenv("STORE_PATH", "./logs/store/driveledger.db")
+STORE_RETENTION_DAYS = float(os.getenv("STORE_RETENTION_DAYS", "30"))
+SYNC_BATCH_SIZE      = 500
+SYNC_INTERVAL_S      = 5.0
+# Fleet aggregate rows are pushed under this gateway's ID; the dashboard sums
+# the rows of every gateway. Must be unique and stable per gateway.
+GATEWAY_ID           = os.getenv("GATEWAY_ID") or socket.gethostname()
+
+# Pinata uploader: pooled session, bounded in-flight pins, local CID cache
+PINATA_CID_CACHE  = "./data/pinned_cids.jsonl"
+
+
+def _create_pinata():
+    from pinata_uploader import PinataUploader  # pulls in requests/urllib3
+
+    return PinataUploader(PINATA_API_KEY, PINATA_SECRET_API_KEY,
+                          max_in_flight=PINATA_WORKERS, cache_path=PINATA_CID_CACHE)
+
+
+pinata            = Lazy(_create_pinata)
+
+# Durable log of planned side effects, replayed after outages and restarts
+OUTBOX_PATH       = "./data/outbox.jsonl"
+
+# Anchoring: "reading" pins and mints every reading; "vin" / "fleet" collect
+# readings per vehicle / across the fleet and anchor one Merkle root per window.
+# Open windows are journaled to ANCHOR_JOURNAL_PATH and reopened after a
+# crash, so readings waiting for their window (up to ANCHOR_WINDOW_S) are kept.
+ANCHOR_MODE         = os.getenv("ANCHOR_MODE", "reading")
+ANCHOR_WINDOW_S     = 300.0
+ANCHOR_MAX_READINGS = 256
+ANCHOR_JOURNAL_PATH = "./data/anchor_windows.jsonl"
+
+# Persistent Hardhat mint worker (scripts/mint_service.js); MINT_WORKERS is how
+# many safeMint transactions may be awaiting receipts at once.
+MINT_NETWORK      = os.getenv("MINT_NETWORK", "mumbai")
+MINT_WORKERS      = 4
+mint_service      = MintService(network=MINT_NETWORK)
+
+# Instrumentation: per-stage latency histograms, counters and queue depths,
+# served at http://127.0.0.1:METRICS_PORT/metrics (Prometheus) and
+# /summary.json; METRICS_PORT=0 turns the endpoint off. With
+# METRICS_SUMMARY_PATH set, a JSON summary is appended every
+# METRICS_SUMMARY_S. QUIET=1 replaces the per-reading console dump with one
+# status line per summary interval.
+METRICS_PORT         = int(os.getenv("METRICS_PORT", "9108"))
+METRICS_SUMMARY_S    = float(os.getenv("METRICS_SUMMARY_S", "60"))
+METRICS_SUMMARY_PATH = os.getenv("METRICS_SUMMARY_PATH")
+QUIET                = os.getenv("QUIET", "0") == "1"
+metrics              = Metrics()
 
 # ─── Load Model Artifacts ───────────────────────────────────────────────────
-scaler       = joblib.load(SCALER_PATH)
-fault_codes  = joblib.load(CODES_PATH)
-
-interpreter = tf.lite.Interpreter(model_path=TFLITE_PATH)
-interpreter.allocate_tensors()
-input_details  = interpreter.get_input_details()
-output_details = interpreter.get_output_details()
-
-FEATURE_NAMES = [
-    "engine_load", "coolant_temp", "fuel_pressure", "intake_manifold_p",
-    "rpm", "speed", "timing_advance", "intake_air_temp", "air_flow_rate",
-    "throttle_pos", "engine_run_time", "fuel_level", "warmups_since_clear",
-    "barometric_p", "ambient_air_temp", "cmd_throttle_act",
-    "time_with_mil_on", "time_since_codes", "hybrid_batt_life", "fuel_rate"
-]
+def _create_registry():
+    from model_registry import ModelRegistry
 
-# ─── Helpers ────────────────────────────────────────────────────────────────
-def load_used_ids():
-    """Load the set of used token IDs from JSON file (or create it)."""
-    if not os.path.exists(USED_IDS_PATH):
-        with open(USED_IDS_PATH, "w") as f:
-            json.dump([], f)
-        return set()
-    with open(USED_IDS_PATH, "r") as f:
-        try:
-            data = json.load(f)
-            return set(data)
-        except json.JSONDecodeError:
-            return set()
+    return ModelRegistry(MODEL_DIR, default_run=MODEL_RUN, backend=INFERENCE_BACKEND, variant=MODEL_VARIANT,
+                         max_batch_size=BATCH_SIZE, poll_s=MODEL_POLL_S, shadow_rate=SHADOW_RATE)
 
 
-def save_used_id(nonce: int):
-    """Append a newly used token ID into the JSON file."""
-    used = load_used_ids()
-    used.add(nonce)
-    with open(USED_IDS_PATH, "w") as f:
-        json.dump(sorted(used), f, indent=4)
+# INFERENCE_WORKERS=N scores batches in N processes (inference_pool.py), each
+# with its own registry, rows sharded by VIN, up to INFERENCE_IN_FLIGHT
+# micro-batches at a time; 0 keeps inference in-process.
+INFERENCE_WORKERS   = int(os.getenv("INFERENCE_WORKERS", "0"))
+INFERENCE_IN_FLIGHT = 2 * INFERENCE_WORKERS
 
 
-def generate_token_id() -> int:
-    """Generate a random token ID not already used locally or in Supabase."""
-    used_ids = load_used_ids()
-
-    # Also fetch existing IDs from Supabase to prevent collisions there
-    result = supabase.table("car_nfts").select("nfts").execute()
-    if result.data:
-        for row in result.data:
-            if row.get("nfts"):
-                for tid in row["nfts"].split(","):
-                    try:
-                        used_ids.add(int(tid))
-                    except ValueError:
-                        pass
+def _create_pool():
+    from inference_pool import InferencePool
 
-    while True:
-        nonce = random.randint(0, 50_000)
-        if nonce not in used_ids:
-            save_used_id(nonce)
-            return nonce
+    return InferencePool(INFERENCE_WORKERS, max_rows=BATCH_SIZE, in_flight=INFERENCE_IN_FLIGHT,
+                         base_dir=MODEL_DIR, default_run=MODEL_RUN, backend=INFERENCE_BACKEND,
+                         variant=MODEL_VARIANT, max_batch_size=BATCH_SIZE, poll_s=MODEL_POLL_S,
+                         shadow_rate=SHADOW_RATE)
 
 
-def preprocess(reading):
-    arr = np.array([reading[n] for n in FEATURE_NAMES], dtype=np.float32)
-    return scaler.transform(arr.reshape(1, -1))
+# Built on first predict(): with tflite_runtime installed neither TensorFlow
+# nor sklearn is imported, and nothing is unpickled.
+predictor = Lazy(_create_pool if INFERENCE_WORKERS else _create_registry)
 
+# Rule-first cascade: readings clearly inside or past the generator's fault
+# thresholds are labelled without the model. Off unless CASCADE_MARGIN (a
+# margin scale; 0 = bare thresholds) is set — with the TFLite MLP at well
+# under 1 µs/row batched it improves accuracy more than throughput; see
+# bench_cascade.py. CASCADE_AUDIT of fast-path rows is re-checked by the model.
+CASCADE_MARGIN    = os.getenv("CASCADE_MARGIN")
+CASCADE_AUDIT     = 0.02
+classifier        = CascadeClassifier(predictor, margin_scale=float(CASCADE_MARGIN or 1.0),
+                                      audit_rate=CASCADE_AUDIT, enabled=CASCADE_MARGIN is not None)
 
-def predict_fault(x_scaled):
-    interpreter.set_tensor(input_details[0]["index"], x_scaled)
-    interpreter.invoke()
-    probs = interpreter.get_tensor(output_details[0]["index"])[0]
-    idx   = int(np.argmax(probs))
-    return fault_codes[idx], float(probs[idx])
+# ─── Helpers ────────────────────────────────────────────────────────────────
+def fetch_supabase_token_ids():
+    """All token IDs already recorded in `car_nft_tokens` (one scan, at startup)."""
+    ids, start, page = set(), 0, 1000
+    while True:
+        result = (
+            supabase.table("car_nft_tokens").select("token_id")
+            .order("token_id").range(start, start + page - 1).execute()
+        )
+        rows = result.data or []
+        ids.update(int(row["token_id"]) for row in rows)
+        if len(rows) < page:
+            return ids
+        start += page
+
+
+def generate_token_id() -> int:
+    """Next token ID not already used locally or in Supabase."""
+    with metrics.time("token_alloc"):
+        return token_allocator.allocate()
 
 
 def format_opensea_metadata(timestamp, fault, confidence, sensor_data):
@@ -134,112 +216,380 @@ def format_opensea_metadata(timestamp, fault, confidence, sensor_data):
     }
 
 
-def upload_to_pinata(json_data, filename):
-    url = "https://api.pinata.cloud/pinning/pinJSONToIPFS"
-    hdr = {
-        "Content-Type":            "application/json",
-        "pinata_api_key":          PINATA_API_KEY,
-        "pinata_secret_api_key":   PINATA_SECRET_API_KEY
-    }
-    payload = {
-        "pinataOptions":  {"cidVersion": 1},
-        "pinataMetadata": {"name": filename},
-        "pinataContent":  json_data
+def format_batch_metadata(group, records, root):
+    """NFT metadata for a Merkle-anchored batch; `readings` are the tree's leaves."""
+    attrs = [
+        {"trait_type": "Scope" if group == "FLEET" else "VIN", "value": group},
+        {"trait_type": "Readings", "value": len(records)},
+        {"trait_type": "Merkle Root", "value": root},
+        {"trait_type": "First Reading", "value": records[0]["timestamp"]},
+        {"trait_type": "Last Reading", "value": records[-1]["timestamp"]},
+    ]
+    for fault, count in sorted(Counter(r["fault"] for r in records).items()):
+        attrs.append({"trait_type": f"Fault: {fault}", "value": count})
+
+    return {
+        "name": "2025 Honda Prologue",
+        "description": f"DriveLedger batch of {len(records)} readings anchored by Merkle root",
+        "external_url": "",
+        "image": "https://coffee-electoral-shrimp-180.mypinata.cloud/ipfs/bafybeiddnjyt3sjeb2h7rzpr6avnuve6t2xiop67qcoqnqnol2n4z2d3iq",
+        "attributes": attrs,
+        "merkle": {
+            "root":  root,
+            "count": len(records),
+            "leaf":  "sha256(0x00 || canonical_json(reading))",
+            "node":  "sha256(0x01 || left || right)",
+        },
+        "readings": records,
     }
-    resp = requests.post(url, data=json.dumps(payload), headers=hdr)
-    if resp.status_code == 200:
-        cid      = resp.json()["IpfsHash"]
-        ipfs_url = f"https://gateway.pinata.cloud/ipfs/{cid}"
+
+
+def upload_to_pinata(json_data, filename):
+    """Pin metadata JSON; skipped locally if a document with the same CID was pinned."""
+    with metrics.time("pinata_pin"):
+        ipfs_url = pinata.pin_json(json_data, filename)
+    if ipfs_url and not QUIET:
         print(f"✅ Uploaded to IPFS: {ipfs_url}")
-        return ipfs_url
-    else:
-        print(f"❌ Pinata upload failed: {resp.status_code} {resp.text}")
-        return None
+    return ipfs_url
 
 
-def save_current_data(ipfs_url, unique_id):
-    os.makedirs(os.path.dirname(CURRENT_DATA_PATH), exist_ok=True)
-    payload = {
-        "ipfs_url":  ipfs_url,
-        "unique_id": unique_id
+def append_car_nft_tokens(rows: list):
+    """Append `{"vin", "token_id"}` rows to `car_nft_tokens` in one request."""
+    if not rows:
+        return
+    supabase.table("car_nft_tokens").upsert(
+        rows, on_conflict="vin,token_id", ignore_duplicates=True, returning="minimal"
+    ).execute()
+
+
+def record_tokens(vins, token_id):
+    """Store the `car_nft_tokens` rows for a token; pushed by `supabase_sync`."""
+    store.add_tokens([(vin, token_id) for vin in vins])
+
+
+def record_car_data(rows):
+    """Store `car_data` rows (reading, prediction, token ID, IPFS link); pushed by `supabase_sync`."""
+    with metrics.time("store_write"):
+        store.add_readings(rows)
+
+
+def to_car_data_row(row):
+    """A stored reading as a Supabase `car_data` row, tagged with its VIN and gateway."""
+    return {
+        "vin":         row["vin"],
+        "gateway_id":  GATEWAY_ID,
+        "timestamp":   row["timestamp"],
+        "fault":       row["fault"],
+        "confidence":  row["confidence"],
+        "sensor_data": row["sensor_data"],
+        "unique_id":   row["unique_id"],
+        "ipfs_link":   row["ipfs_link"],
     }
-    with open(CURRENT_DATA_PATH, "w") as f:
-        json.dump(payload, f, indent=4)
-    print(f"✅ Saved current data to {CURRENT_DATA_PATH}")
 
 
-def update_car_nfts_table(vin: str, token_id: int):
-    result = supabase.table("car_nfts").select("nfts").eq("vin", vin).execute()
-    if result.data:
-        current_nfts = result.data[0].get("nfts") or ""
-        new_nfts = f"{current_nfts},{token_id}" if current_nfts else str(token_id)
-        supabase.table("car_nfts").update({"nfts": new_nfts}).eq("vin", vin).execute()
+def mint_via_hardhat(token_id: int, ipfs_url: str) -> str:
+    """
+    Mint through the long-lived Hardhat worker; blocks until the tx is mined.
+    A token that is already on chain only counts as minted if it was this
+    gateway's: same URI (checked by the worker) and recorded in the store.
+    """
+    with metrics.time("hardhat_mint"):
+        result = mint_service.mint(token_id, ipfs_url).result()
+    if result.get("already_minted") and not store.token_vins(token_id):
+        raise RuntimeError(f"token ID {token_id} was minted by another gateway")
+    if not QUIET:
+        if result.get("already_minted"):
+            print(f"✅ Token ID {token_id} was already minted")
+        else:
+            print(f"✅ Minted token ID {token_id}: {result['tx_hash']}")
+    return result.get("tx_hash")
+
+# ─── Local Store & Sync ─────────────────────────────────────────────────────
+# Every Supabase table is upserted so re-sending a batch never duplicates
+# rows. The fleet aggregate rows carry this gateway's absolute totals and
+# overwrite its previous copy. Lazy so the database is opened on first use.
+store         = Lazy(lambda: ReadingStore(STORE_PATH))
+supabase_sync = Lazy(lambda: SupabaseSync(store, {
+    "readings": metrics.timed("supabase_car_data", supabase_upsert(supabase, "car_data", on_conflict="unique_id")),
+    "tokens":   metrics.timed("supabase_car_nft_tokens", append_car_nft_tokens),
+    **{table: metrics.timed("supabase_fleet_stats", fleet_aggregates.remote_upsert(supabase, table, GATEWAY_ID))
+       for table in fleet_aggregates.TABLES},
+}, to_remote=to_car_data_row, batch_size=SYNC_BATCH_SIZE, interval_s=SYNC_INTERVAL_S))
+
+# ─── Outbox Steps ───────────────────────────────────────────────────────────
+# Side effects per reading, keyed by token ID. Each handler gets the job's
+# payload merged with earlier step results and must be safe to re-run.
+def pin_step(job):
+    ipfs_url = upload_to_pinata(job["metadata"], job["filename"])
+    if not ipfs_url:
+        raise RuntimeError("Pinata upload failed")
+    return {"ipfs_url": ipfs_url}
+
+
+def record_step(job):
+    """Write the job's rows to the local store; `supabase_sync` uploads them later."""
+    token_id = job["token_id"]
+    if "merkle_root" in job:
+        # One token covers the batch; each reading keeps its leaf index so
+        # `merkle_anchor.prove(doc, i)` can be run against the pinned document.
+        readings  = job["metadata"]["readings"]
+        vins      = sorted({r["vin"] for r in readings})
+        data_rows = [(r, f"{token_id}:{i}") for i, r in enumerate(readings)]
     else:
-        supabase.table("car_nfts").insert({"vin": vin, "nfts": str(token_id)}).execute()
-    print(f"✅ Supabase updated for VIN {vin} with token ID {token_id}")
-
-def insert_car_data_row(timestamp: str, fault: str, confidence: float, sensor_data: dict, unique_id: str, ipfs_link: str):
-    """Insert a row into the `car_data` table, including the IPFS link."""
-    result = supabase.table("car_data").insert({
-        "timestamp": timestamp,
-        "fault": fault,
-        "confidence": confidence,
+        vins      = [job["vin"]]
+        data_rows = [(job, str(token_id))]
+
+    record_tokens(vins, token_id)
+    record_car_data([{
+        "vin":         r["vin"],
+        "timestamp":   r["timestamp"],
+        "fault":       r["fault"],
+        "confidence":  r["confidence"],
+        "sensor_data": r["sensor_data"],
+        "unique_id":   unique_id,
+        "token_id":    token_id,
+        "ipfs_link":   job["ipfs_url"],
+    } for r, unique_id in data_rows])
+    return {}
+
+
+def mint_step(job):
+    return {"tx_hash": mint_via_hardhat(job["token_id"], job["ipfs_url"])}
+
+
+OUTBOX_STEPS = ["pin", "record", "mint"]
+outbox   = Outbox(OUTBOX_PATH)
+replayer = Replayer(outbox, {"pin": pin_step, "record": record_step, "mint": mint_step})
+
+
+def anchor_batch(group, records, window):
+    """
+    Plan one pin + one mint for a closed anchoring window; run by the replayer.
+    Keyed by the window ID, so a window re-emitted after a crash is planned once.
+    """
+    if outbox.view(f"anchor:{window}") is not None:
+        return
+    token_id = generate_token_id()
+    root     = MerkleTree(records).root
+    payload  = {
+        "token_id":    token_id,
+        "vin":         group,
+        "merkle_root": root,
+        "metadata":    format_batch_metadata(group, records, root),
+        "filename":    f"driveledger_batch_{group}_{token_id}.json",
+    }
+    outbox.enqueue(f"anchor:{window}", OUTBOX_STEPS, payload, claim=False)
+    if not QUIET:
+        print(f"🌳 Anchoring {len(records)} readings for {group} as token {token_id} (root {root[:16]}…)")
+
+
+anchor_batcher = None
+if ANCHOR_MODE in ("vin", "fleet"):
+    anchor_batcher = Lazy(lambda: AnchorBatcher(anchor_batch, group_by=ANCHOR_MODE, window_s=ANCHOR_WINDOW_S,
+                                                max_readings=ANCHOR_MAX_READINGS, journal_path=ANCHOR_JOURNAL_PATH))
+
+# ─── Pipeline Stages ────────────────────────────────────────────────────────
+# Each stage takes and returns a job dict; returning None drops the job. A
+# failed step leaves the job in the outbox for the replayer to retry.
+def prepare_job(job):
+    """
+    Log the prediction, then either plan its own pin/record/mint job or, in
+    batch anchoring mode, add it to the current Merkle window.
+    """
+    reading, fault, conf = job["reading"], job["fault"], job["confidence"]
+    ts = datetime.fromisoformat(reading["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
+
+    if not QUIET:
+        print(Fore.YELLOW + "───────────────────────────────")
+        print(f"{Fore.GREEN}Timestamp:{Style.RESET_ALL} {ts}")
+        print(f"{Fore.GREEN}Predicted Fault:{Style.RESET_ALL} {Fore.RED}{fault}")
+        print(f"{Fore.GREEN}Confidence:{Style.RESET_ALL} {conf:.2%}")
+        print(Fore.GREEN + "\nSensor Readings:" + Style.RESET_ALL)
+        for n in FEATURE_NAMES:
+            print(f"  {n:20}: {reading[n]}")
+        print()
+
+    sensor_data = {k: reading[k] for k in FEATURE_NAMES}
+    if anchor_batcher is not None:
+        anchor_batcher.add({
+            "vin":         reading.get("vin", "UNKNOWN_VIN"),
+            "timestamp":   ts,
+            "fault":       fault,
+            "confidence":  conf,
+            "sensor_data": sensor_data,
+        })
+        return None
+
+    payload = {
+        "timestamp":   ts,
+        "vin":         reading.get("vin", "UNKNOWN_VIN"),
+        "fault":       fault,
+        "confidence":  conf,
         "sensor_data": sensor_data,
-        "unique_id": unique_id,
-        "ipfs_link": ipfs_link
-    }).execute()
-    print(f"✅ Inserted row into `car_data` for ID {unique_id} with IPFS link")
+        "metadata":    format_opensea_metadata(ts, fault, conf, sensor_data),
+        "token_id":    generate_token_id(),
+        "filename":    f"driveledger_{ts.replace(' ', '_').replace(':','-')}.json",
+    }
+    outbox.enqueue(payload["token_id"], OUTBOX_STEPS, payload)
+    return dict(payload, key=str(payload["token_id"]))
 
 
-def mint_via_hardhat():
-    cmd = ["npx", "hardhat", "run", "scripts/mint.js", "--network", "mumbai"]
-    print(f"🚀 Running in ./driverledger-deploy: {' '.join(cmd)}")
-    subprocess.run(cmd, cwd="./driverledger-deploy", check=True)
-    print("✅ Hardhat mint script finished.")
+def _outbox_stage(step, last=False):
+    def run(job):
+        try:
+            replayer.run_step(job["key"], step, job)
+        except Exception:
+            replayer.fail(job["key"])
+            raise
+        if last:
+            replayer.finish(job["key"])
+        return job
+    return run
+
+
+def log_stage_error(stage, job, err):
+    print(Fore.RED + f"❌ Stage '{stage}' failed for token {job.get('token_id')}: {err}")
+
+
+def build_pipeline():
+    """Inference → token/metadata → Pinata → Supabase → Hardhat, bounded queues between."""
+    return Pipeline([
+        Stage("prepare", prepare_job,                     workers=1, queue_size=STAGE_QUEUE_SIZE),
+        Stage("pinata",  _outbox_stage("pin"),            workers=PINATA_WORKERS, queue_size=STAGE_QUEUE_SIZE),
+        Stage("record",  _outbox_stage("record"),         workers=1, queue_size=STAGE_QUEUE_SIZE),
+        Stage("mint",    _outbox_stage("mint", last=True), workers=MINT_WORKERS, queue_size=STAGE_QUEUE_SIZE),
+    ], on_error=log_stage_error, metrics=metrics)
+
+
+def print_status(summary):
+    """One console line per summary interval, in place of the per-reading dump (QUIET=1)."""
+    stages, counters = summary["stages"], summary["counters"]
+    p95    = lambda stage: stages.get(stage, {}).get("p95_ms", "-")
+    errors = sum(v for k, v in counters.items() if k.startswith("errors"))  # pipeline stages only
+    queues = " ".join(f"{k[len('queue_depth{queue=') + 1:-2]}={v:g}"
+                      for k, v in summary["gauges"].items() if k.startswith("queue_depth"))
+    print(f"📊 {summary['ts']} readings={counters.get('readings', 0)} errors={errors} | p95 ms "
+          f"inference={p95('inference')} pin={p95('pinata_pin')} mint={p95('hardhat_mint')} | queues {queues}")
+
+
+def register_gauges():
+    """
+    Backlogs and failures outside the pipeline; the sync gauges read 0 until
+    the store is opened.
+    """
+    metrics.gauge("outbox_pending", outbox.pending_count)
+    metrics.gauge("outbox_replay_failures", lambda: replayer.failures)
+    metrics.gauge("anchor_failures",
+                  lambda: anchor_batcher.failures if anchor_batcher is not None and anchor_batcher.created else 0)
+    metrics.gauge("sync_errors", lambda: supabase_sync.errors if supabase_sync.created else 0)
+    for table in ("readings", "tokens", *fleet_aggregates.TABLES):
+        metrics.gauge("sync_backlog", lambda t=table: store.unsynced_count(t) if store.created else 0, table=table)
+
+
+def score_batches(batches):
+    """
+    Yield `(batch, results)` in order. With a worker pool (and the cascade
+    off) up to INFERENCE_IN_FLIGHT batches are queued at once, so every
+    worker has work; `inference` then times submit → result per batch.
+    """
+    if not INFERENCE_WORKERS or classifier.enabled:
+        for batch in batches:
+            with metrics.time("inference"):
+                results = classifier.predict(batch)
+            yield batch, results
+        return
+
+    submitted = deque()
+
+    def feed():
+        for batch in batches:
+            submitted.append((batch, time.perf_counter()))
+            yield batch
+
+    for results in predictor.imap(feed()):
+        batch, t0 = submitted.popleft()
+        metrics.observe("inference", time.perf_counter() - t0)
+        yield batch, results
+
 
 # ─── Main Loop ─────────────────────────────────────────────────────────────
 def main():
+    init(autoreset=True)
     print(Fore.CYAN + "🚗 Starting DriveLedger inference...\n" + Style.RESET_ALL)
 
+    token_allocator.load(extra_used=fetch_supabase_token_ids())
+    token_allocator.compact()
+    outbox.open()
+    if outbox.pending_count():
+        print(f"📦 {outbox.pending_count()} outbox jobs left from the last run; replaying in background")
+    pruned = store.prune(STORE_RETENTION_DAYS)
+    if pruned["readings"]:
+        print(f"🧹 Pruned {pruned['readings']} synced readings older than {STORE_RETENTION_DAYS:g} days")
+    supabase_sync.start()
+    mint_service.start()
+    replayer.start()
+    if anchor_batcher is not None:
+        anchor_batcher.get()  # reopen windows journaled by a previous run
+        if anchor_batcher.recovered:
+            print(f"🌳 Reopened anchoring windows with {anchor_batcher.recovered} readings from the last run")
+    predictor.start()
+    pipeline = build_pipeline().start()
+    register_gauges()
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT)
+        print(f"📈 Metrics at http://127.0.0.1:{METRICS_PORT}/metrics")
+    reporter = None
+    if METRICS_SUMMARY_PATH or QUIET:
+        reporter = SummaryReporter(metrics, METRICS_SUMMARY_S, path=METRICS_SUMMARY_PATH,
+                                   on_summary=print_status if QUIET else None).start()
     try:
-        for reading in stream_readings(interval_s=15.0):
-            x_scaled     = preprocess(reading)
-            fault, conf  = predict_fault(x_scaled)
-            ts           = datetime.fromisoformat(reading["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
-            vin          = reading.get("vin", "UNKNOWN_VIN")
-
-            print(Fore.YELLOW + "───────────────────────────────")
-            print(f"{Fore.GREEN}Timestamp:{Style.RESET_ALL} {ts}")
-            print(f"{Fore.GREEN}Predicted Fault:{Style.RESET_ALL} {Fore.RED}{fault}")
-            print(f"{Fore.GREEN}Confidence:{Style.RESET_ALL} {conf:.2%}")
-            print(Fore.GREEN + "\nSensor Readings:" + Style.RESET_ALL)
-            for n in FEATURE_NAMES:
-                print(f"  {n:20}: {reading[n]}")
-            print()
-
-            metadata  = format_opensea_metadata(ts, fault, conf,
-                                                {k: reading[k] for k in FEATURE_NAMES})
-            token_id  = generate_token_id()
-            filename  = f"driveledger_{ts.replace(' ', '_').replace(':','-')}.json"
-            ipfs_url  = upload_to_pinata(metadata, filename)
-
-            if ipfs_url:
-                save_current_data(ipfs_url, token_id)
-                update_car_nfts_table(vin, token_id)
-
-                insert_car_data_row(
-                    timestamp=ts,
-                    fault=fault,
-                    confidence=conf,
-                    sensor_data={k: reading[k] for k in FEATURE_NAMES},
-                    unique_id=str(token_id),
-                    ipfs_link=ipfs_url
-                )
-
-                mint_via_hardhat()
-
+        if OBD_PORT:
+            from obd_poller import stream_obd_readings
+            readings = stream_obd_readings(OBD_PORT, interval_s=OBD_READING_S)
+            print(f"🔌 Polling OBD-II adapter on {OBD_PORT}")
+        elif FLEET_VEHICLES:
+            from fleet_sim import FleetSimulator
+            fleet    = FleetSimulator(FLEET_VEHICLES, target_rps=FLEET_RPS, seed=FLEET_SEED)
+            readings = fleet.readings()
+            print(f"🚚 Simulating {FLEET_VEHICLES} vehicles at {fleet.aggregate_rps:,.0f} readings/s")
+        else:
+            readings = stream_readings(interval_s=15.0)
+        batches = micro_batches(readings, max_batch_size=BATCH_SIZE, max_wait_s=BATCH_WAIT_S)
+        for batch, results in score_batches(batches):
+            metrics.inc("readings", len(batch))
+            metrics.inc("batches")
+            for reading, (fault, conf) in zip(batch, results):
+                metrics.inc("predictions", fault=fault)
+                pipeline.submit({"reading": reading, "fault": fault, "confidence": conf})
     except KeyboardInterrupt:
-        print(Fore.MAGENTA + "\n🛑 Inference stopped by user." + Style.RESET_ALL)
+        print(Fore.MAGENTA + "\n🛑 Inference stopped by user. Draining pipeline..." + Style.RESET_ALL)
+    finally:
+        pipeline.close()
+        replayer.stop()
+        predictor.close()
+        if anchor_batcher is not None and anchor_batcher.created:
+            anchor_batcher.close()
+            replayer.drain()
+        supabase_sync.stop()
+        print(f"  sync     {supabase_sync.stats()}")
+        store.close()
+        mint_service.close()
+        if pinata.created:
+            pinata.close()
+            print(f"  pinata   {pinata.stats}")
+        outbox.compact()
+        outbox.close()
+        token_allocator.compact()
+        token_allocator.close()
+        for s in pipeline.stats():
+            print(f"  {s['stage']:8} processed={s['processed']} dropped={s['dropped']} errors={s['errors']}")
+        print(f"  model    {predictor.stats()}")
+        if classifier.enabled:
+            print(f"  cascade  {classifier.stats()}")
+        print(f"  outbox   pending={outbox.pending_count()} replayed={replayer.replayed} failures={replayer.failures}")
+        if reporter:
+            reporter.stop()
+        metrics.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,260 @@
+# merkle_anchor.py
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+
+def canonical_json(record):
+    """Deterministic encoding of a reading: sorted keys, no whitespace, UTF-8."""
+    return json.dumps(record, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def leaf_hash(record):
+    return hashlib.sha256(LEAF_PREFIX + canonical_json(record)).digest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+class MerkleTree:
+    """
+    Binary SHA-256 Merkle tree over canonical-JSON readings.
+
+    Leaves and inner nodes are domain-separated (0x00 / 0x01 prefixes) so an
+    inner node can never be passed off as a reading. An odd node at the end
+    of a level is promoted unchanged rather than paired with itself.
+    """
+
+    def __init__(self, records):
+        if not records:
+            raise ValueError("cannot build a Merkle tree with no readings")
+        self.levels = [[leaf_hash(r) for r in records]]
+        while len(self.levels[-1]) > 1:
+            level = self.levels[-1]
+            nxt = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+            if len(level) % 2:
+                nxt.append(level[-1])
+            self.levels.append(nxt)
+
+    @property
+    def root(self):
+        return self.levels[-1][0].hex()
+
+    def proof(self, index):
+        """Sibling hashes from leaf `index` up to the root."""
+        if not 0 <= index < len(self.levels[0]):
+            raise IndexError(f"leaf {index} out of range")
+        path = []
+        for level in self.levels[:-1]:
+            sibling = index ^ 1
+            if sibling < len(level):
+                side = "left" if sibling < index else "right"
+                path.append({"side": side, "hash": level[sibling].hex()})
+            index //= 2
+        return path
+
+
+def verify_proof(record, proof, root):
+    """True if `record` is included under `root` via `proof`."""
+    h = leaf_hash(record)
+    for step in proof:
+        sibling = bytes.fromhex(step["hash"])
+        h = node_hash(sibling, h) if step["side"] == "left" else node_hash(h, sibling)
+    return h.hex() == root
+
+
+def prove(batch_doc, index):
+    """
+    Inclusion proof for reading `index` of a pinned batch document (as built
+    by `main.format_batch_metadata`), ready to hand to `verify_proof`.
+    """
+    readings = batch_doc["readings"]
+    tree = MerkleTree(readings)
+    if tree.root != batch_doc["merkle"]["root"]:
+        raise ValueError("batch document does not match its Merkle root")
+    return {
+        "reading": readings[index],
+        "index":   index,
+        "root":    tree.root,
+        "proof":   tree.proof(index),
+    }
+
+
+class AnchorBatcher:
+    """
+    Collects readings into anchoring windows and hands each closed window to
+    `on_batch(group, records, window)`.
+
+    With `group_by="vin"` every vehicle has its own window; with "fleet" all
+    readings share one. A window closes when it holds `max_readings` or is
+    `window_s` old; `close()` flushes them all. `window` is a stable ID
+    ("<group>@<opened µs>") that callers can use as an idempotency key.
+
+    With `journal_path`, every reading added to an open window is appended
+    to a JSON-lines journal before `add()` returns, and a window is marked
+    closed only after `on_batch` has returned. A new batcher on the same
+    journal reopens the windows left behind by a crash, with their original
+    age, so they close on schedule instead of being lost. A crash after
+    `on_batch` but before the close is journaled hands the same window (same
+    `window` ID) to `on_batch` again. Without a journal, open windows live
+    only in memory and a crash loses up to `window_s` of readings per group.
+
+    If `on_batch` raises, the error is logged and counted in `failures`, and
+    the window is handed over again every `retry_s` (and once more at
+    `close()`); it stays in the journal until `on_batch` succeeds.
+    """
+
+    def __init__(self, on_batch, group_by="vin", window_s=300.0, max_readings=256, poll_s=1.0,
+                 journal_path=None, fsync=True, compact_every=10_000, retry_s=30.0):
+        if group_by not in ("vin", "fleet"):
+            raise ValueError("group_by must be 'vin' or 'fleet'")
+        self.on_batch      = on_batch
+        self.group_by      = group_by
+        self.window_s      = window_s
+        self.max_readings  = max_readings
+        self.poll_s        = poll_s
+        self.journal_path  = journal_path
+        self.fsync         = fsync
+        self.compact_every = compact_every
+        self.retry_s       = retry_s
+        self.recovered     = 0
+        self.failures      = 0
+
+        self._windows = {}  # group → [window id, opened (monotonic), [records]]
+        self._closing = {}  # closed, on_batch not yet returned; kept in the journal
+        self._failed  = {}  # window id → (group, entry, retry at (monotonic)); also in _closing
+        self._lock    = threading.Lock()
+        self._journal = None
+        self._written = 0
+        if journal_path:
+            self._load()
+        self._stop    = threading.Event()
+        self._thread  = threading.Thread(target=self._run, name="anchor-batcher", daemon=True)
+        self._thread.start()
+
+    # ─── Journal ───────────────────────────────────────────────────────────
+    def _load(self):
+        """Reopen the windows a previous run left open, then compact the journal."""
+        os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+        windows = {}  # window id → [group, opened (epoch s), records]
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path) as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn final write
+                    if rec["op"] == "open":
+                        windows.setdefault(rec["window"], [rec["group"], rec["opened"], []])
+                    elif rec["op"] == "add" and rec["window"] in windows:
+                        windows[rec["window"]][2].append(rec["record"])
+                    elif rec["op"] == "close":
+                        windows.pop(rec["window"], None)
+        now_wall, now_mono = time.time(), time.monotonic()
+        for window, (group, opened, records) in windows.items():
+            if records:
+                self._windows[group] = [window, now_mono - (now_wall - opened), records]
+                self.recovered += len(records)
+        self._rewrite()
+
+    def _append(self, *recs):
+        for rec in recs:
+            self._journal.write(json.dumps(rec, separators=(",", ":")) + "\n")
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        self._written += len(recs)
+
+    def _rewrite(self):
+        """Atomically replace the journal with just the open windows (caller holds the lock)."""
+        tmp = self.journal_path + ".tmp"
+        now_wall, now_mono = time.time(), time.monotonic()
+        with open(tmp, "w") as f:
+            for group, (window, opened, records) in [*self._windows.items(), *self._closing.values()]:
+                opened_wall = now_wall - (now_mono - opened)
+                f.write(json.dumps({"op": "open", "window": window, "group": group, "opened": opened_wall},
+                                   separators=(",", ":")) + "\n")
+                for record in records:
+                    f.write(json.dumps({"op": "add", "window": window, "record": record},
+                                       separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        if self._journal:
+            self._journal.close()
+        os.replace(tmp, self.journal_path)
+        self._journal = open(self.journal_path, "a")
+        self._written = 0
+
+    # ─── Windows ───────────────────────────────────────────────────────────
+    def add(self, record):
+        group = record.get("vin", "UNKNOWN_VIN") if self.group_by == "vin" else "FLEET"
+        with self._lock:
+            entry = self._windows.get(group)
+            recs  = []
+            if entry is None:
+                opened = time.time()
+                entry  = self._windows[group] = [f"{group}@{int(opened * 1_000_000)}", time.monotonic(), []]
+                recs.append({"op": "open", "window": entry[0], "group": group, "opened": opened})
+            entry[2].append(record)
+            if self._journal:
+                self._append(*recs, {"op": "add", "window": entry[0], "record": record})
+            full = len(entry[2]) >= self.max_readings
+            if full:
+                self._closing[entry[0]] = (group, self._windows.pop(group))
+        if full:
+            self._try_emit(group, entry)
+
+    def _try_emit(self, group, entry):
+        """`_emit`, or log the failure and schedule the window for a retry."""
+        try:
+            self._emit(group, entry)
+        except Exception as e:
+            with self._lock:
+                self.failures += 1
+                self._failed[entry[0]] = (group, entry, time.monotonic() + self.retry_s)
+            print(f"❌ Anchoring window {entry[0]} failed (retrying in {self.retry_s:g}s): {e}")
+
+    def _emit(self, group, entry):
+        window, _, records = entry
+        self.on_batch(group, records, window)
+        with self._lock:
+            del self._closing[window]
+            if self._journal:
+                self._append({"op": "close", "window": window})
+                if self._written >= self.compact_every:
+                    self._rewrite()
+
+    def _expired(self, force=False):
+        now = time.monotonic()
+        with self._lock:
+            groups = [g for g, (_, opened, _) in self._windows.items()
+                      if force or now - opened >= self.window_s]
+            expired = [(g, self._windows.pop(g)) for g in groups]
+            for g, entry in expired:
+                self._closing[entry[0]] = (g, entry)
+            retry = [w for w, (_, _, at) in self._failed.items() if force or now >= at]
+            return [self._failed.pop(w)[:2] for w in retry] + expired
+
+    def _run(self):
+        while not self._stop.wait(self.poll_s):
+            for group, entry in self._expired():
+                self._try_emit(group, entry)
+
+    def close(self):
+        """Stop the timer and emit every open window; failed ones stay in the journal."""
+        self._stop.set()
+        self._thread.join()
+        for group, entry in self._expired(force=True):
+            self._try_emit(group, entry)
+        if self._journal:
+            with self._lock:
+                self._rewrite()
+                self._journal.close()
+                self._journal = None
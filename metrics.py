@@ -0,0 +1,255 @@
+# metrics.py
+"""
+In-process instrumentation for the ingest loop: per-stage latency
+histograms, event and error counters, and gauges (queue depths) read when
+scraped.
+
+    metrics = Metrics()
+    with metrics.time("inference"):
+        ...
+    metrics.inc("readings", len(batch))
+    metrics.gauge("queue_depth", lambda: q.qsize(), queue="prepare")
+    metrics.serve(9108)                      # GET /metrics, GET /summary.json
+
+`/metrics` is Prometheus text format (0.0.4); `/summary.json` and
+`SummaryReporter` give the same data as one JSON object with approximate
+p50/p95/p99 per stage. Recording is a dict lookup, a bisect and a few
+additions under a lock, so it is safe to call per reading.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "driveledger"
+
+# Seconds; spans a sub-millisecond model call up to a slow on-chain mint.
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with Prometheus semantics (`le` upper bounds)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts  = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count   = 0
+        self.sum     = 0.0
+        self.max     = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum   += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation, capped at the max seen."""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+        return self.max
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in sorted(labels.items())) + "}"
+
+
+class Metrics:
+    """Thread-safe registry of stage histograms, counters and gauges."""
+
+    def __init__(self, prefix=PREFIX):
+        self.prefix   = prefix
+        self.started  = time.time()
+        self._lock    = threading.Lock()
+        self._stages  = {}   # stage → Histogram
+        self._counts  = {}   # (name, labels tuple) → int
+        self._gauges  = {}   # (name, labels tuple) → fn
+        self._server  = None
+
+    # ─── Recording ─────────────────────────────────────────────────────────
+    def observe(self, stage, seconds):
+        with self._lock:
+            hist = self._stages.get(stage)
+            if hist is None:
+                hist = self._stages[stage] = Histogram()
+            hist.observe(seconds)
+
+    @contextmanager
+    def time(self, stage):
+        """
+        Time a block as one `stage` observation, failed or not. Errors are
+        counted by whoever handles them (the pipeline, per stage), not here,
+        so a failure inside a pipeline stage is counted once.
+        """
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t0)
+
+    def timed(self, stage, fn):
+        """`fn` wrapped so every call is timed as `stage`."""
+        def wrapper(*args, **kwargs):
+            with self.time(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    def inc(self, name, n=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + n
+
+    def gauge(self, name, fn, **labels):
+        """Register `fn()` to be read at scrape / summary time."""
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = fn
+
+    # ─── Export ────────────────────────────────────────────────────────────
+    def _snapshot(self):
+        with self._lock:
+            stages = {s: (list(h.counts), h.count, h.sum, h.max, h.buckets) for s, h in self._stages.items()}
+            counts = dict(self._counts)
+            gauges = dict(self._gauges)
+        values = {}
+        for key, fn in gauges.items():
+            try:
+                values[key] = float(fn())
+            except Exception:
+                continue  # e.g. a component that has not been created yet
+        return stages, counts, values
+
+    def render_prometheus(self):
+        stages, counts, gauges = self._snapshot()
+        p, lines = self.prefix, []
+
+        lines += [f"# HELP {p}_stage_seconds Time spent per call in each ingest stage.",
+                  f"# TYPE {p}_stage_seconds histogram"]
+        for stage, (bucket_counts, count, total, _, bounds) in sorted(stages.items()):
+            cumulative = 0
+            for bound, n in zip(list(bounds) + ["+Inf"], bucket_counts):
+                cumulative += n
+                lines.append(f'{p}_stage_seconds_bucket{{le="{bound}",stage="{stage}"}} {cumulative}')
+            lines.append(f'{p}_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'{p}_stage_seconds_count{{stage="{stage}"}} {count}')
+
+        for name in sorted({name for name, _ in counts}):
+            lines += [f"# TYPE {p}_{name}_total counter"]
+            lines += [f"{p}_{name}_total{_labels(dict(labels))} {v}"
+                      for (n, labels), v in sorted(counts.items()) if n == name]
+
+        for name in sorted({name for name, _ in gauges}):
+            lines += [f"# TYPE {p}_{name} gauge"]
+            lines += [f"{p}_{name}{_labels(dict(labels))} {v:g}"
+                      for (n, labels), v in sorted(gauges.items()) if n == name]
+
+        lines += [f"# TYPE {p}_uptime_seconds gauge", f"{p}_uptime_seconds {time.time() - self.started:.1f}"]
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Per-stage count / mean / p50 / p95 / p99 / max in ms, plus counters and gauges."""
+        stages, counts, gauges = self._snapshot()
+        out = {"ts": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+               "uptime_s": round(time.time() - self.started, 1), "stages": {}}
+        for stage, (bucket_counts, count, total, peak, bounds) in sorted(stages.items()):
+            hist = Histogram(bounds)
+            hist.counts, hist.count, hist.sum, hist.max = bucket_counts, count, total, peak
+            ms = lambda v: None if v is None else round(v * 1e3, 3)
+            out["stages"][stage] = {
+                "count":   count,
+                "mean_ms": ms(total / count) if count else None,
+                "p50_ms":  ms(hist.quantile(0.50)),
+                "p95_ms":  ms(hist.quantile(0.95)),
+                "p99_ms":  ms(hist.quantile(0.99)),
+                "max_ms":  ms(peak),
+            }
+        out["counters"] = {name + _labels(dict(labels)): v for (name, labels), v in sorted(counts.items())}
+        out["gauges"]   = {name + _labels(dict(labels)): v for (name, labels), v in sorted(gauges.items())}
+        return out
+
+    # ─── HTTP endpoint ─────────────────────────────────────────────────────
+    def serve(self, port, host="127.0.0.1"):
+        """Serve /metrics and /summary.json on a daemon thread; returns the server."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] == "/metrics":
+                    body, ctype = metrics.render_prometheus().encode(), "text/plain; version=0.0.4; charset=utf-8"
+                elif self.path.split("?")[0] == "/summary.json":
+                    body, ctype = json.dumps(metrics.summary()).encode(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # keep scrapes off the console
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server
+
+    def close(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class SummaryReporter:
+    """
+    Every `interval_s`, append `metrics.summary()` as a JSON line to `path`
+    and/or hand it to `on_summary` (e.g. a one-line console status).
+    """
+
+    def __init__(self, metrics, interval_s=60.0, path=None, on_summary=None):
+        self.metrics    = metrics
+        self.interval_s = interval_s
+        self.path       = path
+        self.on_summary = on_summary
+        self._stop      = threading.Event()
+        self._thread    = None
+
+    def report(self):
+        summary = self.metrics.summary()
+        if self.path:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(summary) + "\n")
+        if self.on_summary:
+            self.on_summary(summary)
+        return summary
+
+    def _loop(self):
+        while not self._stop.wait(self.interval_s):
+            self.report()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="metrics-summary", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop and write one final summary."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        return self.report()
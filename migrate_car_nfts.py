@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Bulk-copy the legacy comma-separated `car_nfts.nfts` strings into the
+append-only `car_nft_tokens` table (see sql/car_nft_tokens.sql).
+
+    python migrate_car_nfts.py              # copy everything
+    python migrate_car_nfts.py --dry-run    # just count
+
+Safe to re-run: rows are upserted on (vin, token_id) and duplicates ignored.
+"""
+import os
+import argparse
+
+from dotenv import load_dotenv
+from supabase import create_client
+
+
+def iter_legacy_rows(supabase, page_size):
+    start = 0
+    while True:
+        result = (
+            supabase.table("car_nfts").select("vin, nfts")
+            .order("vin").range(start, start + page_size - 1).execute()
+        )
+        rows = result.data or []
+        yield from rows
+        if len(rows) < page_size:
+            return
+        start += page_size
+
+
+def explode(row):
+    """`{"vin": v, "nfts": "1,2,3"}` → `[{"vin": v, "token_id": 1}, ...]`."""
+    out = []
+    for tid in (row.get("nfts") or "").split(","):
+        try:
+            out.append({"vin": row["vin"], "token_id": int(tid)})
+        except ValueError:
+            pass
+    return out
+
+
+def migrate(supabase, page_size=1000, batch_size=1000, dry_run=False):
+    vins, copied, batch = 0, 0, []
+
+    def flush():
+        nonlocal copied, batch
+        if batch and not dry_run:
+            supabase.table("car_nft_tokens").upsert(
+                batch, on_conflict="vin,token_id", ignore_duplicates=True,
+                returning="minimal"
+            ).execute()
+        copied += len(batch)
+        batch = []
+
+    for row in iter_legacy_rows(supabase, page_size):
+        vins += 1
+        batch.extend(explode(row))
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    return vins, copied
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate car_nfts strings to car_nft_tokens rows")
+    parser.add_argument("--page-size",  type=int, default=1000, help="car_nfts rows read per request")
+    parser.add_argument("--batch-size", type=int, default=1000, help="car_nft_tokens rows per insert")
+    parser.add_argument("--dry-run",    action="store_true", help="Count rows without writing")
+    args = parser.parse_args()
+
+    load_dotenv()
+    client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+    vins, tokens = migrate(client, args.page_size, args.batch_size, args.dry_run)
+    verb = "Would copy" if args.dry_run else "Copied"
+    print(f"✅ {verb} {tokens} token rows for {vins} VINs into car_nft_tokens")
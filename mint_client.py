@@ -0,0 +1,140 @@
+# mint_client.py
+
+import itertools
+import json
+import subprocess
+import threading
+from concurrent.futures import Future
+
+DEPLOY_DIR = "./driverledger-deploy"
+
+
+class MintError(RuntimeError):
+    """A mint job was rejected by the service or the service went away."""
+
+
+class MintService:
+    """
+    Python side of `driverledger-deploy/scripts/mint_service.js`.
+
+    Boots Hardhat once and keeps it running; each `mint()` writes one JSON
+    job to the worker's stdin and returns a Future resolved with the result
+    line (`tx_hash`, `nonce`, `block`). Any command that speaks the same
+    line protocol can be passed as `cmd`, e.g. the service pointed at a local
+    `npx hardhat node` with `network="localhost"`.
+    """
+
+    def __init__(self, network="mumbai", cwd=DEPLOY_DIR, cmd=None, env=None):
+        self.cmd  = cmd or ["npx", "hardhat", "run", "scripts/mint_service.js", "--network", network]
+        self.cwd  = cwd
+        self.env  = env
+        self.info = None
+
+        self._proc    = None
+        self._ids     = itertools.count(1)
+        self._pending = {}
+        self._lock    = threading.Lock()
+        self._ready   = threading.Event()
+
+    # ─── Lifecycle ─────────────────────────────────────────────────────────
+    def start(self, timeout=120.0):
+        """Spawn the worker and wait for its ready line."""
+        with self._lock:
+            if self._proc is not None:
+                return self
+            print(f"🚀 Starting mint service in {self.cwd}: {' '.join(self.cmd)}")
+            self.info  = None
+            self._proc = subprocess.Popen(
+                self.cmd, cwd=self.cwd, env=self.env, text=True, bufsize=1,
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE
+            )
+            threading.Thread(target=self._read_loop, name="mint-reader", daemon=True).start()
+        if not self._ready.wait(timeout):
+            self.close()
+            raise MintError("mint service did not become ready")
+        if self.info is None:
+            self.close()
+            raise MintError("mint service exited during startup")
+        print(f"✅ Mint service ready (signer {self.info.get('signer')}, nonce {self.info.get('nonce')})")
+        return self
+
+    def close(self, timeout=300.0):
+        """Close stdin so the worker finishes in-flight mints and exits."""
+        with self._lock:
+            proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+            proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        self._ready.clear()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ─── Jobs ──────────────────────────────────────────────────────────────
+    def mint(self, token_id, ipfs_url):
+        """Queue a `safeMint` and return a Future for its result dict."""
+        if self._proc is None:
+            self.start()
+        fut = Future()
+        job_id = next(self._ids)
+        with self._lock:
+            self._pending[job_id] = fut
+            try:
+                self._proc.stdin.write(json.dumps(
+                    {"id": job_id, "token_id": int(token_id), "ipfs_url": ipfs_url}
+                ) + "\n")
+                self._proc.stdin.flush()
+            except (BrokenPipeError, ValueError, AttributeError) as e:
+                self._pending.pop(job_id, None)
+                raise MintError(f"mint service unavailable: {e}") from e
+        return fut
+
+    def mint_sync(self, token_id, ipfs_url, timeout=None):
+        """Mint and block until the transaction is mined; returns the tx hash."""
+        return self.mint(token_id, ipfs_url).result(timeout)["tx_hash"]
+
+    def _read_loop(self):
+        proc = self._proc
+        for line in proc.stdout:
+            try:
+                msg = json.loads(line)
+            except json.JSONDecodeError:
+                print(line.rstrip())  # Hardhat's own chatter, e.g. compile output
+                continue
+            if not isinstance(msg, dict):
+                continue
+            if msg.get("ready"):
+                self.info = msg
+                self._ready.set()
+                continue
+            with self._lock:
+                fut = self._pending.pop(msg.get("id"), None)
+            if fut is None:
+                continue
+            if msg.get("ok"):
+                fut.set_result(msg)
+            else:
+                fut.set_exception(MintError(msg.get("error") or "mint failed"))
+
+        # stdout closed: the worker has exited; fail anything still waiting
+        # and forget it, so the next mint() starts a new one.
+        proc.wait()
+        try:
+            proc.stdin.close()
+        except OSError:
+            pass
+        self._ready.set()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._proc is proc:
+                self._proc = None
+                self._ready.clear()
+        for fut in pending.values():
+            fut.set_exception(MintError("mint service exited"))
@@ -0,0 +1,202 @@
+# model_bundle.py
+"""
+One file with everything inference needs from a training run.
+
+    logs/fit/run_1/model.bundle
+
+Layout (little-endian):
+
+    b"DLMB" | u16 format version | u16 reserved | u32 header length
+    header: UTF-8 JSON — features, fault_codes, sections, metadata, sha256
+    sections, each 64-byte aligned:
+        mean, scale          float64 (n_features,)
+        tflite/<variant>     TFLite flatbuffer (float32 / float16 / int8)
+
+The file is opened with mmap and nothing is unpickled: the scaler arrays are
+zero-copy views of the mapping, and a flatbuffer is only copied out when an
+interpreter is built (the TFLite Python API requires `bytes`). `sha256`
+covers the header (minus the digest itself) and every section.
+
+    python model_bundle.py build --run logs/fit/run_1    # from the run's .tflite + pickles
+    python model_bundle.py info  logs/fit/run_1/model.bundle
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+from datetime import datetime, timezone
+
+import numpy as np
+
+from batch_inference import FEATURE_NAMES, ArrayScaler, BatchPredictor, load_interpreter
+
+MAGIC          = b"DLMB"
+FORMAT_VERSION = 1
+BUNDLE_NAME    = "model.bundle"
+ALIGN          = 64
+_PREFIX        = struct.Struct("<4sHHI")
+
+
+def _digest(header, payload):
+    core = json.dumps({k: v for k, v in header.items() if k != "sha256"}, sort_keys=True)
+    h = hashlib.sha256(core.encode())
+    h.update(payload)
+    return h.hexdigest()
+
+
+def write_bundle(path, mean, scale, fault_codes, tflite_models, features=FEATURE_NAMES, metadata=None):
+    """
+    Write a bundle atomically (temp file + rename), so a process that has
+    the previous version mapped keeps reading a consistent file.
+    `tflite_models` maps variant name → flatbuffer bytes.
+    """
+    blobs = {
+        "mean":  np.ascontiguousarray(mean, dtype="<f8").tobytes(),
+        "scale": np.ascontiguousarray(scale, dtype="<f8").tobytes(),
+        **{f"tflite/{v}": bytes(b) for v, b in tflite_models.items()},
+    }
+    sections, payload = {}, bytearray()
+    for name, blob in blobs.items():
+        payload += b"\0" * (-len(payload) % ALIGN)
+        sections[name] = {"offset": len(payload), "length": len(blob)}
+        payload += blob
+    for name in ("mean", "scale"):
+        sections[name].update(dtype="<f8", shape=[len(features)])
+
+    header = {
+        "format_version": FORMAT_VERSION,
+        "features":       list(features),
+        "fault_codes":    list(fault_codes),
+        "variants":       list(tflite_models),
+        "sections":       sections,
+        "metadata":       {"created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                           **(metadata or {})},
+    }
+    header["sha256"] = _digest(header, payload)
+    head = json.dumps(header).encode()
+    head += b" " * (-(_PREFIX.size + len(head)) % ALIGN)  # sections start aligned in the file too
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, 0, len(head)))
+        f.write(head)
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return header
+
+
+class ModelBundle:
+    """Read-only, memory-mapped view of a `model.bundle` file."""
+
+    def __init__(self, path, verify=True):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, head_len = _PREFIX.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a model bundle")
+        if version > FORMAT_VERSION:
+            raise ValueError(f"{path} is bundle format v{version}; this build reads up to v{FORMAT_VERSION}")
+        self._base  = _PREFIX.size + head_len
+        if len(self._mm) < self._base:
+            raise ValueError(f"{path} is truncated")
+        self.header = json.loads(self._mm[_PREFIX.size:self._base])
+        if verify and _digest(self.header, memoryview(self._mm)[self._base:]) != self.header["sha256"]:
+            raise ValueError(f"{path}: checksum mismatch")
+
+        self.features    = self.header["features"]
+        self.fault_codes = self.header["fault_codes"]
+        self.variants    = self.header["variants"]
+        self.metadata    = self.header["metadata"]
+        self.sha256      = self.header["sha256"]
+
+    def section(self, name):
+        """Raw bytes of one section as a memoryview into the mapping."""
+        s = self.header["sections"][name]
+        start = self._base + s["offset"]
+        return memoryview(self._mm)[start:start + s["length"]]
+
+    def array(self, name):
+        s = self.header["sections"][name]
+        return np.frombuffer(self._mm, dtype=s["dtype"], count=int(np.prod(s["shape"])),
+                             offset=self._base + s["offset"]).reshape(s["shape"])
+
+    @property
+    def scaler(self):
+        return ArrayScaler(self.array("mean"), self.array("scale"))
+
+    def tflite(self, variant="float32"):
+        if variant not in self.variants:
+            raise KeyError(f"{self.path} has no {variant!r} model (has: {', '.join(self.variants)})")
+        return self.section(f"tflite/{variant}")
+
+    def interpreter(self, variant="float32"):
+        return load_interpreter(model_content=bytes(self.tflite(variant)))
+
+    def predictor(self, variant="float32", max_batch_size=64):
+        """
+        A `BatchPredictor` for one variant, after checking the feature order;
+        it keeps one interpreter per batch-size bucket.
+        """
+        if self.features != FEATURE_NAMES:
+            raise ValueError(f"{self.path} was trained on a different feature order than FEATURE_NAMES")
+        content = bytes(self.tflite(variant))
+        return BatchPredictor(load_interpreter(model_content=content), self.scaler, self.fault_codes,
+                              max_batch_size=max_batch_size,
+                              make_interpreter=lambda: load_interpreter(model_content=content))
+
+
+def build_from_run(run_dir, out=None, metadata=None):
+    """
+    (Re)build a run's bundle from the .tflite variants on disk. The scaler
+    and fault codes come from the run's current bundle, or from the legacy
+    `scaler.pkl` / `fault_codes.pkl` of runs trained before bundles existed.
+    """
+    from quantize_export import VARIANTS
+
+    out = out or os.path.join(run_dir, BUNDLE_NAME)
+    if os.path.exists(out):
+        old = ModelBundle(out)
+        mean, scale, codes = old.array("mean").copy(), old.array("scale").copy(), old.fault_codes
+        metadata = {**old.metadata, **(metadata or {})}
+        metadata.pop("created", None)
+    else:
+        import joblib
+
+        scaler = joblib.load(os.path.join(run_dir, "scaler.pkl"))
+        mean, scale = scaler.mean_, scaler.scale_
+        codes = joblib.load(os.path.join(run_dir, "fault_codes.pkl"))
+        metadata = {"run": os.path.basename(os.path.normpath(run_dir)), **(metadata or {})}
+
+    models = {}
+    for variant, fname in VARIANTS.items():
+        if os.path.exists(os.path.join(run_dir, fname)):
+            with open(os.path.join(run_dir, fname), "rb") as f:
+                models[variant] = f.read()
+    return write_bundle(out, mean, scale, codes, models, metadata=metadata)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or inspect a model bundle")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="Bundle a run's TFLite variants with its scaler and fault codes")
+    b.add_argument("--run", default="logs/fit/run_1", help="Training run directory")
+    b.add_argument("--out", default=None, help=f"Output file (default: <run>/{BUNDLE_NAME})")
+    i = sub.add_parser("info", help="Print a bundle's header and verify its checksum")
+    i.add_argument("path", nargs="?", default=os.path.join("logs/fit/run_1", BUNDLE_NAME))
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        out = args.out or os.path.join(args.run, BUNDLE_NAME)
+        header = build_from_run(args.run, out)
+        print(f"✅ Wrote {out} ({os.path.getsize(out)} bytes, variants: {', '.join(header['variants'])}, "
+              f"sha256 {header['sha256'][:12]})")
+    else:
+        bundle = ModelBundle(args.path)
+        print(json.dumps({k: v for k, v in bundle.header.items() if k != "sections"}, indent=2))
+        print(f"✅ checksum ok ({bundle.sha256[:12]})")
@@ -0,0 +1,322 @@
+# model_registry.py
+"""
+Discovers training runs under `logs/fit`, validates them and serves the
+active model to the inference loop, with hot swaps and shadow scoring.
+
+Which run is live is controlled by small pointer files next to the runs,
+so a deploy never touches main.py or restarts the process:
+
+    python model_registry.py list                 # runs, bundle checks, val accuracy
+    python model_registry.py promote run_3        # writes logs/fit/ACTIVE
+    python model_registry.py shadow  run_4        # writes logs/fit/SHADOW
+    python model_registry.py shadow  --off
+
+The running process polls the pointers. A newly named run is loaded and
+validated on the watcher thread while readings keep flowing through the
+current model, then swapped in with a single reference assignment —
+`predict()` takes one snapshot of the active model per batch, so every
+batch is scored by exactly one model. With a shadow run set, a sample of
+rows is re-scored by it on a separate thread and disagreements with the
+active model are appended to `logs/fit/shadow.jsonl`.
+"""
+import argparse
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+import numpy as np
+
+from batch_inference import FEATURE_NAMES, readings_to_matrix
+
+ACTIVE_POINTER = "ACTIVE"
+SHADOW_POINTER = "SHADOW"
+SHADOW_LOG     = "shadow.jsonl"
+FOLDED_NAME    = "model_folded.npz"
+_RUN_RE        = re.compile(r"run_(\d+)$")
+
+
+# ─── Discovery & validation ─────────────────────────────────────────────────
+def discover_runs(base_dir):
+    """`run_N` directories under `base_dir`, oldest first."""
+    if not os.path.isdir(base_dir):
+        return []
+    runs = [d for d in os.listdir(base_dir) if _RUN_RE.match(d) and os.path.isdir(os.path.join(base_dir, d))]
+    return sorted(runs, key=lambda d: int(_RUN_RE.match(d).group(1)))
+
+
+def read_pointer(base_dir, name):
+    try:
+        with open(os.path.join(base_dir, name)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def write_pointer(base_dir, name, run):
+    """Atomically point ACTIVE / SHADOW at `run` (None removes the pointer)."""
+    path = os.path.join(base_dir, name)
+    if run is None:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(run + "\n")
+    os.replace(tmp, path)
+
+
+class ModelVersion:
+    """One loaded, validated run: its predictor plus where it came from."""
+
+    def __init__(self, run, predictor, sha256=None):
+        self.run       = run
+        self.predictor = predictor
+        self.sha256    = sha256
+        self.loaded_at = time.time()
+
+    def __repr__(self):
+        return f"ModelVersion({self.run!r}, sha256={(self.sha256 or '-')[:12]})"
+
+
+def load_version(base_dir, run, backend="tflite", variant="float32", max_batch_size=64):
+    """
+    Load `run` and check it before it can serve: bundle checksum and feature
+    order, the requested variant, and a smoke prediction whose output width
+    matches the fault code list. Raises ValueError / KeyError / OSError.
+    """
+    from model_bundle import BUNDLE_NAME, ModelBundle
+
+    run_dir = os.path.join(base_dir, run)
+    bundle  = ModelBundle(os.path.join(run_dir, BUNDLE_NAME))
+    if backend == "numpy":
+        from numpy_backend import NumpyPredictor
+
+        predictor = NumpyPredictor.load(os.path.join(run_dir, FOLDED_NAME))
+        if predictor.fault_codes != bundle.fault_codes:
+            raise ValueError(f"{run}: {FOLDED_NAME} is out of date with its bundle")
+    else:
+        predictor = bundle.predictor(variant, max_batch_size=max_batch_size)
+
+    probe = predictor.predict([dict.fromkeys(FEATURE_NAMES, 0.0)])
+    if len(probe) != 1 or probe[0][0] not in bundle.fault_codes or not np.isfinite(probe[0][1]):
+        raise ValueError(f"{run}: smoke prediction failed ({probe})")
+    return ModelVersion(run, predictor, bundle.sha256)
+
+
+# ─── Registry ───────────────────────────────────────────────────────────────
+class ModelRegistry:
+    """
+    Serves `predict()` from the active run and swaps runs without a restart.
+
+    `default_run` is used until an ACTIVE pointer exists. Loading (and the
+    shadow model's scoring) happens off the caller's thread; a run that
+    fails validation is logged and the current model keeps serving.
+    """
+
+    def __init__(self, base_dir="logs/fit", default_run="run_1", backend="tflite", variant="float32",
+                 max_batch_size=64, poll_s=10.0, shadow_rate=0.1, shadow_queue=64, seed=None):
+        self.base_dir       = base_dir
+        self.backend        = backend
+        self.variant        = variant
+        self.max_batch_size = max_batch_size
+        self.poll_s         = poll_s
+        self.shadow_rate    = shadow_rate
+        self.shadow_log     = os.path.join(base_dir, SHADOW_LOG)
+
+        self.swaps          = 0
+        self.load_failures  = 0
+        self._lock          = threading.Lock()
+        self._stop          = threading.Event()
+        self._thread        = None
+        self._rng           = random.Random(seed)
+        self._shadow        = None
+        self._shadow_q      = queue.Queue(maxsize=shadow_queue)
+        self._shadow_thread = None
+        self._shadow_stats  = Counter()
+        self._failed        = {}  # role → run that failed validation; not retried until the pointer moves
+
+        run = read_pointer(base_dir, ACTIVE_POINTER) or default_run
+        self._active = self._load(run)
+
+    def _load(self, run):
+        return load_version(self.base_dir, run, self.backend, self.variant, self.max_batch_size)
+
+    @property
+    def active(self):
+        return self._active
+
+    @property
+    def shadow(self):
+        return self._shadow
+
+    # ─── Swapping ──────────────────────────────────────────────────────────
+    def promote(self, run):
+        """Load and validate `run` on this thread, then make it active."""
+        version = self._load(run)
+        with self._lock:
+            previous, self._active = self._active, version
+            self.swaps += 1
+        print(f"🔁 Model {previous.run} → {version.run} ({version.sha256[:12]})")
+        return version
+
+    def set_shadow(self, run):
+        """Shadow-score traffic with `run` (a separate instance from the active one); None stops it."""
+        version = self._load(run) if run else None
+        with self._lock:
+            self._shadow = version
+        if version:
+            print(f"👥 Shadowing {version.run} on {self.shadow_rate:.0%} of rows")
+        return version
+
+    def refresh(self):
+        """Apply the pointer files once; a bad run is reported and skipped."""
+        wanted = {
+            "active": read_pointer(self.base_dir, ACTIVE_POINTER) or self._active.run,
+            "shadow": read_pointer(self.base_dir, SHADOW_POINTER),
+        }
+        for role, run in wanted.items():
+            current = self._active if role == "active" else self._shadow
+            if run == (current.run if current else None) or run == self._failed.get(role):
+                continue
+            try:
+                self.promote(run) if role == "active" else self.set_shadow(run)
+                self._failed.pop(role, None)
+            except Exception as e:
+                self.load_failures += 1
+                self._failed[role] = run
+                print(f"❌ Not loading {role} model {run}: {e}")
+                if role == "shadow":
+                    self.set_shadow(None)
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_s):
+            self.refresh()
+
+    def start(self):
+        self.refresh()
+        self._thread = threading.Thread(target=self._watch, name="model-registry", daemon=True)
+        self._thread.start()
+        self._shadow_thread = threading.Thread(target=self._score_shadow, name="model-shadow", daemon=True)
+        self._shadow_thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        if self._shadow_thread:
+            self._shadow_q.put(None)
+            self._shadow_thread.join()
+
+    # ─── Inference ─────────────────────────────────────────────────────────
+    def predict(self, readings):
+        if not readings:
+            return []
+        return self.predict_matrix(readings_to_matrix(readings))
+
+    def predict_matrix(self, X):
+        """Classify a batch with the active model; maybe hand a sample to the shadow."""
+        model   = self._active
+        results = model.predictor.predict_matrix(X)
+        shadow  = self._shadow
+        if shadow is not None and self._shadow_thread is not None and len(X):
+            picked = [i for i in range(len(X)) if self._rng.random() < self.shadow_rate]
+            if picked:
+                job = (model.run, shadow, X[picked], [results[i][0] for i in picked])
+                try:
+                    self._shadow_q.put_nowait(job)
+                except queue.Full:
+                    self._shadow_stats["dropped"] += len(picked)  # never slow ingestion down
+        return results
+
+    def _score_shadow(self):
+        while True:
+            job = self._shadow_q.get()
+            if job is None:
+                return
+            active_run, shadow, X, active_faults = job
+            try:
+                shadow_faults = [f for f, _ in shadow.predictor.predict_matrix(X)]
+            except Exception as e:
+                print(f"❌ Shadow model {shadow.run} failed: {e}")
+                continue
+            pairs = Counter(f"{a}→{s}" for a, s in zip(active_faults, shadow_faults) if a != s)
+            disagree = sum(pairs.values())
+            self._shadow_stats["rows"]     += len(X)
+            self._shadow_stats["disagree"] += disagree
+            with open(self.shadow_log, "a") as f:
+                f.write(json.dumps({
+                    "ts":       datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    "active":   active_run,
+                    "shadow":   shadow.run,
+                    "rows":     len(X),
+                    "disagree": disagree,
+                    "pairs":    dict(pairs),
+                }) + "\n")
+
+    def stats(self):
+        rows = self._shadow_stats["rows"]
+        return {
+            "active":          self._active.run,
+            "shadow":          self._shadow.run if self._shadow else None,
+            "swaps":           self.swaps,
+            "load_failures":   self.load_failures,
+            "shadow_rows":     rows,
+            "shadow_disagree": round(self._shadow_stats["disagree"] / rows, 4) if rows else None,
+            "shadow_dropped":  self._shadow_stats["dropped"],
+        }
+
+
+# ─── CLI ────────────────────────────────────────────────────────────────────
+def _describe(base_dir, run, backend, variant):
+    summary_path = os.path.join(base_dir, run, "summary.json")
+    val_acc = "-"
+    if os.path.exists(summary_path):
+        with open(summary_path) as f:
+            val_acc = f"{json.load(f).get('best_val_accuracy', float('nan')):.4f}"
+    try:
+        version = load_version(base_dir, run, backend, variant)
+        return val_acc, f"ok ({version.sha256[:12]})"
+    except Exception as e:
+        return val_acc, f"invalid: {e}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect runs and choose the live / shadow model")
+    parser.add_argument("--base", default="logs/fit", help="Directory containing run_N folders")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    ls = sub.add_parser("list", help="List runs and validate each one")
+    ls.add_argument("--backend", choices=["tflite", "numpy"], default="tflite")
+    ls.add_argument("--variant", default="float32")
+    pr = sub.add_parser("promote", help="Make a run active in running processes")
+    pr.add_argument("run")
+    sh = sub.add_parser("shadow", help="Shadow-score a run against the active model")
+    sh.add_argument("run", nargs="?")
+    sh.add_argument("--off", action="store_true")
+    args = parser.parse_args()
+
+    if args.cmd == "list":
+        active, shadow = read_pointer(args.base, ACTIVE_POINTER), read_pointer(args.base, SHADOW_POINTER)
+        print(f"{'run':>8} {'role':>7} {'val_acc':>8}  status")
+        for run in discover_runs(args.base):
+            role = "active" if run == active else "shadow" if run == shadow else ""
+            val_acc, status = _describe(args.base, run, args.backend, args.variant)
+            print(f"{run:>8} {role:>7} {val_acc:>8}  {status}")
+    elif args.cmd == "promote":
+        version = load_version(args.base, args.run)  # refuse to point at a broken run
+        write_pointer(args.base, ACTIVE_POINTER, args.run)
+        print(f"✅ {ACTIVE_POINTER} → {args.run} ({version.sha256[:12]})")
+    else:
+        if args.off or not args.run:
+            write_pointer(args.base, SHADOW_POINTER, None)
+            print("✅ Shadow scoring off")
+        else:
+            load_version(args.base, args.run)
+            write_pointer(args.base, SHADOW_POINTER, args.run)
+            print(f"✅ {SHADOW_POINTER} → {args.run}")
@@ -0,0 +1,188 @@
+# numpy_backend.py
+"""
+TensorFlow-free inference for the DriveLedger MLP.
+
+The StandardScaler and every BatchNormalization layer are affine at
+inference time, so they are folded into the neighbouring Dense weights once
+at load; a forward pass is then four matmuls. Dropout and GaussianNoise are
+identities at inference and are skipped.
+
+    python numpy_backend.py export --run logs/fit/run_1   # → model_folded.npz
+
+Exporting reads `model.keras` (zip of config.json + HDF5 weights, via h5py)
+and the scaler from `model.bundle` once; the resulting .npz only needs NumPy
+to load.
+"""
+import argparse
+import io
+import json
+import os
+import zipfile
+
+import numpy as np
+
+from batch_inference import readings_to_matrix, top_faults
+
+_ACTIVATIONS = {
+    "linear":  lambda z: z,
+    "relu":    lambda z: np.maximum(z, 0.0, out=z),
+    "sigmoid": lambda z: 1.0 / (1.0 + np.exp(-z)),
+    "tanh":    np.tanh,
+}
+
+
+def _softmax(z):
+    z = z - z.max(axis=1, keepdims=True)
+    np.exp(z, out=z)
+    z /= z.sum(axis=1, keepdims=True)
+    return z
+
+
+_ACTIVATIONS["softmax"] = _softmax
+_IDENTITY_LAYERS = {"InputLayer", "GaussianNoise", "Dropout", "GaussianDropout", "AlphaDropout"}
+
+
+def _keras_layers(model_path):
+    """Yield `(class_name, config, [weights])` for each layer of a .keras file."""
+    import h5py
+
+    with zipfile.ZipFile(model_path) as z:
+        config  = json.loads(z.read("config.json"))
+        weights = h5py.File(io.BytesIO(z.read("model.weights.h5")), "r")
+    with weights:
+        for layer in config["config"]["layers"]:
+            name  = layer["config"]["name"]
+            group = weights.get(f"layers/{name}/vars")
+            arrs  = []
+            if group is not None:
+                arrs = [np.asarray(group[k], dtype=np.float64) for k in sorted(group, key=int)]
+            yield layer["class_name"], layer["config"], arrs
+
+
+def fold_layers(layers, mean=None, scale=None):
+    """
+    Fold the input scaler and BatchNorm layers into Dense layers.
+
+    An affine map `x*s + t` that sits in front of a Dense layer `xW + b`
+    becomes `x (diag(s) W) + (t W + b)`. Returns `[(W, b, activation)]`.
+    """
+    pending = None  # (s, t) still to be applied to the next layer's input
+    if mean is not None:
+        scale   = np.asarray(scale, dtype=np.float64)
+        pending = (1.0 / scale, -np.asarray(mean, dtype=np.float64) / scale)
+
+    folded = []
+    for cls, cfg, w in layers:
+        if cls in _IDENTITY_LAYERS:
+            continue
+        if cls == "Dense":
+            W, b = w[0], (w[1] if len(w) > 1 else np.zeros(w[0].shape[1]))
+            if pending is not None:
+                s, t = pending
+                b = b + t @ W
+                W = s[:, None] * W
+                pending = None
+            folded.append([W, b, cfg.get("activation", "linear")])
+        elif cls == "BatchNormalization":
+            it = iter(w)
+            gamma = next(it) if cfg.get("scale", True) else None
+            beta  = next(it) if cfg.get("center", True) else None
+            mean_, var = next(it), next(it)
+            s = 1.0 / np.sqrt(var + cfg.get("epsilon", 1e-3))
+            if gamma is not None:
+                s = s * gamma
+            t = -mean_ * s + (beta if beta is not None else 0.0)
+            if pending is not None:
+                ps, pt = pending
+                s, t = ps * s, pt * s + t
+            elif folded and folded[-1][2] == "linear":
+                # BN straight after a linear Dense folds into that Dense.
+                folded[-1][0] = folded[-1][0] * s
+                folded[-1][1] = folded[-1][1] * s + t
+                continue
+            pending = (s, t)
+        else:
+            raise ValueError(f"unsupported layer type for NumPy backend: {cls}")
+
+    if pending is not None:
+        # Trailing affine: express it as a final diagonal Dense layer.
+        s, t = pending
+        folded.append([np.diag(s), t, "linear"])
+    return [(np.ascontiguousarray(W, dtype=np.float32), b.astype(np.float32), act)
+            for W, b, act in folded]
+
+
+class NumpyPredictor:
+    """
+    Drop-in for `BatchPredictor` that runs the folded MLP in NumPy.
+
+    Takes raw (unscaled) features, since the scaler lives in the first
+    layer's weights.
+    """
+
+    def __init__(self, layers, fault_codes):
+        self.layers      = layers
+        self.fault_codes = list(fault_codes)
+
+    # ─── Loading ───────────────────────────────────────────────────────────
+    @classmethod
+    def from_keras(cls, model_path, mean, scale, fault_codes):
+        return cls(fold_layers(_keras_layers(model_path), mean, scale), fault_codes)
+
+    @classmethod
+    def from_run(cls, run_dir):
+        """Fold straight from a training run's `model.keras` + `model.bundle`."""
+        from model_bundle import BUNDLE_NAME, ModelBundle
+
+        bundle = ModelBundle(os.path.join(run_dir, BUNDLE_NAME))
+        return cls.from_keras(os.path.join(run_dir, "model.keras"),
+                              bundle.array("mean"), bundle.array("scale"), bundle.fault_codes)
+
+    def save(self, path):
+        arrays = {"fault_codes": np.array(self.fault_codes),
+                  "activations": np.array([act for _, _, act in self.layers])}
+        for i, (W, b, _) in enumerate(self.layers):
+            arrays[f"W{i}"], arrays[f"b{i}"] = W, b
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as z:
+            acts   = [str(a) for a in z["activations"]]
+            layers = [(z[f"W{i}"], z[f"b{i}"], act) for i, act in enumerate(acts)]
+            return cls(layers, [str(c) for c in z["fault_codes"]])
+
+    # ─── Inference ─────────────────────────────────────────────────────────
+    def predict_raw(self, x):
+        """(n, 20) raw features → (n, num_classes) probabilities."""
+        h = np.asarray(x, dtype=np.float32)
+        for W, b, act in self.layers:
+            h = h @ W
+            h += b
+            h = _ACTIVATIONS[act](h)
+        return h
+
+    def predict_matrix(self, X):
+        """Classify an (n, 20) raw feature matrix, returning `(fault, confidence)` rows."""
+        if not len(X):
+            return []
+        return top_faults(self.predict_raw(X), self.fault_codes)
+
+    def predict(self, readings):
+        """Classify a list of readings, returning `(fault, confidence)` in order."""
+        if not readings:
+            return []
+        return self.predict_matrix(readings_to_matrix(readings))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fold a training run into a NumPy-only .npz")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    exp = sub.add_parser("export")
+    exp.add_argument("--run", default="logs/fit/run_1", help="Training run directory")
+    exp.add_argument("--out", default=None, help="Output .npz (default: <run>/model_folded.npz)")
+    args = parser.parse_args()
+
+    out = args.out or os.path.join(args.run, "model_folded.npz")
+    NumpyPredictor.from_run(args.run).save(out)
+    print(f"✅ Saved folded NumPy model to {out}")
@@ -0,0 +1,462 @@
+# obd_poller.py
+"""
+Asynchronous OBD-II acquisition over an ELM327-style serial adapter.
+
+An adapter answers one request at a time, so polling the 20 `FEATURE_NAMES`
+round-robin gives `warmups_since_clear` the same bandwidth as `rpm`. Here
+every PID has its own period and the scheduler always sends the most
+overdue PIDs next:
+
+    fast    rpm, speed, throttle, engine load           every 0.1 s
+    medium  air flow, manifold pressure, fuel rate ...  every 0.25 s
+    slow    temperatures 1 s, levels 5 s, counters 30 s
+
+Up to `max_pids` mode-01 PIDs share one request ("010C0D11", as CAN
+adapters allow six), and `depth` requests may be written before the first
+answer comes back, for adapters that queue commands. A genuine ELM327
+aborts a command when another byte arrives, so keep `depth=1` on real
+hardware.
+
+`snapshot()` assembles a reading from the latest value of each PID at any
+moment; per-PID staleness (age of the value when it was used) is tracked
+in `stats()`. `readings()` skips snapshots while a fast PID has not been
+refreshed for `stale_s`, so a stalled link never feeds frozen values to
+the model.
+
+Answers are matched to requests in send order, checked against the PIDs
+each mode-01 reply carries ("41 0C …" for "010C…"): all of them must have
+been requested, in any order, since ECUs leave out the ones they do not
+support. A request whose supported PIDs are exactly the reply's is
+preferred, and a reply that is exactly a recently timed-out request's is
+discarded as late, so it is not taken for a newer request that asks for
+the same PIDs and more. A reply that matches a later request means the
+ones ahead of it lost their answers; one that matches none is discarded;
+a partly received one is skipped up to the next `>` prompt. One lost or
+late answer costs its own samples instead of shifting every later one.
+
+    poller = OBDPoller("/dev/ttyUSB0")
+    async for reading in poller.readings(interval_s=1.0): ...
+    for reading in stream_obd_readings("/dev/ttyUSB0"): ...   # sync, for main.py
+
+`standins.ELM327StandIn` provides a pty-backed emulator for benchmarks
+(`python bench_obd_poller.py`).
+"""
+import asyncio
+import os
+import queue
+import termios
+import threading
+import time
+import tty
+from collections import deque
+from datetime import datetime
+
+from batch_inference import FEATURE_NAMES
+
+MAX_PIDS_PER_REQUEST = 6
+
+_pct = (lambda a: a * 100 / 255, lambda v: round(v * 255 / 100))
+_temp = (lambda a: a - 40, lambda v: round(v + 40))
+_u16 = lambda scale: (lambda a: a / scale, lambda v: round(v * scale))
+
+# feature → (mode 01 PID, data bytes, decode(int), encode(value) → int, period s, fallback)
+# Decoders follow SAE J1979; run/MIL/since-clear times are reported in
+# minutes by the ECU and converted to the seconds the model was trained on.
+PIDS = {
+    "engine_load":         (0x04, 1, *_pct,                                  0.1,  50.0),
+    "coolant_temp":        (0x05, 1, *_temp,                                 1.0,  90.0),
+    "fuel_pressure":       (0x0A, 1, lambda a: a * 3, lambda v: round(v / 3), 0.25, 50.0),
+    "intake_manifold_p":   (0x0B, 1, lambda a: a, round,                     0.25, 60.0),
+    "rpm":                 (0x0C, 2, *_u16(4),                               0.1,  800.0),
+    "speed":               (0x0D, 1, lambda a: a, round,                     0.1,  0.0),
+    "timing_advance":      (0x0E, 1, lambda a: a / 2 - 64, lambda v: round((v + 64) * 2), 0.25, 10.0),
+    "intake_air_temp":     (0x0F, 1, *_temp,                                 1.0,  25.0),
+    "air_flow_rate":       (0x10, 2, *_u16(100),                             0.25, 100.0),
+    "throttle_pos":        (0x11, 1, *_pct,                                  0.1,  20.0),
+    "engine_run_time":     (0x1F, 2, lambda a: a, round,                     5.0,  0.0),
+    "fuel_level":          (0x2F, 1, *_pct,                                  5.0,  50.0),
+    "warmups_since_clear": (0x30, 1, lambda a: a, round,                     30.0, 0.0),
+    "barometric_p":        (0x33, 1, lambda a: a, round,                     5.0,  100.0),
+    "ambient_air_temp":    (0x46, 1, *_temp,                                 5.0,  20.0),
+    "cmd_throttle_act":    (0x4C, 1, *_pct,                                  0.1,  20.0),
+    "time_with_mil_on":    (0x4D, 2, lambda a: a * 60, lambda v: round(v / 60), 30.0, 0.0),
+    "time_since_codes":    (0x4E, 2, lambda a: a * 60, lambda v: round(v / 60), 30.0, 0.0),
+    "hybrid_batt_life":    (0x5B, 1, *_pct,                                  5.0,  75.0),
+    "fuel_rate":           (0x5E, 2, *_u16(20),                              0.25, 5.0),
+}
+BY_PID = {spec[0]: (feature, spec) for feature, spec in PIDS.items()}
+
+INIT_COMMANDS = ["ATZ", "ATE0", "ATL0", "ATS0", "ATH0", "ATSP0"]
+
+
+def encode_response(features, values):
+    """Mode-01 answer ("41" + PID + bytes per PID) for `values`, as the emulator sends it."""
+    out = "41"
+    for feature in features:
+        pid, nbytes, _, encode, *_ = PIDS[feature]
+        raw = max(0, min(int(encode(values[feature])), 256 ** nbytes - 1))
+        out += f"{pid:02X}" + raw.to_bytes(nbytes, "big").hex().upper()
+    return out
+
+
+def _fields(line):
+    """`(pid, data bytes)` pairs of one "41…" line, in the order the ECU sent them."""
+    try:
+        data = bytes.fromhex(line[2:len(line) - len(line) % 2])
+    except ValueError:
+        return
+    i = 0
+    while i < len(data) and data[i] in BY_PID:
+        nbytes = BY_PID[data[i]][1][1]
+        if i + 1 + nbytes > len(data):
+            return
+        yield data[i], data[i + 1:i + 1 + nbytes]
+        i += 1 + nbytes
+
+
+def decode_response(text):
+    """`{feature: value}` from one mode-01 answer (spaces, headers off; one line per ECU)."""
+    values = {}
+    for line in text.replace(" ", "").split("\r"):
+        if not line.startswith("41"):
+            continue
+        for pid, raw in _fields(line):
+            feature, (_, _, decode, *_) = BY_PID[pid]
+            values[feature] = float(decode(int.from_bytes(raw, "big")))
+    return values
+
+
+def decode_vin(text):
+    """VIN from a mode 09 PID 02 answer (one line or a multi-frame listing)."""
+    chars = ""
+    for line in text.replace(" ", "").split("\r"):
+        if ":" in line:
+            line = line.split(":", 1)[1]  # "0: 49 02 01 ..." multi-frame form
+        if line.startswith("4902"):
+            line = line[6:]
+        try:
+            chars += bytes.fromhex(line[:len(line) - len(line) % 2]).decode("ascii", "ignore")
+        except ValueError:
+            continue
+    chars = "".join(c for c in chars if c.isalnum())
+    return chars[-17:] if len(chars) >= 17 else None
+
+
+def _reply_pids(answer):
+    """PIDs carried by a mode-01 answer, or None if it has no mode-01 data ("NO DATA", "OK", "?")."""
+    lines = [line for line in answer.replace(" ", "").split("\r") if line.startswith("41")]
+    return {pid for line in lines for pid, _ in _fields(line)} if lines else None
+
+
+def _answers(cmd, answer):
+    """
+    Whether `answer` can be the reply to `cmd`: every PID in a mode-01
+    reply must have been requested, in any order ("410D..0C.." for
+    "01040C0D"; ECUs leave out PIDs they do not support). Replies without
+    data ("NO DATA", "?") and non-mode-01 commands match anything.
+    """
+    if not cmd.startswith("01"):
+        return True
+    replied = _reply_pids(answer)
+    return replied is None or replied <= {int(cmd[i:i + 2], 16) for i in range(2, len(cmd) - 1, 2)}
+
+
+class OBDPoller:
+    """
+    Polls `PIDS` over the serial device at `port` on an asyncio loop.
+    `periods` overrides per-feature periods (0 = as often as possible, so
+    equal zeros degrade to round-robin).
+    """
+
+    def __init__(self, port, periods=None, max_pids=MAX_PIDS_PER_REQUEST, depth=1, timeout_s=2.0,
+                 baud=38400, stale_s=3.0):
+        self.port      = port
+        self.periods   = {f: spec[4] for f, spec in PIDS.items()} | (periods or {})
+        self.max_pids  = max(1, min(max_pids, MAX_PIDS_PER_REQUEST))
+        self.depth     = max(1, depth)
+        self.timeout_s = timeout_s
+        self.baud      = baud
+        self.stale_s   = stale_s
+        self.vin       = None
+        fastest        = min(self.periods.values())
+        self.fast      = [f for f in FEATURE_NAMES if self.periods[f] == fastest]
+
+        self.latest      = {}   # feature → (value, monotonic time received)
+        self.unsupported = set()
+        self._fd         = None
+        self._buf        = bytearray()
+        self._skip       = False    # discard up to the next prompt (tail of a timed-out answer)
+        self._waiting    = deque()  # (future, command), answered in send order
+        self._expired    = deque(maxlen=8)  # recently timed-out mode-01 commands
+        self._due        = {f: 0.0 for f in FEATURE_NAMES}
+        self._in_flight  = set()
+        self._misses     = {f: 0 for f in FEATURE_NAMES}
+        self._slots      = None
+        self._stop       = None
+
+        self.requests    = 0
+        self.timeouts    = 0
+        self.discarded   = 0
+        self.stale       = 0
+        self.samples     = {f: 0 for f in FEATURE_NAMES}
+        self._age_sum    = {f: 0.0 for f in FEATURE_NAMES}
+        self._age_max    = {f: 0.0 for f in FEATURE_NAMES}
+        self.snapshots   = 0
+        self._started    = None
+
+    # ─── Link ──────────────────────────────────────────────────────────────
+    def _open(self):
+        fd = os.open(self.port, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+        tty.setraw(fd)
+        attrs = termios.tcgetattr(fd)
+        speed = getattr(termios, f"B{self.baud}", None)
+        if speed is not None:
+            attrs[4] = attrs[5] = speed
+            termios.tcsetattr(fd, termios.TCSANOW, attrs)
+        termios.tcflush(fd, termios.TCIFLUSH)  # leftovers from an earlier session
+        return fd
+
+    def _on_readable(self):
+        try:
+            chunk = os.read(self._fd, 4096)
+        except BlockingIOError:
+            return
+        self._buf += chunk
+        while b">" in self._buf:
+            answer, _, rest = self._buf.partition(b">")
+            self._buf = bytearray(rest)
+            if self._skip:
+                self._skip = False
+                self.discarded += 1
+                continue
+            answer  = answer.decode("ascii", "ignore").strip("\r\n \0")
+            replied = _reply_pids(answer)
+            # a request whose supported PIDs are exactly the reply's wins over an
+            # earlier one it is only a subset of; a late answer to a request that
+            # timed out carries exactly that request's PIDs
+            match = next((i for i, (_, cmd) in enumerate(self._waiting) if self._expects(cmd, replied)), None)
+            late  = next((cmd for cmd in self._expired if self._expects(cmd, replied)), None)
+            if match is None and late is not None:
+                self._expired.remove(late)
+                self.discarded += 1
+                continue
+            if match is None:
+                match = next((i for i, (_, cmd) in enumerate(self._waiting) if _answers(cmd, answer)), None)
+            if match is None:
+                self.discarded += 1  # late answer to a request that already timed out
+                continue
+            for i in range(match + 1):  # requests queued ahead of the match lost their answers
+                fut, _ = self._waiting.popleft()
+                if not fut.done():
+                    fut.set_result(answer if i == match else "")
+                    self.timeouts += i < match
+
+    def _expects(self, cmd, replied):
+        """Whether `replied` is exactly the PIDs of `cmd` that are not known to be unsupported."""
+        if not replied or not cmd.startswith("01"):
+            return False
+        requested = {int(cmd[i:i + 2], 16) for i in range(2, len(cmd) - 1, 2)}
+        return requested - {PIDS[f][0] for f in self.unsupported} == replied
+
+    async def _send(self, cmd):
+        fut   = asyncio.get_running_loop().create_future()
+        entry = (fut, cmd)
+        self._waiting.append(entry)
+        data = (cmd + "\r").encode()
+        while data:
+            try:
+                data = data[os.write(self._fd, data):]
+            except BlockingIOError:
+                await asyncio.sleep(0.001)
+        self.requests += 1
+        try:
+            return await asyncio.wait_for(fut, self.timeout_s)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            try:
+                self._waiting.remove(entry)
+            except ValueError:
+                pass
+            if cmd.startswith("01"):
+                self._expired.append(cmd)
+            if self._buf:  # part of an answer is in: drop it and resync on the next prompt
+                self._buf.clear()
+                self._skip = True
+            return ""
+
+    async def command(self, cmd):
+        """Send one command and wait for its answer (up to the `>` prompt)."""
+        async with self._slots:
+            return await self._send(cmd)
+
+    async def connect(self):
+        loop = asyncio.get_running_loop()
+        self._fd    = self._open()
+        self._slots = asyncio.Semaphore(1)  # AT setup strictly one at a time
+        self._stop  = asyncio.Event()
+        loop.add_reader(self._fd, self._on_readable)
+        for cmd in INIT_COMMANDS:
+            await self.command(cmd)
+        self.vin    = decode_vin(await self.command("0902"))
+        self._slots = asyncio.Semaphore(self.depth)
+        self._started = time.monotonic()
+        return self
+
+    def close(self):
+        if self._stop:
+            self._stop.set()
+        while self._waiting:  # no answers are coming; release the request slots now
+            fut, _ = self._waiting.popleft()
+            if not fut.done():
+                fut.set_result("")
+        if self._fd is not None:
+            asyncio.get_running_loop().remove_reader(self._fd)
+            os.close(self._fd)
+            self._fd = None
+
+    # ─── Scheduling ────────────────────────────────────────────────────────
+    def _pick(self, now):
+        """Up to `max_pids` due PIDs, most overdue (relative to period) first."""
+        due = [f for f, t in self._due.items()
+               if t <= now and f not in self._in_flight and f not in self.unsupported]
+        due.sort(key=lambda f: (self._due[f] - now) / max(self.periods[f], 1e-3))
+        return due[:self.max_pids]
+
+    async def _request(self, features):
+        try:
+            answer = await self._send("01" + "".join(f"{PIDS[f][0]:02X}" for f in features))
+        finally:
+            self._slots.release()
+        now    = time.monotonic()
+        values = decode_response(answer)
+        for f in features:
+            self._in_flight.discard(f)
+            if f in values:
+                self.latest[f] = (values[f], now)
+                self.samples[f] += 1
+                self._misses[f] = 0
+            elif answer:
+                self._misses[f] += 1
+                if self._misses[f] >= 3:
+                    self.unsupported.add(f)
+                    print(f"⚠️  ECU does not report {f}; using {PIDS[f][5]}")
+
+    async def poll(self):
+        """Run the scheduler until `close()`; PIDs are picked only once a request slot is free."""
+        tasks = set()
+        while not self._stop.is_set():
+            await self._slots.acquire()
+            now  = time.monotonic()
+            pick = self._pick(now)
+            if not pick:
+                self._slots.release()
+                pending = [t for f, t in self._due.items() if f not in self._in_flight and f not in self.unsupported]
+                try:
+                    await asyncio.wait_for(self._stop.wait(), max(min(pending, default=now + 0.01) - now, 0.0005))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            for f in pick:
+                self._due[f] = now + self.periods[f]
+                self._in_flight.add(f)
+            task = asyncio.ensure_future(self._request(pick))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        for task in list(tasks):
+            task.cancel()
+
+    # ─── Readings ──────────────────────────────────────────────────────────
+    def ready(self):
+        return all(f in self.latest or f in self.unsupported for f in FEATURE_NAMES)
+
+    def stalled(self):
+        """Fast PIDs not refreshed for `stale_s` (an empty list while the link is healthy)."""
+        now = time.monotonic()
+        return [f for f in self.fast
+                if f not in self.unsupported and now - self.latest.get(f, (None, 0.0))[1] > self.stale_s]
+
+    def snapshot(self):
+        """A reading dict from the latest value of every PID (fallbacks for unsupported ones)."""
+        now, reading = time.monotonic(), {"timestamp": datetime.utcnow().isoformat()}
+        for f in FEATURE_NAMES:
+            if f in self.latest:
+                value, at = self.latest[f]
+                age = now - at
+                self._age_sum[f] += age
+                self._age_max[f]  = max(self._age_max[f], age)
+            else:
+                value = PIDS[f][5]
+            reading[f] = value
+        reading["vin"] = self.vin or "UNKNOWN_VIN"
+        self.snapshots += 1
+        return reading
+
+    async def readings(self, interval_s=1.0, limit=None):
+        """
+        Connect, poll in the background, and yield a snapshot every
+        `interval_s`; intervals in which the link is stalled are skipped.
+        """
+        if self._fd is None:
+            await self.connect()
+        poller = asyncio.ensure_future(self.poll())
+        try:
+            while not self.ready():
+                await asyncio.sleep(0.01)
+            next_t, warned = time.monotonic(), False
+            while limit is None or self.snapshots + self.stale < limit:
+                stalled = self.stalled()
+                if stalled:
+                    self.stale += 1
+                    if not warned:
+                        print(f"⚠️  No fresh {', '.join(stalled)} for {self.stale_s:g}s; holding readings")
+                    warned = True
+                else:
+                    warned = False
+                    yield self.snapshot()
+                next_t += interval_s
+                await asyncio.sleep(max(0.0, next_t - time.monotonic()))
+        finally:
+            self.close()
+            await poller
+
+    def stats(self):
+        elapsed = time.monotonic() - self._started if self._started else 0.0
+        samples = sum(self.samples.values())
+        return {
+            "elapsed_s":     round(elapsed, 2),
+            "requests_s":    round(self.requests / elapsed, 1) if elapsed else 0.0,
+            "samples_s":     round(samples / elapsed, 1) if elapsed else 0.0,
+            "timeouts":      self.timeouts,
+            "discarded":     self.discarded,
+            "stale":         self.stale,
+            "unsupported":   sorted(self.unsupported),
+            "rate_hz":       {f: round(n / elapsed, 2) if elapsed else 0.0 for f, n in self.samples.items()},
+            "mean_age_ms":   {f: round(self._age_sum[f] / self.snapshots * 1e3, 1) if self.snapshots else None
+                              for f in FEATURE_NAMES},
+            "max_age_ms":    {f: round(self._age_max[f] * 1e3, 1) for f in FEATURE_NAMES},
+        }
+
+
+def stream_obd_readings(port, interval_s=1.0, **kwargs):
+    """Synchronous generator over `OBDPoller.readings()`, run on its own event-loop thread."""
+    q, poller = queue.Queue(maxsize=64), OBDPoller(port, **kwargs)
+
+    async def pump():
+        async for reading in poller.readings(interval_s):
+            try:
+                q.put_nowait(reading)
+            except queue.Full:
+                pass  # the consumer is behind; newer snapshots follow
+
+    def run():
+        try:
+            asyncio.run(pump())
+        except BaseException as e:
+            q.put(e)
+
+    threading.Thread(target=run, name="obd-poller", daemon=True).start()
+    while True:
+        item = q.get()
+        if isinstance(item, BaseException):
+            raise item
+        yield item
@@ -0,0 +1,249 @@
+# outbox.py
+
+import json
+import os
+import random
+import threading
+import time
+
+
+class Outbox:
+    """
+    Durable, append-only log of planned side effects.
+
+    Every reading becomes a job under an idempotency key (its token ID) with
+    an ordered list of steps. Each completed step is appended with its
+    result, so after a crash or a network outage the job resumes at the
+    first step that has not been recorded. Records are JSON lines:
+
+        {"op": "job",  "key": K, "steps": [...], "payload": {...}}
+        {"op": "done", "key": K, "step": S, "result": {...}}
+
+    A key is "claimed" while something (the live pipeline or the replayer)
+    is working on it, so the two never run the same job concurrently.
+    """
+
+    def __init__(self, path, fsync=True):
+        self.path  = path
+        self.fsync = fsync
+        self.jobs  = {}
+        self._lock = threading.Lock()
+        self._file = None
+        self._completed_since_compact = 0
+
+    # ─── Persistence ───────────────────────────────────────────────────────
+    def open(self):
+        """Replay the log and keep only jobs that still have work left."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._lock:
+            self.jobs = {}
+            if os.path.exists(self.path):
+                with open(self.path, "r") as f:
+                    for line in f:
+                        try:
+                            rec = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue  # torn final write
+                        self._apply(rec)
+            self.jobs = {k: j for k, j in self.jobs.items() if not self._finished(j)}
+            self._rewrite()
+        return self
+
+    def _apply(self, rec):
+        key = rec.get("key")
+        if rec.get("op") == "job" and key not in self.jobs:
+            self.jobs[key] = self._new_job(key, rec["steps"], rec["payload"])
+        elif rec.get("op") == "done" and key in self.jobs:
+            self.jobs[key]["results"][rec["step"]] = rec.get("result") or {}
+
+    @staticmethod
+    def _new_job(key, steps, payload):
+        return {
+            "key": key, "steps": list(steps), "payload": payload, "results": {},
+            "attempts": 0, "next_attempt": 0.0, "claimed": False,
+        }
+
+    @staticmethod
+    def _finished(job):
+        return all(s in job["results"] for s in job["steps"])
+
+    def _write(self, rec):
+        self._file.write(json.dumps(rec, separators=(",", ":")) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def _rewrite(self):
+        """Atomically replace the log with just the unfinished jobs."""
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            for job in self.jobs.values():
+                f.write(json.dumps({"op": "job", "key": job["key"], "steps": job["steps"],
+                                    "payload": job["payload"]}, separators=(",", ":")) + "\n")
+                for step, result in job["results"].items():
+                    f.write(json.dumps({"op": "done", "key": job["key"], "step": step,
+                                        "result": result}, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        if self._file:
+            self._file.close()
+        os.replace(tmp, self.path)
+        self._file = open(self.path, "a")
+        self._completed_since_compact = 0
+
+    def compact(self):
+        with self._lock:
+            self._rewrite()
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    # ─── Jobs ──────────────────────────────────────────────────────────────
+    def enqueue(self, key, steps, payload, claim=True):
+        """Record a planned job; a key that is already present is left alone."""
+        key = str(key)
+        with self._lock:
+            if key in self.jobs:
+                return False
+            self._write({"op": "job", "key": key, "steps": list(steps), "payload": payload})
+            job = self._new_job(key, steps, payload)
+            job["claimed"] = claim
+            self.jobs[key] = job
+            return True
+
+    def complete(self, key, step, result=None):
+        """Record that `step` of `key` has taken effect."""
+        key = str(key)
+        with self._lock:
+            job = self.jobs.get(key)
+            if job is None or step in job["results"]:
+                return
+            self._write({"op": "done", "key": key, "step": step, "result": result or {}})
+            job["results"][step] = result or {}
+            if self._finished(job):
+                del self.jobs[key]
+                self._completed_since_compact += 1
+
+    def is_done(self, key, step):
+        with self._lock:
+            job = self.jobs.get(str(key))
+            return job is None or step in job["results"]
+
+    def view(self, key):
+        """Payload merged with every recorded step result, for step handlers."""
+        with self._lock:
+            job = self.jobs.get(str(key))
+            if job is None:
+                return None
+            merged = dict(job["payload"])
+            for result in job["results"].values():
+                merged.update(result)
+            return merged
+
+    def claim_due(self, limit=100):
+        """Claim up to `limit` unclaimed jobs whose retry time has come."""
+        now = time.time()
+        with self._lock:
+            due = [j for j in self.jobs.values()
+                   if not j["claimed"] and j["next_attempt"] <= now][:limit]
+            for j in due:
+                j["claimed"] = True
+            return [j["key"] for j in due]
+
+    def release(self, key, failed=False, base_delay=2.0, max_delay=300.0):
+        """
+        Give a job back after working on it. A failure bumps its attempt count
+        and backs it off exponentially (with jitter).
+        """
+        with self._lock:
+            job = self.jobs.get(str(key))
+            if job is None:
+                return
+            job["claimed"] = False
+            if failed:
+                job["attempts"] += 1
+                delay = min(max_delay, base_delay * 2 ** (job["attempts"] - 1))
+                job["next_attempt"] = time.time() + delay * random.uniform(0.5, 1.0)
+
+    def pending_count(self):
+        with self._lock:
+            return len(self.jobs)
+
+
+class Replayer:
+    """
+    Runs outbox steps, skipping any already recorded as done.
+
+    `handlers` maps step name → `fn(job_view)` returning a result dict, which
+    is recorded and merged into the job for later steps. The live pipeline
+    uses `run_step()`; the background thread uses `drain()` to catch up on
+    jobs left behind by failures or a restart.
+    """
+
+    def __init__(self, outbox, handlers, poll_s=5.0, base_delay=2.0, max_delay=300.0, compact_every=1000):
+        self.outbox        = outbox
+        self.handlers      = handlers
+        self.poll_s        = poll_s
+        self.base_delay    = base_delay
+        self.max_delay     = max_delay
+        self.compact_every = compact_every
+        self.replayed      = 0
+        self.failures      = 0
+        self._stop         = threading.Event()
+        self._thread       = None
+
+    def run_step(self, key, step, job=None):
+        """Run one step unless already done; returns the merged job view."""
+        if not self.outbox.is_done(key, step):
+            result = self.handlers[step](job if job is not None else self.outbox.view(key))
+            self.outbox.complete(key, step, result)
+            if job is not None and result:
+                job.update(result)
+        return job if job is not None else self.outbox.view(key)
+
+    def fail(self, key):
+        self.outbox.release(key, failed=True, base_delay=self.base_delay, max_delay=self.max_delay)
+
+    def finish(self, key):
+        """Release a job whose steps have all run (a no-op once it is complete)."""
+        self.outbox.release(key)
+
+    def run_job(self, key):
+        try:
+            for step in self.outbox.jobs.get(key, {}).get("steps", []):
+                self.run_step(key, step)
+        except Exception as e:
+            self.failures += 1
+            print(f"❌ Outbox replay of {key} failed: {e}")
+            self.fail(key)
+            return False
+        self.replayed += 1
+        self.finish(key)
+        return True
+
+    def drain(self, limit=100):
+        """Replay every job that is due right now; returns how many were tried."""
+        keys = self.outbox.claim_due(limit)
+        for key in keys:
+            self.run_job(key)
+        if self.outbox._completed_since_compact >= self.compact_every:
+            self.outbox.compact()
+        return len(keys)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            if not self.drain():
+                self._stop.wait(self.poll_s)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="outbox-replayer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
@@ -0,0 +1,201 @@
+# pinata_uploader.py
+
+import base64
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+PINATA_API_URL = "https://api.pinata.cloud"
+GATEWAY_URL    = "https://gateway.pinata.cloud/ipfs"
+
+
+def _js_number(x):
+    """`x` as JavaScript's `Number.prototype.toString` (and so `JSON.stringify`) writes it."""
+    if isinstance(x, int):
+        return str(x)
+    if x != x or x in (float("inf"), float("-inf")):
+        return "null"
+    if x == 0:
+        return "0"
+    sign, digits, exp = Decimal(repr(x)).normalize().as_tuple()  # shortest round-trip digits
+    s, k = "".join(map(str, digits)), len(digits)
+    n = k + exp  # position of the decimal point
+    if k <= n <= 21:
+        out = s + "0" * (n - k)
+    elif 0 < n <= 21:
+        out = s[:n] + "." + s[n:]
+    elif -6 < n <= 0:
+        out = "0." + "0" * -n + s
+    else:
+        out = s[0] + ("." + s[1:] if k > 1 else "") + f"e{'+' if n > 0 else '-'}{abs(n - 1)}"
+    return ("-" if sign else "") + out
+
+
+def _js_key_order(keys):
+    """Object keys in `JSON.stringify` order: array-index keys ascending, then insertion order."""
+    index = [k for k in keys if k.isdigit() and (k == "0" or k[0] != "0") and int(k) < 2 ** 32 - 1]
+    return sorted(index, key=int) + [k for k in keys if k not in set(index)]
+
+
+def _js_json(value):
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return _js_number(value)
+    if isinstance(value, str):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, dict):
+        keys = _js_key_order([str(k) for k in value])
+        items = {str(k): v for k, v in value.items()}
+        return "{" + ",".join(f"{json.dumps(k, ensure_ascii=False)}:{_js_json(items[k])}" for k in keys) + "}"
+    if isinstance(value, (list, tuple)):
+        return "[" + ",".join(_js_json(v) for v in value) + "]"
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def canonical_json_bytes(content):
+    """
+    `content` as UTF-8 `JSON.stringify(content)`: compact, numbers in
+    JavaScript form (12.0 → 12, 1e-07 → 1e-7, NaN → null), array-index keys
+    first. These are the exact bytes sent as `pinataContent`.
+    """
+    return _js_json(content).encode("utf-8")
+
+
+def cid_of_bytes(data):
+    """CIDv1 of one raw-codec (0x55) block, sha2-256, base32 multibase ("bafkrei…")."""
+    digest = hashlib.sha256(data).digest()
+    cid = bytes([0x01, 0x55, 0x12, len(digest)]) + digest
+    return "b" + base64.b32encode(cid).decode("ascii").lower().rstrip("=")
+
+
+def compute_cid(content):
+    """
+    Expected CIDv1 of a JSON document pinned with `cidVersion: 1`: the raw
+    block of its `canonical_json_bytes()`, valid up to the 256 KiB chunk
+    size. It is a local prediction used as the cache key; the CID Pinata
+    returns is the one used and stored, and a difference is counted in
+    `stats["cid_mismatch"]`.
+    """
+    return cid_of_bytes(canonical_json_bytes(content))
+
+
+class PinataUploader:
+    """
+    `pinJSONToIPFS` client with a pooled keep-alive Session, timeouts,
+    retries with backoff on 429/5xx, and at most `max_in_flight` concurrent
+    pins.
+
+    Every pinned document's CID is computed locally first and remembered in
+    an append-only cache file, so re-pinning the same content (e.g. an
+    outbox replay after a crash) returns the gateway URL without a request.
+    """
+
+    def __init__(self, api_key, secret_api_key, api_url=PINATA_API_URL, gateway_url=GATEWAY_URL,
+                 max_in_flight=4, timeout=(5.0, 30.0), retries=3, backoff=0.5, cache_path=None):
+        self.api_url     = api_url.rstrip("/")
+        self.gateway_url = gateway_url.rstrip("/")
+        self.timeout     = timeout
+        self.cache_path  = cache_path
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Content-Type":          "application/json",
+            "pinata_api_key":        api_key or "",
+            "pinata_secret_api_key": secret_api_key or "",
+        })
+        retry = Retry(
+            total=retries, backoff_factor=backoff,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["POST"]), raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_in_flight, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._slots    = threading.BoundedSemaphore(max_in_flight)
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="pinata")
+        self._lock     = threading.Lock()
+        self._pinned   = {}  # local CID → CID returned by Pinata
+        self.stats     = {"pinned": 0, "skipped": 0, "failed": 0, "cid_mismatch": 0}
+        self._load_cache()
+
+    # ─── CID cache ─────────────────────────────────────────────────────────
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        with open(self.cache_path, "r") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                    self._pinned[rec["cid"]] = rec["ipfs"]
+                except (json.JSONDecodeError, KeyError):
+                    continue
+
+    def _remember(self, local_cid, remote_cid):
+        with self._lock:
+            self._pinned[local_cid] = remote_cid
+            if local_cid != remote_cid:
+                self.stats["cid_mismatch"] += 1
+            if self.cache_path:
+                os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+                with open(self.cache_path, "a") as f:
+                    f.write(json.dumps({"cid": local_cid, "ipfs": remote_cid}) + "\n")
+
+    def is_pinned(self, content):
+        return compute_cid(content) in self._pinned
+
+    # ─── Pinning ───────────────────────────────────────────────────────────
+    def pin_json(self, content, name):
+        """Pin `content`, returning its gateway URL, or None on failure."""
+        local_cid = compute_cid(content)
+        with self._lock:
+            known = self._pinned.get(local_cid)
+        if known:
+            with self._lock:
+                self.stats["skipped"] += 1
+            return f"{self.gateway_url}/{known}"
+
+        # pinataContent goes out as exactly the bytes local_cid was computed from
+        body = (b'{"pinataOptions":{"cidVersion":1},"pinataMetadata":' + canonical_json_bytes({"name": name})
+                + b',"pinataContent":' + canonical_json_bytes(content) + b"}")
+        with self._slots:
+            try:
+                resp = self.session.post(
+                    f"{self.api_url}/pinning/pinJSONToIPFS",
+                    data=body, timeout=self.timeout
+                )
+            except requests.RequestException as e:
+                with self._lock:
+                    self.stats["failed"] += 1
+                print(f"❌ Pinata upload failed: {e}")
+                return None
+
+        if resp.status_code != 200:
+            with self._lock:
+                self.stats["failed"] += 1
+            print(f"❌ Pinata upload failed: {resp.status_code} {resp.text}")
+            return None
+
+        remote_cid = resp.json()["IpfsHash"]
+        self._remember(local_cid, remote_cid)
+        with self._lock:
+            self.stats["pinned"] += 1
+        return f"{self.gateway_url}/{remote_cid}"
+
+    def submit(self, content, name):
+        """Pin on the uploader's own pool; returns a Future for the URL."""
+        return self._executor.submit(self.pin_json, content, name)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.session.close()
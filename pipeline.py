@@ -0,0 +1,135 @@
+# pipeline.py
+
+import queue
+import threading
+import time
+
+_STOP = object()
+
+
+class Stage:
+    """
+    One step of a `Pipeline`: `fn(item)` run by `workers` threads.
+
+    `fn` returns the item to hand to the next stage, or None to drop it
+    (e.g. a failed upload). Each stage reads from its own bounded queue, so a
+    slow stage fills its queue and blocks the stage in front of it instead of
+    buffering without limit.
+    """
+
+    def __init__(self, name, fn, workers=1, queue_size=64):
+        self.name       = name
+        self.fn         = fn
+        self.workers    = workers
+        self.queue      = queue.Queue(maxsize=queue_size)
+        self.processed  = 0
+        self.dropped    = 0
+        self.errors     = 0
+        self.busy_s     = 0.0
+        self._lock      = threading.Lock()
+        self._threads   = []
+
+    def _record(self, elapsed, result=None, error=False):
+        with self._lock:
+            self.busy_s += elapsed
+            if error:
+                self.errors += 1
+            elif result is None:
+                self.dropped += 1
+            else:
+                self.processed += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "stage":     self.name,
+                "workers":   self.workers,
+                "queued":    self.queue.qsize(),
+                "processed": self.processed,
+                "dropped":   self.dropped,
+                "errors":    self.errors,
+                "busy_s":    round(self.busy_s, 3),
+            }
+
+
+class Pipeline:
+    """
+    Chain of `Stage`s connected by bounded queues.
+
+    `submit()` blocks when the first stage's queue is full, which is how
+    backpressure reaches the producer. `close()` drains every queued item
+    through the remaining stages before returning. With `metrics` (a
+    `metrics.Metrics`), every call is recorded under the stage's name and
+    queue depths are exported as gauges.
+    """
+
+    def __init__(self, stages, on_error=None, metrics=None):
+        self.stages   = list(stages)
+        self.on_error = on_error
+        self.metrics  = metrics
+        self._started = False
+        if metrics is not None:
+            for stage in self.stages:
+                metrics.gauge("queue_depth", stage.queue.qsize, queue=stage.name)
+
+    def start(self):
+        for i, stage in enumerate(self.stages):
+            downstream = self.stages[i + 1].queue if i + 1 < len(self.stages) else None
+            for w in range(stage.workers):
+                t = threading.Thread(
+                    target=self._work, args=(stage, downstream),
+                    name=f"{stage.name}-{w}", daemon=True
+                )
+                t.start()
+                stage._threads.append(t)
+        self._started = True
+        return self
+
+    def _work(self, stage, downstream):
+        while True:
+            item = stage.queue.get()
+            if item is _STOP:
+                return
+            t0 = time.perf_counter()
+            try:
+                result = stage.fn(item)
+            except Exception as e:
+                elapsed = time.perf_counter() - t0
+                stage._record(elapsed, error=True)
+                if self.metrics is not None:
+                    self.metrics.observe(stage.name, elapsed)
+                    self.metrics.inc("errors", stage=stage.name)
+                if self.on_error:
+                    self.on_error(stage.name, item, e)
+                continue
+            elapsed = time.perf_counter() - t0
+            stage._record(elapsed, result)
+            if self.metrics is not None:
+                self.metrics.observe(stage.name, elapsed)
+            if result is not None and downstream is not None:
+                downstream.put(result)
+
+    def submit(self, item, timeout=None):
+        """Queue an item for the first stage, blocking while it is full."""
+        if not self._started:
+            self.start()
+        self.stages[0].queue.put(item, timeout=timeout)
+
+    def close(self):
+        """Finish all queued work, stage by stage, then stop the workers."""
+        for stage in self.stages:
+            for _ in stage._threads:
+                stage.queue.put(_STOP)
+            for t in stage._threads:
+                t.join()
+            stage._threads.clear()
+        self._started = False
+
+    def stats(self):
+        return [s.stats() for s in self.stages]
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,172 @@
+# quantize_export.py
+"""
+TFLite export variants for a trained run, plus an accuracy / size / latency
+report comparing them.
+
+    float32  model.tflite        plain conversion (what main.py always used)
+    float16  model_fp16.tflite   weights stored as float16, float compute
+    int8     model_int8.tflite   full-integer: int8 weights, activations and
+                                 input/output, calibrated on training rows
+
+`classify_tensorboard.py` calls `export_variants()` and `write_report()` at
+the end of training. For an existing run:
+
+    python quantize_export.py --run logs/fit/run_1 --csv training_data.csv
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from batch_inference import BatchPredictor
+
+VARIANTS = {
+    "float32": "model.tflite",
+    "float16": "model_fp16.tflite",
+    "int8":    "model_int8.tflite",
+}
+
+
+def convert(model, variant, X_calib=None, calib_samples=500, seed=0):
+    """Convert a Keras model to TFLite bytes for one of `VARIANTS`."""
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if variant == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif variant == "int8":
+        if X_calib is None:
+            raise ValueError("int8 export needs calibration rows (scaled training features)")
+        rng  = np.random.default_rng(seed)
+        rows = X_calib[rng.choice(len(X_calib), min(calib_samples, len(X_calib)), replace=False)]
+
+        def representative_dataset():
+            for row in rows:
+                yield [row.reshape(1, -1).astype(np.float32)]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type  = tf.int8
+        converter.inference_output_type = tf.int8
+    elif variant != "float32":
+        raise ValueError(f"unknown TFLite variant: {variant}")
+    return converter.convert()
+
+
+def export_variants(model, log_dir, X_calib, variants=tuple(VARIANTS)):
+    """Write every requested variant into `log_dir`; returns {variant: path}."""
+    paths = {}
+    for variant in variants:
+        path = os.path.join(log_dir, VARIANTS[variant])
+        with open(path, "wb") as f:
+            f.write(convert(model, variant, X_calib))
+        print(f"✅ Saved {variant} TFLite model to {path}")
+        paths[variant] = path
+    return paths
+
+
+# ─── Evaluation ─────────────────────────────────────────────────────────────
+def _latency_us(predictor, X, batch_size, repeats=3):
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for start in range(0, len(X), batch_size):
+            predictor.predict_scaled(X[start:start + batch_size])
+        best = min(best, time.perf_counter() - t0)
+    return best / len(X) * 1e6
+
+
+def evaluate_variant(path, X_test, y_test_idx, fault_codes, batch_size=64, latency_rows=1000):
+    """Accuracy (overall + per class), file size and µs/row for one .tflite file."""
+    interpreter = tf.lite.Interpreter(model_path=path)
+    interpreter.allocate_tensors()
+    predictor = BatchPredictor(interpreter, None, fault_codes, max_batch_size=batch_size)
+
+    X_test = np.asarray(X_test, dtype=np.float32)
+    pred   = predictor.predict_scaled(X_test).argmax(axis=1)
+    per_class = {}
+    for i, code in enumerate(fault_codes):
+        mask = y_test_idx == i
+        per_class[code] = float((pred[mask] == i).mean()) if mask.any() else None
+
+    X_lat = X_test[:latency_rows]
+    predictor.predict_scaled(X_lat[:batch_size])  # warm-up / allocate bucket
+    return {
+        "size_bytes":        os.path.getsize(path),
+        "accuracy":          float((pred == y_test_idx).mean()),
+        "per_class":         per_class,
+        "us_per_row_single": _latency_us(predictor, X_lat, 1),
+        "us_per_row_batch":  _latency_us(predictor, X_lat, batch_size),
+        "batch_size":        batch_size,
+    }
+
+
+def write_report(log_dir, paths, X_test, y_test_idx, fault_codes):
+    """Evaluate each exported variant and write quant_report.{json,md} next to them."""
+    results = {v: evaluate_variant(p, X_test, y_test_idx, fault_codes) for v, p in paths.items()}
+
+    with open(os.path.join(log_dir, "quant_report.json"), "w") as f:
+        json.dump(results, f, indent=2)
+
+    names = list(results)
+    lines = [
+        f"# TFLite variants ({os.path.basename(os.path.normpath(log_dir))})",
+        "",
+        "| metric | " + " | ".join(names) + " |",
+        "|---" * (len(names) + 1) + "|",
+        "| size (KiB) | " + " | ".join(f"{results[v]['size_bytes'] / 1024:.1f}" for v in names) + " |",
+        "| accuracy | " + " | ".join(f"{results[v]['accuracy']:.4f}" for v in names) + " |",
+        "| µs/row, single | " + " | ".join(f"{results[v]['us_per_row_single']:.1f}" for v in names) + " |",
+        "| µs/row, batch | " + " | ".join(f"{results[v]['us_per_row_batch']:.1f}" for v in names) + " |",
+    ]
+    for code in fault_codes:
+        cells = [results[v]["per_class"][code] for v in names]
+        lines.append(f"| acc: {code} | " + " | ".join("-" if c is None else f"{c:.4f}" for c in cells) + " |")
+    report_md = os.path.join(log_dir, "quant_report.md")
+    with open(report_md, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    print("\n".join(lines))
+    print(f"📄 Wrote {report_md}")
+    return results
+
+
+if __name__ == "__main__":
+    from batch_inference import FEATURE_NAMES
+    from model_bundle import BUNDLE_NAME, ModelBundle, build_from_run
+    from shard_dataset import ensure_shards, load_meta, sample_split
+
+    parser = argparse.ArgumentParser(description="Export TFLite variants for a run and compare them")
+    parser.add_argument("--run", default="logs/fit/run_1", help="Training run directory")
+    parser.add_argument("--csv", default="training_data.csv",
+                        help="Training data (CSV, columnar dir or shard dir); split as in training")
+    parser.add_argument("--eval-rows", type=int, default=20_000, help="Test rows in the report")
+    parser.add_argument("--variants", nargs="+", default=["float16", "int8"], choices=list(VARIANTS),
+                        help="Variants to (re)export; existing ones are still included in the report")
+    args = parser.parse_args()
+
+    bundle      = ModelBundle(os.path.join(args.run, BUNDLE_NAME))
+    scaler      = bundle.scaler
+    fault_codes = bundle.fault_codes
+    model       = tf.keras.models.load_model(os.path.join(args.run, "model.keras"), compile=False)
+
+    # Same hash split of the shards as classify_tensorboard.py, so "test"
+    # rows were never trained on.
+    shards_dir = ensure_shards(args.csv)
+    meta       = load_meta(shards_dir)
+    if meta["features"] != FEATURE_NAMES:
+        raise SystemExit(f"❌ {shards_dir} has features {meta['features']}, expected {FEATURE_NAMES}")
+    remap      = np.array([fault_codes.index(c) for c in meta["labels"]])
+    X_test, y_test = sample_split(shards_dir, "test", args.eval_rows)
+    X_test     = scaler.transform(X_test).astype(np.float32)
+    X_calib    = scaler.transform(sample_split(shards_dir, "train", 2_000)[0]).astype(np.float32)
+
+    paths = {v: os.path.join(args.run, f) for v, f in VARIANTS.items()
+             if os.path.exists(os.path.join(args.run, f))}
+    paths.update(export_variants(model, args.run, X_calib, args.variants))
+    paths = {v: paths[v] for v in VARIANTS if v in paths}
+    write_report(args.run, paths, X_test, remap[y_test], fault_codes)
+    header = build_from_run(args.run)
+    print(f"✅ Rebuilt {BUNDLE_NAME} with variants: {', '.join(header['variants'])}")
@@ -0,0 +1,403 @@
+# reading_store.py
+"""
+Embedded store on the gateway for every reading, its prediction, token ID
+and IPFS link, so history queries never go over the network and Supabase
+is fed by one background bulk job.
+
+    store = ReadingStore("logs/store/driveledger.db")
+    store.add_readings([{"vin": ..., "timestamp": ..., "fault": ..., ...}])
+    store.latest()                              # newest reading per VIN
+    store.range("2025-06-01", "2025-06-02", vin="KYADP4DZ7JHCZKEA8")
+    store.by_fault("coolant_overheat", limit=100)
+
+    python reading_store.py stats
+    python reading_store.py latest [--vin VIN]
+    python reading_store.py range  --since 2025-06-01 [--until …] [--vin …] [--fault …]
+    python reading_store.py prune  --days 30     # synced rows only
+    python reading_store.py compact
+
+SQLite in WAL mode: one writer, readers never block it. `readings` is
+indexed on (vin, ts), (fault, ts) and ts, plus a partial index on the rows
+not yet synced, so the sync job's scan stays small however long the
+history is; `vehicles` points at each VIN's newest reading. Inserts are
+keyed on `unique_id` (readings) and (vin, token_id) (tokens) and ignore
+duplicates, so an outbox replay can write the same rows again safely.
+Readings that are actually inserted also update the fleet dashboard
+aggregates (`fleet_aggregates.py`) in the same transaction.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import fleet_aggregates
+
+SCHEMA = """
+create table if not exists readings (
+    id           integer primary key,
+    ts           integer not null,          -- µs since the epoch (UTC), for range scans
+    timestamp    text    not null,          -- as sent to Supabase
+    vin          text    not null,
+    fault        text    not null,
+    confidence   real    not null,
+    sensor_data  text    not null,          -- JSON
+    unique_id    text    not null unique,   -- token ID, or "<token>:<leaf>" in batch mode
+    token_id     text,
+    ipfs_link    text,
+    synced       integer not null default 0
+);
+create index if not exists readings_vin_ts   on readings (vin, ts);
+create index if not exists readings_fault_ts on readings (fault, ts);
+create index if not exists readings_ts       on readings (ts);
+create index if not exists readings_unsynced on readings (id) where synced = 0;
+
+-- newest reading per VIN, kept current on insert, so latest() is O(vehicles)
+create table if not exists vehicles (
+    vin      text    primary key,
+    last_ts  integer not null,
+    last_id  integer not null
+);
+
+create table if not exists tokens (
+    vin        text    not null,
+    token_id   text    not null,
+    created    integer not null,            -- µs since the epoch
+    synced     integer not null default 0,
+    primary key (vin, token_id)
+);
+create index if not exists tokens_unsynced on tokens (created) where synced = 0;
+
+-- counters that outlive the rows they count, e.g. readings removed by prune()
+create table if not exists store_meta (
+    key    text    primary key,
+    value  integer not null
+);
+"""
+
+_COLUMNS = ["id", "ts", "timestamp", "vin", "fault", "confidence", "sensor_data",
+            "unique_id", "token_id", "ipfs_link", "synced"]
+
+
+def to_us(value):
+    """µs since the epoch for a datetime, an ISO / "YYYY-mm-dd HH:MM:SS" string or seconds."""
+    if isinstance(value, (int, float)):
+        return int(value * 1_000_000)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return int((value.replace(tzinfo=None) - datetime(1970, 1, 1)).total_seconds() * 1_000_000)
+
+
+def _row(values):
+    row = dict(zip(_COLUMNS, values))
+    row["sensor_data"] = json.loads(row["sensor_data"])
+    return row
+
+
+class ReadingStore:
+    """Thread-safe wrapper around one SQLite connection."""
+
+    def __init__(self, path, aggregates=True):
+        self.path       = path
+        self.aggregates = aggregates
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db   = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("pragma journal_mode = wal")
+            self._db.execute("pragma synchronous = normal")
+            self._db.executescript(SCHEMA)
+            if aggregates:
+                self._db.executescript(fleet_aggregates.SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _query(self, sql, args=()):
+        with self._lock:
+            return self._db.execute(sql, args).fetchall()
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._db.execute("begin")
+            try:
+                yield self._db
+                self._db.execute("commit")
+            except BaseException:
+                self._db.execute("rollback")
+                raise
+
+    def _write(self, sql, rows):
+        with self._transaction() as db:
+            return db.executemany(sql, rows).rowcount
+
+    # ─── Writes ────────────────────────────────────────────────────────────
+    def add_readings(self, rows, synced=False):
+        """
+        Insert readings (`vin`, `timestamp`, `fault`, `confidence`,
+        `sensor_data`, `unique_id`, optional `token_id` / `ipfs_link`) in one
+        transaction; rows whose `unique_id` exists already are skipped.
+        `synced=True` stores rows that came from Supabase. Returns the number
+        of rows inserted.
+        """
+        raw  = list(rows)
+        rows = [(to_us(r["timestamp"]), r["timestamp"], r["vin"], r["fault"], float(r["confidence"]),
+                 json.dumps(r["sensor_data"]), str(r["unique_id"]),
+                 None if r.get("token_id") is None else str(r["token_id"]), r.get("ipfs_link"), int(synced))
+                for r in raw]
+        with self._transaction() as db:
+            # one statement per row, to learn which rows were new
+            added = [(r, src) for r, src in zip(rows, raw)
+                     if db.execute("insert or ignore into readings (ts, timestamp, vin, fault, confidence, "
+                                   "sensor_data, unique_id, token_id, ipfs_link, synced) "
+                                   "values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                   r).rowcount]
+            db.executemany("insert into vehicles (vin, last_ts, last_id) select vin, ts, id from readings "
+                           "where unique_id = ? on conflict (vin) do update set "
+                           "last_ts = excluded.last_ts, last_id = excluded.last_id where excluded.last_ts >= last_ts",
+                           [(r[6],) for r, _ in added])
+            if self.aggregates:
+                fleet_aggregates.apply(db, [dict(src, ts=r[0]) for r, src in added])
+        return len(added)
+
+    def add_tokens(self, pairs):
+        """Record `(vin, token_id)` pairs."""
+        now = to_us(time.time())
+        return self._write("insert or ignore into tokens (vin, token_id, created) values (?, ?, ?)",
+                           [(vin, str(token_id), now) for vin, token_id in pairs])
+
+    # ─── Queries ───────────────────────────────────────────────────────────
+    def range(self, since=None, until=None, vin=None, fault=None, limit=None):
+        """Readings with `since <= timestamp < until`, oldest first."""
+        where, args = [], []
+        if since is not None:
+            where.append("ts >= ?")
+            args.append(to_us(since))
+        if until is not None:
+            where.append("ts < ?")
+            args.append(to_us(until))
+        if vin is not None:
+            where.append("vin = ?")
+            args.append(vin)
+        if fault is not None:
+            where.append("fault = ?")
+            args.append(fault)
+        sql = f"select {', '.join(_COLUMNS)} from readings"
+        if where:
+            sql += " where " + " and ".join(where)
+        sql += " order by ts, id"
+        if limit:
+            sql += f" limit {int(limit)}"
+        return [_row(r) for r in self._query(sql, args)]
+
+    def latest(self, vin=None):
+        """Newest reading for `vin`, or `{vin: reading}` for every VIN."""
+        cols = ", ".join(_COLUMNS)
+        if vin is not None:
+            rows = self._query(f"select {cols} from readings where vin = ? order by ts desc, id desc limit 1", (vin,))
+            return _row(rows[0]) if rows else None
+        rows = self._query(f"select {', '.join('r.' + c for c in _COLUMNS)} from vehicles v "
+                           f"join readings r on r.id = v.last_id order by v.vin")
+        return {r[3]: _row(r) for r in rows}
+
+    def by_fault(self, fault, since=None, until=None, limit=None):
+        return self.range(since, until, fault=fault, limit=limit)
+
+    def fault_counts(self, since=None):
+        sql, args = "select fault, count(*) from readings", ()
+        if since is not None:
+            sql, args = sql + " where ts >= ?", (to_us(since),)
+        return dict(self._query(sql + " group by fault order by count(*) desc", args))
+
+    def tokens(self, vin):
+        return [t for (t,) in self._query("select token_id from tokens where vin = ? order by created", (vin,))]
+
+    def token_vins(self, token_id):
+        return [v for (v,) in self._query("select vin from tokens where token_id = ? order by vin", (str(token_id),))]
+
+    def pruned(self):
+        """Readings deleted by `prune()` so far."""
+        rows = self._query("select value from store_meta where key = 'pruned_readings'")
+        return rows[0][0] if rows else 0
+
+    def stats(self):
+        (readings, first, last), = self._query("select count(*), min(timestamp), max(timestamp) from readings")
+        vins = self._query("select count(*) from vehicles")[0][0]
+        return {
+            "readings":         readings,
+            "vins":             vins,
+            "first":            first,
+            "last":             last,
+            "pruned":           self.pruned(),
+            "unsynced":         self.unsynced_count("readings"),
+            "unsynced_tokens":  self.unsynced_count("tokens"),
+            "bytes":            os.path.getsize(self.path),
+        }
+
+    # ─── Sync bookkeeping ──────────────────────────────────────────────────
+    def unsynced(self, table="readings", limit=500):
+        """Oldest rows not yet pushed to Supabase, as `(key, row)`."""
+        if table in fleet_aggregates.TABLES:
+            with self._lock:
+                return fleet_aggregates.dirty(self._db, table, limit)
+        if table == "readings":
+            rows = self._query(f"select {', '.join(_COLUMNS)} from readings where synced = 0 "
+                               f"order by id limit ?", (limit,))
+            return [(r[0], _row(r)) for r in rows]
+        rows = self._query("select rowid, vin, token_id from tokens where synced = 0 order by created limit ?",
+                           (limit,))
+        return [(rowid, {"vin": vin, "token_id": int(token_id)}) for rowid, vin, token_id in rows]
+
+    def unsynced_count(self, table="readings"):
+        if table in fleet_aggregates.TABLES:
+            with self._lock:
+                return fleet_aggregates.dirty_count(self._db, table)
+        return self._query(f"select count(*) from {table} where synced = 0")[0][0]
+
+    def mark_synced(self, table, keys):
+        if table in fleet_aggregates.TABLES:
+            with self._transaction() as db:
+                return fleet_aggregates.mark_pushed(db, table, keys)
+        key = "id" if table == "readings" else "rowid"
+        return self._write(f"update {table} set synced = 1 where {key} = ?", [(k,) for k in keys])
+
+    # ─── Retention ─────────────────────────────────────────────────────────
+    def prune(self, older_than_days, include_unsynced=False):
+        """
+        Delete readings (and token rows) older than the cutoff; unsynced ones
+        are kept by default. The fleet aggregates keep counting them, and the
+        number deleted is recorded so a local rebuild can refuse to drop them.
+        """
+        cutoff = to_us(datetime.utcnow() - timedelta(days=older_than_days))
+        keep   = "" if include_unsynced else " and synced = 1"
+        with self._transaction() as db:
+            readings = db.execute(f"delete from readings where ts < ?{keep}", (cutoff,)).rowcount
+            tokens   = db.execute(f"delete from tokens where created < ?{keep}", (cutoff,)).rowcount
+            if readings:  # re-point VINs whose newest reading was deleted
+                db.execute("delete from vehicles where last_id not in (select id from readings)")
+                db.execute("insert or ignore into vehicles (vin, last_ts, last_id) "
+                           "select vin, max(ts), id from readings group by vin")
+                db.execute("insert into store_meta (key, value) values ('pruned_readings', ?) "
+                           "on conflict (key) do update set value = value + excluded.value", (readings,))
+        return {"readings": readings, "tokens": tokens}
+
+    def compact(self):
+        """Rewrite the file without the pages freed by `prune()` and fold the WAL back in."""
+        with self._lock:
+            self._db.execute("vacuum")
+            self._db.execute("pragma wal_checkpoint(truncate)")
+            self._db.execute("pragma optimize")
+        return os.path.getsize(self.path)
+
+
+class SupabaseSync:
+    """
+    Background bulk upload of unsynced rows. `insert_fns` maps "readings"
+    and/or "tokens" to a function taking a list of row dicts (e.g.
+    `bulk_writer.supabase_upsert(...)`); `to_remote` maps a stored reading
+    to the Supabase row. Failed batches stay unsynced and are retried
+    with exponential backoff.
+    """
+
+    def __init__(self, store, insert_fns, to_remote=None, batch_size=500, interval_s=2.0, max_backoff_s=60.0):
+        self.store         = store
+        self.insert_fns    = insert_fns
+        self.to_remote     = to_remote or (lambda row: row)
+        self.batch_size    = batch_size
+        self.interval_s    = interval_s
+        self.max_backoff_s = max_backoff_s
+        self.pushed        = {table: 0 for table in insert_fns}
+        self.errors        = 0
+        self._stop         = threading.Event()
+        self._thread       = None
+
+    def sync_once(self):
+        """Push at most one batch per table; returns the number of rows pushed."""
+        pushed = 0
+        for table, insert in self.insert_fns.items():
+            batch = self.store.unsynced(table, self.batch_size)
+            if not batch:
+                continue
+            rows = [self.to_remote(row) if table == "readings" else row for _, row in batch]
+            insert(rows)
+            self.store.mark_synced(table, [key for key, _ in batch])
+            self.pushed[table] += len(batch)
+            pushed += len(batch)
+        return pushed
+
+    def drain(self):
+        """Sync until nothing is left (or a batch fails)."""
+        while self.sync_once():
+            pass
+
+    def _run(self):
+        backoff = self.interval_s
+        while not self._stop.is_set():
+            try:
+                full = self.sync_once() >= self.batch_size
+                backoff = self.interval_s
+            except Exception as e:
+                self.errors += 1
+                print(f"❌ Supabase sync failed (retrying in {backoff:.0f}s): {e}")
+                full, backoff = False, min(backoff * 2, self.max_backoff_s)
+            if not full:
+                self._stop.wait(backoff)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="supabase-sync", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, drain=True):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        if drain:
+            try:
+                self.drain()
+            except Exception as e:
+                print(f"❌ Final Supabase sync failed; rows stay queued locally: {e}")
+
+    def stats(self):
+        return {"pushed": dict(self.pushed), "errors": self.errors,
+                "backlog": {t: self.store.unsynced_count(t) for t in self.insert_fns}}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query and maintain the local reading store")
+    parser.add_argument("--db", default="logs/store/driveledger.db")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats")
+    la = sub.add_parser("latest")
+    la.add_argument("--vin")
+    ra = sub.add_parser("range")
+    ra.add_argument("--since")
+    ra.add_argument("--until")
+    ra.add_argument("--vin")
+    ra.add_argument("--fault")
+    ra.add_argument("--limit", type=int, default=50)
+    pr = sub.add_parser("prune")
+    pr.add_argument("--days", type=float, default=30.0)
+    pr.add_argument("--include-unsynced", action="store_true")
+    sub.add_parser("compact")
+    args = parser.parse_args()
+
+    store = ReadingStore(args.db)
+    if args.cmd == "stats":
+        print(json.dumps({**store.stats(), "faults": store.fault_counts()}, indent=2))
+    elif args.cmd == "latest":
+        latest = store.latest(args.vin) if args.vin else store.latest()
+        print(json.dumps(latest, indent=2, default=str))
+    elif args.cmd == "range":
+        for row in store.range(args.since, args.until, args.vin, args.fault, args.limit):
+            print(f"{row['timestamp']}  {row['vin']}  {row['fault']:18} {row['confidence']:.3f}  {row['unique_id']}")
+    elif args.cmd == "prune":
+        print(f"🧹 Deleted {store.prune(args.days, args.include_unsynced)}")
+    else:
+        print(f"✅ Compacted to {store.compact():,} bytes")
+    store.close()
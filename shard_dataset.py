@@ -0,0 +1,250 @@
+# shard_dataset.py
+"""
+Sharded binary training data for datasets larger than RAM.
+
+A shard directory holds `shard-NNNNN.bin` files of fixed-length records —
+20 float32 features followed by the label index as a float32 — plus a
+`meta.json` with the feature names, labels and per-shard row counts.
+
+    python shard_dataset.py --src training_data.csv --out data/shards
+    python shard_dataset.py --src fleet.cols        --out data/shards --rows-per-shard 2000000
+
+Each row is assigned to the train / validation / test split by a hash of
+`(shard, row)`, so every pass over the shards — the NumPy statistics pass
+and the tf.data pipelines — agrees on the split without an index file.
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from batch_inference import FEATURE_NAMES
+from generate_fake_training_data import LABELS, load_columns
+
+SHARD_LABELS   = sorted(LABELS)              # label index = position, as in fault_codes.pkl
+RECORD_FIELDS  = len(FEATURE_NAMES) + 1
+RECORD_BYTES   = RECORD_FIELDS * 4
+ROWS_PER_SHARD = 1_000_000
+READ_BLOCK     = 262_144
+SPLITS         = ("train", "validation", "test")
+
+
+# ─── Writing ─────────────────────────────────────────────────────────────────
+def _source_blocks(src, block=READ_BLOCK):
+    """Yield `(features float32 (n, 20), label idx)` blocks from a CSV or columnar dir."""
+    code_to_idx = {c: i for i, c in enumerate(SHARD_LABELS)}
+    if os.path.isdir(src):
+        cols, labels = load_columns(src)
+        remap = np.array([code_to_idx[c] for c in labels], dtype=np.float32)
+        n = len(cols["fault_code"])
+        for start in range(0, n, block):
+            X = np.column_stack([cols[c][start:start + block] for c in FEATURE_NAMES]).astype(np.float32)
+            yield X, remap[cols["fault_code"][start:start + block]]
+        return
+    for df in pd.read_csv(src, chunksize=block):
+        unknown = set(df["fault_code"].unique()) - set(code_to_idx)
+        if unknown:
+            raise ValueError(f"unknown fault codes in {src}: {sorted(unknown)}")
+        yield (df[FEATURE_NAMES].to_numpy(dtype=np.float32),
+               df["fault_code"].map(code_to_idx).to_numpy(dtype=np.float32))
+
+
+def write_shards(src, out_dir, rows_per_shard=ROWS_PER_SHARD):
+    """Stream `src` into fixed-size binary shards; returns the shard metadata."""
+    os.makedirs(out_dir, exist_ok=True)
+    rows, f = [], None
+    try:
+        for X, y in _source_blocks(src):
+            records = np.column_stack([X, y]).astype("<f4")
+            while len(records):
+                if f is None or rows[-1] == rows_per_shard:
+                    if f:
+                        f.close()
+                    f = open(os.path.join(out_dir, f"shard-{len(rows):05d}.bin"), "wb")
+                    rows.append(0)
+                take = min(rows_per_shard - rows[-1], len(records))
+                f.write(records[:take].tobytes())
+                rows[-1] += take
+                records = records[take:]
+    finally:
+        if f:
+            f.close()
+
+    meta = {
+        "features":     FEATURE_NAMES,
+        "labels":       SHARD_LABELS,
+        "record_bytes": RECORD_BYTES,
+        "shards":       [{"file": f"shard-{i:05d}.bin", "rows": n} for i, n in enumerate(rows)],
+        "source":       os.path.abspath(src),
+    }
+    with open(os.path.join(out_dir, "meta.json"), "w") as fh:
+        json.dump(meta, fh, indent=2)
+    print(f"✅ Wrote {sum(rows)} rows in {len(rows)} shard(s) to {out_dir}")
+    return meta
+
+
+def ensure_shards(src, shards_dir=None):
+    """Shard directory for `src`: `src` itself if already sharded, else a cached conversion."""
+    if os.path.isdir(src) and "record_bytes" in load_meta(src):
+        return src
+    shards_dir = shards_dir or os.path.splitext(os.path.normpath(src))[0] + ".shards"
+    meta_path  = os.path.join(shards_dir, "meta.json")
+    if not os.path.exists(meta_path) or os.path.getmtime(meta_path) < os.path.getmtime(src):
+        write_shards(src, shards_dir)
+    return shards_dir
+
+
+def load_meta(shards_dir):
+    with open(os.path.join(shards_dir, "meta.json")) as f:
+        return json.load(f)
+
+
+# ─── Splits ──────────────────────────────────────────────────────────────────
+def split_buckets(shard, rows):
+    """Deterministic bucket in [0, 100) for int64 row indices of a shard (NumPy or tf)."""
+    return ((rows * 2654435761 + shard * 40503) % 4294967291) % 100
+
+
+def split_mask(buckets, split, test_pct=20, val_pct=16):
+    """
+    Same proportions as the old in-memory path: 20% test, then 20% of the
+    remainder (16% overall) as validation.
+    """
+    if split == "test":
+        return buckets < test_pct
+    if split == "validation":
+        return (buckets >= test_pct) & (buckets < test_pct + val_pct)
+    return buckets >= test_pct + val_pct
+
+
+def _open_shard(shards_dir, shard):
+    path = os.path.join(shards_dir, shard["file"])
+    return np.memmap(path, dtype="<f4", mode="r", shape=(shard["rows"], RECORD_FIELDS))
+
+
+def streaming_stats(shards_dir, test_pct=20, val_pct=16, block=READ_BLOCK):
+    """
+    One pass over the shards: a fitted `StandardScaler` (over all rows, as
+    before), per-split row counts and the training split's label counts.
+    Means and variances are merged per block (Chan et al.) in float64.
+    """
+    meta     = load_meta(shards_dir)
+    n_labels = len(meta["labels"])
+    count, mean, m2 = 0, np.zeros(len(meta["features"])), np.zeros(len(meta["features"]))
+    split_rows   = dict.fromkeys(SPLITS, 0)
+    train_labels = np.zeros(n_labels, dtype=np.int64)
+
+    for s, shard in enumerate(meta["shards"]):
+        records = _open_shard(shards_dir, shard)
+        for start in range(0, shard["rows"], block):
+            chunk = np.asarray(records[start:start + block], dtype=np.float64)
+            X, y  = chunk[:, :-1], chunk[:, -1].astype(np.int64)
+            n_b   = len(X)
+            mean_b = X.mean(axis=0)
+            m2_b   = ((X - mean_b) ** 2).sum(axis=0)
+            delta  = mean_b - mean
+            total  = count + n_b
+            mean  += delta * n_b / total
+            m2    += m2_b + delta ** 2 * count * n_b / total
+            count  = total
+
+            buckets = split_buckets(s, np.arange(start, start + n_b))
+            for split in SPLITS:
+                mask = split_mask(buckets, split, test_pct, val_pct)
+                split_rows[split] += int(mask.sum())
+                if split == "train":
+                    train_labels += np.bincount(y[mask], minlength=n_labels)
+
+    var    = m2 / count
+    scaler = StandardScaler()
+    scaler.n_features_in_   = len(mean)
+    scaler.n_samples_seen_  = count
+    scaler.mean_            = mean
+    scaler.var_             = var
+    scaler.scale_           = np.where(var > 0, np.sqrt(var), 1.0)
+    return scaler, split_rows, train_labels
+
+
+def balanced_class_weights(label_counts):
+    """sklearn's "balanced" weights from counts; absent classes get weight 1."""
+    label_counts = np.asarray(label_counts, dtype=np.float64)
+    present = label_counts > 0
+    weights = np.ones(len(label_counts))
+    weights[present] = label_counts.sum() / (present.sum() * label_counts[present])
+    return {i: float(w) for i, w in enumerate(weights)}
+
+
+def sample_split(shards_dir, split, limit=20_000, test_pct=20, val_pct=16):
+    """First `limit` rows of a split as NumPy `(X raw, y_idx)`, read from the shards."""
+    meta = load_meta(shards_dir)
+    Xs, ys, have = [], [], 0
+    for s, shard in enumerate(meta["shards"]):
+        records = _open_shard(shards_dir, shard)
+        for start in range(0, shard["rows"], READ_BLOCK):
+            chunk = np.asarray(records[start:start + READ_BLOCK])
+            mask  = split_mask(split_buckets(s, np.arange(start, start + len(chunk))), split, test_pct, val_pct)
+            chunk = chunk[mask][:limit - have]
+            Xs.append(chunk[:, :-1])
+            ys.append(chunk[:, -1].astype(np.int64))
+            have += len(chunk)
+            if have >= limit:
+                return np.concatenate(Xs), np.concatenate(ys)
+    return np.concatenate(Xs), np.concatenate(ys)
+
+
+# ─── tf.data ─────────────────────────────────────────────────────────────────
+def make_dataset(shards_dir, split, scaler, batch_size=32, shuffle_buffer=100_000,
+                 cycle_length=4, test_pct=20, val_pct=16, seed=42, rows=None):
+    """
+    `(x_scaled, y_onehot)` batches for one split: shards are read in
+    parallel with `interleave`, rows are shuffled through a bounded buffer
+    (training only) and batches are prefetched. Pass the split's `rows`
+    (from `streaming_stats`) so Keras knows the number of steps per epoch.
+    """
+    import tensorflow as tf  # the sharding CLI above does not need TensorFlow
+
+    meta      = load_meta(shards_dir)
+    paths     = [os.path.join(shards_dir, s["file"]) for s in meta["shards"]]
+    n_classes = len(meta["labels"])
+    mean      = tf.constant(scaler.mean_, tf.float32)
+    scale     = tf.constant(scaler.scale_, tf.float32)
+    training  = split == "train"
+
+    def read_shard(shard, path):
+        rows = tf.data.FixedLengthRecordDataset(path, RECORD_BYTES, buffer_size=1 << 20)
+        return rows.enumerate().map(lambda row, rec: (shard, row, rec))
+
+    def in_split(shard, row, rec):
+        return split_mask(split_buckets(shard, row), split, test_pct, val_pct)
+
+    def decode(shard, row, rec):
+        values = tf.reshape(tf.io.decode_raw(rec, tf.float32), [-1, RECORD_FIELDS])
+        x = (values[:, :-1] - mean) / scale
+        y = tf.one_hot(tf.cast(values[:, -1], tf.int32), n_classes)
+        return x, y
+
+    files = tf.data.Dataset.from_tensor_slices((tf.range(len(paths), dtype=tf.int64), paths))
+    if training:
+        files = files.shuffle(len(paths), seed=seed, reshuffle_each_iteration=True)
+    ds = files.interleave(
+        read_shard, cycle_length=min(cycle_length, len(paths)),
+        num_parallel_calls=tf.data.AUTOTUNE, deterministic=not training,
+    ).filter(in_split)
+    if training:
+        ds = ds.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size).map(decode, num_parallel_calls=tf.data.AUTOTUNE)
+    if rows is not None:
+        ds = ds.apply(tf.data.experimental.assert_cardinality(-(-rows // batch_size)))
+    return ds.prefetch(tf.data.AUTOTUNE)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a CSV or columnar dataset into binary shards")
+    parser.add_argument("--src", required=True, help="training CSV or .cols directory")
+    parser.add_argument("--out", required=True, help="Output shard directory")
+    parser.add_argument("--rows-per-shard", type=int, default=ROWS_PER_SHARD)
+    args = parser.parse_args()
+    write_shards(args.src, args.out, args.rows_per_shard)
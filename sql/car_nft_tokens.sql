@@ -0,0 +1,31 @@
+-- car_nft_tokens: one row per minted token, keyed by (vin, token_id).
+--
+-- Replaces the read-modify-write of the comma-separated `car_nfts.nfts`
+-- string: each mint is a single constant-size INSERT, concurrent writers
+-- cannot lose each other's updates, and readers no longer split strings.
+-- Existing `car_nfts` rows are copied over with `python migrate_car_nfts.py`.
+
+create table if not exists public.car_nft_tokens (
+    vin         text        not null,
+    token_id    bigint      not null,
+    created_at  timestamptz not null default now(),
+    primary key (vin, token_id)
+);
+
+-- token_id → vin lookups (car_data.unique_id joins, /api/nft/[id]); not
+-- unique, because a fleet-wide Merkle batch token covers several VINs
+create index if not exists car_nft_tokens_token_id_idx
+    on public.car_nft_tokens (token_id);
+
+-- Comma-separated view with the old `car_nfts` shape for readers that have
+-- not moved to car_nft_tokens yet.
+create or replace view public.car_nft_lists as
+    select vin,
+           string_agg(token_id::text, ',' order by created_at, token_id) as nfts
+      from public.car_nft_tokens
+     group by vin;
+
+-- car_data rows are upserted on unique_id (the token ID) so that replaying
+-- an outbox job after a crash cannot insert the same reading twice.
+create unique index if not exists car_data_unique_id_idx
+    on public.car_data (unique_id);
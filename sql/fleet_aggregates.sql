@@ -0,0 +1,60 @@
+-- Fleet dashboard aggregates, maintained by the gateway (fleet_aggregates.py).
+--
+-- /api/fleet/overview used to download every car_data row on each request.
+-- These tables hold running sums and counts per VIN, fault, day and sensor;
+-- each gateway's sync job upserts its changed rows with that gateway's
+-- absolute totals, keyed by (gateway_id, key) so gateways never overwrite
+-- each other. The route sums across gateways and takes means itself.
+-- After `python fleet_aggregates.py rebuild` every row is pushed again and
+-- the gateway's keys that no longer exist are deleted.
+
+-- car_data rows carry the VIN and the gateway that wrote them, so
+-- `rebuild --from-supabase` can reload a gateway's pruned history. Older
+-- rows have no gateway_id until one gateway claims them (--claim-legacy).
+alter table public.car_data add column if not exists vin        text;
+alter table public.car_data add column if not exists gateway_id text;
+create index if not exists car_data_gateway_id_idx
+    on public.car_data (gateway_id, unique_id);
+
+create table if not exists public.fleet_vehicle_stats (
+    gateway_id        text             not null,
+    vin               text             not null,
+    readings          bigint           not null,
+    confidence_sum    double precision not null,
+    speed_sum         double precision not null,   -- non-zero speeds only
+    speed_n           bigint           not null,
+    fuel_rate_sum     double precision not null,   -- non-zero fuel rates only
+    fuel_rate_n       bigint           not null,
+    high_speed        bigint           not null,   -- speed > 120
+    high_fuel_rate    bigint           not null,   -- fuel_rate > 30
+    engine_issues     bigint           not null,   -- engine_load > 90 or coolant_temp > 100
+    last_timestamp    text,
+    last_fault        text,
+    last_confidence   double precision,
+    last_sensor_data  jsonb,
+    primary key (gateway_id, vin)
+);
+
+create table if not exists public.fleet_fault_stats (
+    gateway_id        text             not null,
+    fault             text             not null,
+    readings          bigint           not null,
+    confidence_sum    double precision not null,
+    primary key (gateway_id, fault)
+);
+
+create table if not exists public.fleet_daily_stats (
+    gateway_id        text             not null,
+    day               text             not null,   -- YYYY-MM-DD
+    readings          bigint           not null,
+    confidence_sum    double precision not null,
+    primary key (gateway_id, day)
+);
+
+create table if not exists public.fleet_sensor_stats (
+    gateway_id        text             not null,
+    sensor            text             not null,
+    total             double precision not null,
+    n                 bigint           not null,
+    primary key (gateway_id, sensor)
+);
@@ -0,0 +1,371 @@
+# standins.py
+"""
+Local stand-ins for the external services the pipeline talks to, for load
+tests and benchmarks that must not touch the real Supabase, Pinata or car.
+
+    python standins.py postgrest --port 54321
+    python standins.py pinata    --port 54322 --latency-ms 300
+    python standins.py elm327    --latency-ms 30          # prints a /dev/pts path
+"""
+import argparse
+import json
+import os
+import pty
+import queue
+import random
+import threading
+import time
+import tty
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from obd_poller import PIDS, encode_response
+from pinata_uploader import cid_of_bytes
+from simulate_obd import generate_reading
+
+
+class _StandIn:
+    """Runs a request handler on a background ThreadingHTTPServer."""
+
+    handler_cls = None
+
+    def __init__(self, host="127.0.0.1", port=0, latency_s=0.0):
+        self.latency_s = latency_s
+        self.requests  = 0
+        self.lock      = threading.Lock()
+        handler = type("Handler", (self.handler_cls,), {"standin": self})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    standin = None
+
+    def log_message(self, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"null")
+
+    def _send(self, status, payload=None):
+        body = b"" if payload is None else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _enter(self):
+        with self.standin.lock:
+            self.standin.requests += 1
+        if self.standin.latency_s:
+            time.sleep(self.standin.latency_s)
+
+
+# ─── PostgREST (Supabase `/rest/v1`) ────────────────────────────────────────
+class _PostgRESTHandler(_JSONHandler):
+    def _table(self):
+        path = urlparse(self.path).path
+        prefix = "/rest/v1/"
+        return path[len(prefix):] if path.startswith(prefix) else None
+
+    def do_POST(self):
+        self._enter()
+        table = self._table()
+        if not table:
+            return self._send(404, {"message": "not found"})
+        rows = self._body()
+        rows = rows if isinstance(rows, list) else [rows]
+        prefer  = self.headers.get("Prefer") or ""
+        columns = (parse_qs(urlparse(self.path).query).get("on_conflict") or [""])[0]
+        columns = [c.strip() for c in columns.split(",") if c.strip()]
+        merge   = "resolution=merge-duplicates" in prefer
+        ignore  = "resolution=ignore-duplicates" in prefer
+        with self.standin.lock:
+            stored = self.standin.tables.setdefault(table, [])
+            if columns and (merge or ignore):
+                rows = self._upsert(stored, rows, columns, merge)
+                if rows is None:
+                    return self._send(500, {
+                        "code":    "21000",
+                        "message": "ON CONFLICT DO UPDATE command cannot affect row a second time",
+                    })
+            else:
+                stored.extend(rows)
+            self.standin.inserts.append((table, len(rows)))
+        if "return=minimal" in prefer:
+            return self._send(201)
+        self._send(201, rows)
+
+    @staticmethod
+    def _upsert(stored, rows, columns, merge):
+        """
+        Insert `rows` into `stored`, resolving conflicts on `columns` like
+        PostgREST: merge updates the existing row, ignore skips the new one.
+        Returns the rows written, or None when a merge batch hits the same
+        key twice (Postgres rejects that statement as a whole).
+        """
+        key   = lambda row: tuple(json.dumps(row.get(c), sort_keys=True) for c in columns)
+        index = {key(row): i for i, row in enumerate(stored)}
+        if merge and len({key(row) for row in rows}) < len(rows):
+            return None
+        written = []
+        for row in rows:
+            i = index.get(key(row))
+            if i is None:
+                index[key(row)] = len(stored)
+                stored.append(dict(row))
+                written.append(row)
+            elif merge:
+                stored[i] = dict(stored[i], **row)
+                written.append(stored[i])
+        return written
+
+    def do_GET(self):
+        self._enter()
+        table = self._table()
+        with self.standin.lock:
+            rows = list(self.standin.tables.get(table, []))
+        self._send(200, rows)
+
+
+class PostgRESTStandIn(_StandIn):
+    """
+    Minimal PostgREST-compatible server: `POST /rest/v1/<table>` appends the
+    row(s) to an in-memory table, or upserts them on the `on_conflict`
+    columns when `Prefer: resolution=merge-duplicates|ignore-duplicates` is
+    set; `GET` returns them all. Point a client at it with
+    `create_client(standin.url, "local-key")`.
+    """
+
+    handler_cls = _PostgRESTHandler
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tables  = {}
+        self.inserts = []
+
+
+# ─── Pinata (`/pinning/pinJSONToIPFS`) ───────────────────────────────────────
+def _raw_member(text, key):
+    """The unparsed text of top-level member `key` of the JSON object in `text`, as the client sent it."""
+    decoder = json.JSONDecoder()
+    i = text.index("{") + 1
+    while True:
+        name, i = decoder.raw_decode(text, text.index('"', i))
+        i = text.index(":", i) + 1
+        while text[i] in " \t\r\n":
+            i += 1
+        _, end = decoder.raw_decode(text, i)
+        if name == key:
+            return text[i:end]
+        i = text.index(",", end) + 1
+
+
+class _PinataHandler(_JSONHandler):
+    def do_POST(self):
+        self._enter()
+        if urlparse(self.path).path != "/pinning/pinJSONToIPFS":
+            return self._send(404, {"error": "not found"})
+        if not self.headers.get("pinata_api_key"):
+            return self._send(401, {"error": "missing pinata_api_key"})
+        if random.random() < self.standin.fail_rate:
+            return self._send(503, {"error": "injected failure"})
+        raw     = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode("utf-8")
+        content = _raw_member(raw, "pinataContent").encode("utf-8")
+        cid     = cid_of_bytes(content)
+        with self.standin.lock:
+            self.standin.pins[cid] = json.loads(content)
+        self._send(200, {
+            "IpfsHash":  cid,
+            "PinSize":   len(content),
+            "Timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        })
+
+
+class PinataStandIn(_StandIn):
+    """
+    Mimics Pinata's `pinJSONToIPFS`: answers with the CIDv1 of the
+    `pinataContent` bytes exactly as the client sent them (not re-encoded
+    here, so a client whose local CID disagrees shows `cid_mismatch`) and
+    keeps pinned documents in `pins`. `fail_rate` injects 503s so retry
+    handling can be exercised.
+    """
+
+    handler_cls = _PinataHandler
+
+    def __init__(self, *args, fail_rate=0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fail_rate = fail_rate
+        self.pins      = {}
+
+
+# ─── ELM327 OBD-II adapter (pty) ─────────────────────────────────────────────
+class ELM327StandIn:
+    """
+    An ELM327 on a pseudo-terminal: open `path` like a serial port. Commands
+    are answered in order, each after `latency_s` plus `per_pid_s` per
+    requested PID, and every byte is paced at `baud` (10 bits per byte).
+    Commands written ahead are queued rather than aborting the current one.
+    Sensor values come from `source()`, refreshed every `refresh_s`. For
+    link-loss tests, `drop_every=N` swallows every Nth mode-01 answer and
+    `late_every=N` sends every Nth one `late_s` late, after the poller has
+    given up on it.
+    """
+
+    def __init__(self, latency_s=0.03, per_pid_s=0.002, baud=38400, vin="KYADP4DZ7JHCZKEA8",
+                 source=generate_reading, refresh_s=0.05, unsupported=(), drop_every=0, late_every=0,
+                 late_s=2.5):
+        self.latency_s   = latency_s
+        self.per_pid_s   = per_pid_s
+        self.baud        = baud
+        self.vin         = vin
+        self.source      = source
+        self.refresh_s   = refresh_s
+        self.unsupported = {PIDS[f][0] for f in unsupported}
+        self.drop_every  = drop_every
+        self.late_every  = late_every
+        self.late_s      = late_s
+        self.commands    = 0
+        self.dropped     = 0
+        self.late        = 0
+        self.echo        = True
+
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        self.path     = os.ttyname(self._slave)
+        self._queue   = queue.Queue()
+        self._values  = source()
+        self._fresh   = time.monotonic()
+        self._closed  = threading.Event()
+        self._threads = []
+
+    def _read_loop(self):
+        buf = b""
+        while not self._closed.is_set():
+            try:
+                chunk = os.read(self._master, 1024)
+            except OSError:
+                return
+            buf += chunk
+            while b"\r" in buf:
+                line, buf = buf.split(b"\r", 1)
+                if line.strip():
+                    self._queue.put(line.decode("ascii", "ignore").strip().upper().replace(" ", ""))
+
+    def _answer(self, cmd):
+        if cmd.startswith("AT"):
+            if cmd == "ATZ":
+                self.echo = True
+                return "\r\rELM327 v1.5"
+            if cmd in ("ATE0", "ATE1"):
+                self.echo = cmd == "ATE1"
+            return "OK"
+        if cmd == "0902":
+            return "490201" + self.vin.encode().hex().upper()
+        if not cmd.startswith("01") or len(cmd) < 4:
+            return "?"
+        pids = [int(cmd[i:i + 2], 16) for i in range(2, len(cmd) - 1, 2)]
+        time.sleep(self.per_pid_s * len(pids))
+        if time.monotonic() - self._fresh > self.refresh_s:
+            self._values, self._fresh = self.source(), time.monotonic()
+        by_pid   = {spec[0]: f for f, spec in PIDS.items()}
+        features = [by_pid[p] for p in pids if p in by_pid and p not in self.unsupported]
+        return encode_response(features, self._values) if features else "NO DATA"
+
+    def _serve_loop(self):
+        while True:
+            cmd = self._queue.get()
+            if cmd is None:
+                return
+            time.sleep(self.latency_s)
+            out = ((cmd + "\r") if self.echo else "") + self._answer(cmd) + "\r\r>"
+            self.commands += 1
+            polled = cmd.startswith("01")
+            if polled and self.drop_every and self.commands % self.drop_every == 0:
+                self.dropped += 1
+                continue
+            if polled and self.late_every and self.commands % self.late_every == 0:
+                self.late += 1
+                time.sleep(self.late_s)
+            time.sleep(len(out) * 10 / self.baud)
+            if self._closed.is_set():
+                return
+            try:
+                os.write(self._master, out.encode())
+            except OSError:
+                return
+
+    def start(self):
+        for target in (self._read_loop, self._serve_loop):
+            t = threading.Thread(target=target, name="elm327-standin", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self):
+        self._closed.set()
+        self._queue.put(None)
+        # let the serve thread finish before the fds close: their numbers get
+        # reused, and a late write would land in the next stand-in's pty
+        if self._threads:
+            self._threads[-1].join(self.latency_s + self.late_s + 1.0)
+        for fd in (self._slave, self._master):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local service stand-in")
+    parser.add_argument("service", choices=["postgrest", "pinata", "elm327"])
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency-ms", type=float, default=0.0,
+                        help="Artificial per-request latency")
+    args = parser.parse_args()
+
+    if args.service == "elm327":
+        with ELM327StandIn(latency_s=args.latency_ms / 1000) as standin:
+            print(f"🧪 ELM327 stand-in on {standin.path}")
+            try:
+                threading.Event().wait()
+            except KeyboardInterrupt:
+                pass
+        raise SystemExit
+
+    cls = {"postgrest": PostgRESTStandIn, "pinata": PinataStandIn}[args.service]
+    standin = cls(port=args.port, latency_s=args.latency_ms / 1000)
+    print(f"🧪 {args.service} stand-in listening on {standin.url}")
+    try:
+        standin.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
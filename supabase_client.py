@@ -1,16 +1,9 @@
-import os
 import json
 import hashlib
 import random
-from supabase import create_client, Client
-from dotenv import load_dotenv
 
-# Load .env file
-load_dotenv()
-
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Shared with main.py; the client is created on first query, not on import.
+from clients import supabase
 
 def generate_token_id(timestamp: str, fault: str) -> int:
     """
@@ -30,7 +23,9 @@ def upload_batch(results: list):
 
     to_upload = []
     for r in results:
-        unique_id = generate_token_id(r["timestamp"], r["fault"])
+        # Keep the minted token ID when the caller has one, so car_data rows
+        # join against car_nft_tokens; only synthesise an ID otherwise.
+        unique_id = r.get("unique_id") or generate_token_id(r["timestamp"], r["fault"])
 
         payload = {
             "timestamp": r["timestamp"],
@@ -39,6 +34,8 @@ def upload_batch(results: list):
             "sensor_data": r["sensor_data"],
             "unique_id": unique_id,  # uint256 as int
         }
+        if r.get("ipfs_link"):
+            payload["ipfs_link"] = r["ipfs_link"]
         to_upload.append(payload)
 
     response = supabase.table("car_data").insert(to_upload).execute()
@@ -49,7 +46,7 @@ def upload_batch(results: list):
         print("❌ Upload failed:", response)
 
 def upload_single(record: dict):
-    unique_id = generate_token_id(record["timestamp"], record["fault"])
+    unique_id = record.get("unique_id") or generate_token_id(record["timestamp"], record["fault"])
 
     payload = {
         "timestamp": record["timestamp"],
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Hyperparameter sweep over classify_tensorboard.train().
+
+    python sweep.py --data training_data.csv --search random --trials 12 --workers 3 --epochs 30
+
+Trials run in a process pool; each worker is pinned to its own slice of the
+CPU cores and sizes TensorFlow's thread pools to match. Every trial gets an
+atomically allocated `run_N` under the sweep directory, and the parent
+rewrites `leaderboard.csv` as trials finish, ranked by validation accuracy
+and by float32 TFLite single-row latency.
+"""
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing as mp
+import os
+import random
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from shard_dataset import ensure_shards
+
+SWEEP_BASE_DIR = "logs/sweeps"
+
+SEARCH_SPACE = {
+    "widths":        [[128, 64, 32], [256, 128, 64], [64, 32, 16], [128, 64]],
+    "dropout":       [0.2, 0.3, 0.5],
+    "gamma":         [1.0, 2.0, 3.0],
+    "alpha":         [0.25, 0.5],
+    "learning_rate": [3e-4, 1e-3, 3e-3],
+}
+
+LEADERBOARD_FIELDS = [
+    "rank_accuracy", "rank_latency", "trial", "status", "run_dir",
+    "val_accuracy", "val_balanced_accuracy", "test_accuracy",
+    "us_per_row_single", "us_per_row_batch", "epochs_run", "train_s",
+    "widths", "dropout", "gamma", "alpha", "learning_rate", "error",
+]
+
+
+def trial_grid(space, search="grid", trials=None, seed=0):
+    """Hyperparameter dicts: the full grid (optionally truncated) or a random sample of it."""
+    keys   = list(space)
+    combos = [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+    if search == "random":
+        random.Random(seed).shuffle(combos)
+    return combos[:trials] if trials else combos
+
+
+def core_slices(workers, cores=None):
+    """Split the usable cores into `workers` disjoint, near-equal slices."""
+    if cores is None:
+        cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    per = max(1, len(cores) // workers)
+    return [cores[i * per:(i + 1) * per] or cores[-per:] for i in range(workers)]
+
+
+# ─── Worker side ────────────────────────────────────────────────────────────
+def _init_worker(slots):
+    """Claim a core slice; must run before TensorFlow is imported in this process."""
+    cores = slots.get()
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    os.environ["TF_NUM_INTRAOP_THREADS"] = str(len(cores))
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+    os.environ["OMP_NUM_THREADS"]        = str(len(cores))
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+
+
+def _run_trial(trial, hparams, train_kwargs):
+    import classify_tensorboard
+
+    t0 = time.perf_counter()
+    try:
+        log_dir = classify_tensorboard.train(hparams=hparams, **train_kwargs)
+        with open(os.path.join(log_dir, "summary.json")) as f:
+            summary = json.load(f)
+        return {"trial": trial, "status": "ok", "run_dir": log_dir, "summary": summary}
+    except Exception:
+        return {"trial": trial, "status": "failed", "hparams": hparams,
+                "error": traceback.format_exc(limit=3), "elapsed_s": time.perf_counter() - t0}
+
+
+# ─── Leaderboard ────────────────────────────────────────────────────────────
+def _row(result):
+    if result["status"] != "ok":
+        return {"trial": result["trial"], "status": "failed", "error": result["error"].strip().splitlines()[-1],
+                **{k: json.dumps(v) if isinstance(v, list) else v for k, v in result["hparams"].items()}}
+    s, f32 = result["summary"], result["summary"]["tflite"].get("float32", {})
+    return {
+        "trial":                 result["trial"],
+        "status":                "ok",
+        "run_dir":               result["run_dir"],
+        "val_accuracy":          round(s["best_val_accuracy"], 4),
+        "val_balanced_accuracy": round(s["best_val_balanced_accuracy"], 4),
+        "test_accuracy":         round(f32.get("accuracy", float("nan")), 4),
+        "us_per_row_single":     round(f32.get("us_per_row_single", float("nan")), 2),
+        "us_per_row_batch":      round(f32.get("us_per_row_batch", float("nan")), 3),
+        "epochs_run":            s["epochs_run"],
+        "train_s":               s["train_s"],
+        **{k: json.dumps(v) if isinstance(v, list) else v for k, v in s["hparams"].items()},
+    }
+
+
+def write_leaderboard(path, results):
+    """Rank finished trials and atomically replace the leaderboard CSV."""
+    rows = [_row(r) for r in results]
+    ok   = [r for r in rows if r["status"] == "ok"]
+    for rank, r in enumerate(sorted(ok, key=lambda r: r["us_per_row_single"]), start=1):
+        r["rank_latency"] = rank
+    ok.sort(key=lambda r: (-r["val_accuracy"], r["us_per_row_single"]))
+    for rank, r in enumerate(ok, start=1):
+        r["rank_accuracy"] = rank
+    failed = sorted((r for r in rows if r["status"] != "ok"), key=lambda r: r["trial"])
+
+    tmp = path + ".tmp"
+    with open(tmp, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=LEADERBOARD_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(ok + failed)
+    os.replace(tmp, path)
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter sweep for the fault classifier")
+    parser.add_argument("--data", default="training_data.csv",
+                        help="Training CSV, generator .cols directory, or shard directory")
+    parser.add_argument("--search", choices=["grid", "random"], default="random")
+    parser.add_argument("--trials", type=int, default=None, help="Cap on trials (default: whole grid)")
+    parser.add_argument("--space", type=str, default=None, help="JSON file overriding SEARCH_SPACE")
+    parser.add_argument("--workers", type=int, default=2, help="Trials run in parallel")
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=0, help="Random-search sampling seed")
+    parser.add_argument("--no-tensorboard", action="store_true",
+                        help="Skip TensorBoard logging in trials (faster; no event files)")
+    args = parser.parse_args()
+
+    from classify_tensorboard import new_run_dir
+
+    space = dict(SEARCH_SPACE)
+    if args.space:
+        with open(args.space) as f:
+            space.update(json.load(f))
+    trials = trial_grid(space, args.search, args.trials, args.seed)
+
+    _, sweep_dir = new_run_dir(SWEEP_BASE_DIR, prefix="sweep_")
+    with open(os.path.join(sweep_dir, "sweep.json"), "w") as f:
+        json.dump({"args": vars(args), "space": space, "trials": trials}, f, indent=2)
+
+    # Shard once up front so trials don't race to convert the same source.
+    train_kwargs = {
+        "data":         ensure_shards(args.data),
+        "epochs":       args.epochs,
+        "batch_size":   args.batch_size,
+        "base_log_dir": sweep_dir,
+        "variants":     ("float32",),
+        "tensorboard":  not args.no_tensorboard,
+    }
+
+    workers = max(1, min(args.workers, len(trials)))
+    ctx     = mp.get_context("spawn")  # fresh interpreters: no forked TensorFlow state
+    slots   = ctx.Queue()
+    for cores in core_slices(workers):
+        slots.put(cores)
+
+    leaderboard = os.path.join(sweep_dir, "leaderboard.csv")
+    print(f"🔬 {len(trials)} trial(s) on {workers} worker(s) → {sweep_dir}")
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_worker, initargs=(slots,)) as pool:
+        futures = [pool.submit(_run_trial, i, hp, train_kwargs) for i, hp in enumerate(trials)]
+        for fut in as_completed(futures):
+            result = fut.result()
+            results.append(result)
+            write_leaderboard(leaderboard, results)
+            if result["status"] == "ok":
+                s = result["summary"]
+                print(f"✅ trial {result['trial']:>3} val_acc {s['best_val_accuracy']:.4f} "
+                      f"({len(results)}/{len(trials)})")
+            else:
+                print(f"❌ trial {result['trial']:>3} failed ({len(results)}/{len(trials)}):\n{result['error']}")
+
+    ok = write_leaderboard(leaderboard, results)
+    if ok:
+        best = ok[0]
+        print(f"🏆 best: trial {best['trial']} val_acc {best['val_accuracy']} "
+              f"({best['us_per_row_single']} µs/row) in {best['run_dir']}")
+    print(f"📄 Leaderboard: {leaderboard}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+# tests/conftest.py
+"""Run the tests from anywhere: the modules under test live in the repo root."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
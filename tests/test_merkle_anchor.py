@@ -0,0 +1,69 @@
+# tests/test_merkle_anchor.py
+"""AnchorBatcher journal replay and retry of failed windows."""
+import time
+
+from merkle_anchor import AnchorBatcher
+
+
+def _batcher(path, on_batch, **kwargs):
+    return AnchorBatcher(on_batch, journal_path=str(path), fsync=False, **kwargs)
+
+
+def test_open_windows_survive_a_crash(tmp_path):
+    path = tmp_path / "anchor.jsonl"
+    first = _batcher(path, lambda *a: None, window_s=3600, poll_s=3600)
+    for i in range(3):
+        first.add({"vin": "A", "i": i})
+    first.add({"vin": "B", "i": 9})
+    windows = {g: e[0] for g, e in first._windows.items()}
+    # crash: no close(); a new batcher reopens the windows from the journal
+    emitted = []
+    second  = _batcher(path, lambda group, records, window: emitted.append((group, window, records)),
+                       window_s=3600, poll_s=3600)
+    assert second.recovered == 4
+    second.close()
+    assert sorted(emitted) == [("A", windows["A"], [{"vin": "A", "i": i} for i in range(3)]),
+                               ("B", windows["B"], [{"vin": "B", "i": 9}])]
+    assert _batcher(path, lambda *a: None).recovered == 0
+
+
+class _Crash(BaseException):
+    """The process dying inside on_batch, before the window's close is journaled."""
+
+
+def test_window_emitted_but_not_closed_is_handed_over_again(tmp_path):
+    path  = tmp_path / "anchor.jsonl"
+    first = []
+
+    def crash(group, records, window):
+        first.append(window)
+        raise _Crash
+
+    batcher = _batcher(path, crash, max_readings=2, poll_s=3600)
+    batcher.add({"vin": "A", "i": 0})
+    try:
+        batcher.add({"vin": "A", "i": 1})
+    except _Crash:
+        pass
+    again = []
+    _batcher(path, lambda group, records, window: again.append((window, len(records)))).close()
+    assert again == [(first[0], 2)]
+
+
+def test_failed_window_is_retried(tmp_path):
+    calls = []
+
+    def on_batch(group, records, window):
+        calls.append(window)
+        if len(calls) == 1:
+            raise RuntimeError("token ID space exhausted")
+
+    batcher = _batcher(tmp_path / "anchor.jsonl", on_batch, window_s=0.05, poll_s=0.02, retry_s=0.1)
+    batcher.add({"vin": "A"})
+    deadline = time.monotonic() + 5
+    while len(calls) < 2 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    batcher.add({"vin": "B"})
+    batcher.close()
+    assert batcher.failures == 1
+    assert calls[0] == calls[1] and len(calls) == 3
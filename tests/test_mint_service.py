@@ -0,0 +1,79 @@
+# tests/test_mint_service.py
+"""
+MintService and scripts/mint_service.js against a local `npx hardhat node`:
+a real mint, a duplicate token, and recovery after the worker is killed.
+Skipped unless driverledger-deploy has its node_modules (`npm ci`).
+"""
+import os
+import re
+import socket
+import subprocess
+import time
+
+import pytest
+
+from mint_client import MintError, MintService
+
+DEPLOY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "driverledger-deploy")
+HARDHAT    = os.path.join(DEPLOY_DIR, "node_modules", ".bin", "hardhat")
+PORT       = 8545  # the `localhost` network in hardhat.config.js
+
+pytestmark = pytest.mark.skipif(not os.path.exists(HARDHAT), reason="hardhat not installed in driverledger-deploy")
+
+
+def _wait_for_port(port, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1.0).close()
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f"hardhat node did not listen on {port}")
+
+
+@pytest.fixture(scope="module")
+def contract():
+    node = subprocess.Popen([HARDHAT, "node", "--port", str(PORT)], cwd=DEPLOY_DIR,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_for_port(PORT)
+        out = subprocess.run([HARDHAT, "run", "scripts/deploy.js", "--network", "localhost"], cwd=DEPLOY_DIR,
+                             capture_output=True, text=True, check=True, timeout=300).stdout
+        yield re.search(r"deployed to: (0x[0-9a-fA-F]{40})", out).group(1)
+    finally:
+        node.terminate()
+        node.wait()
+
+
+@pytest.fixture(scope="module")
+def service(contract):
+    svc = MintService(cmd=[HARDHAT, "run", "scripts/mint_service.js", "--network", "localhost"], cwd=DEPLOY_DIR,
+                      env={**os.environ, "MINT_CONTRACT_ADDRESS": contract})
+    with svc:
+        yield svc
+
+
+def test_mint(service):
+    result = service.mint(1, "https://gateway.pinata.cloud/ipfs/cid-one").result(120)
+    assert result["tx_hash"].startswith("0x")
+    assert result["block"] > 0
+
+
+def test_duplicate_token(service):
+    service.mint(2, "https://gateway.pinata.cloud/ipfs/cid-two").result(120)
+    again = service.mint(2, "https://gateway.pinata.cloud/ipfs/cid-two").result(120)
+    assert again["already_minted"] and again["tx_hash"] is None
+    with pytest.raises(MintError, match="another URI"):
+        service.mint(2, "https://gateway.pinata.cloud/ipfs/cid-other").result(120)
+
+
+def test_recovers_after_worker_is_killed(service):
+    old = service.info["nonce"]
+    service._proc.kill()
+    deadline = time.monotonic() + 10
+    while service._proc is not None and time.monotonic() < deadline:
+        time.sleep(0.05)
+    result = service.mint(3, "https://gateway.pinata.cloud/ipfs/cid-three").result(300)
+    assert result["tx_hash"].startswith("0x")
+    assert service.info["nonce"] > old
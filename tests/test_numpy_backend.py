@@ -0,0 +1,46 @@
+# tests/test_numpy_backend.py
+"""NumPy backend parity with the TFLite model on a fixed, seeded batch."""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from batch_inference import FEATURE_NAMES
+
+RUN_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs", "fit", "run_1")
+CSV     = os.path.join(os.path.dirname(RUN_DIR), "..", "..", "training_data.csv")
+ATOL    = 1e-4
+
+
+@pytest.fixture(scope="module")
+def batch():
+    rows = pd.read_csv(CSV, usecols=FEATURE_NAMES).sample(n=512, random_state=0)
+    X    = rows[FEATURE_NAMES].to_numpy(dtype=np.float32)
+    rng  = np.random.default_rng(0)  # plus off-distribution rows around the same ranges
+    return np.vstack([X, X[:64] * rng.uniform(0.5, 1.5, size=(64, X.shape[1])).astype(np.float32)])
+
+
+def test_parity_with_tflite(batch):
+    pytest.importorskip("tensorflow")
+    from bench_numpy_backend import tflite_probs
+    from model_bundle import ModelBundle
+    from numpy_backend import NumpyPredictor
+
+    bundle   = ModelBundle(os.path.join(RUN_DIR, "model.bundle"))
+    p_tflite = tflite_probs(bundle, bundle.scaler.transform(batch))
+    p_numpy  = NumpyPredictor.load(os.path.join(RUN_DIR, "model_folded.npz")).predict_raw(batch)
+
+    assert (p_tflite.argmax(1) == p_numpy.argmax(1)).all()
+    assert np.abs(p_tflite - p_numpy).max() <= ATOL
+
+
+def test_predict_matches_predict_raw(batch):
+    from numpy_backend import NumpyPredictor
+
+    pred     = NumpyPredictor.load(os.path.join(RUN_DIR, "model_folded.npz"))
+    readings = [dict(zip(FEATURE_NAMES, map(float, row))) for row in batch[:32]]
+    probs    = pred.predict_raw(batch[:32])
+    for (fault, conf), p in zip(pred.predict(readings), probs):
+        assert fault == pred.fault_codes[p.argmax()]
+        assert conf == pytest.approx(p.max(), abs=1e-6)
@@ -0,0 +1,68 @@
+# tests/test_outbox.py
+"""Outbox replay: jobs resume at the first unrecorded step after a restart."""
+from outbox import Outbox, Replayer
+
+
+def test_replay_resumes_after_restart(tmp_path):
+    path  = str(tmp_path / "outbox.jsonl")
+    calls = []
+
+    def handler(step):
+        def run(job):
+            calls.append((step, job["n"]))
+            return {f"{step}_done": True}
+        return run
+
+    steps = {s: handler(s) for s in ("pin", "record", "mint")}
+
+    box = Outbox(path, fsync=False).open()
+    box.enqueue("7", ["pin", "record", "mint"], {"n": 7})
+    Replayer(box, steps).run_step("7", "pin")  # crash after the first step
+    box.close()
+
+    box = Outbox(path, fsync=False).open()
+    assert box.view("7") == {"n": 7, "pin_done": True}
+    replayer = Replayer(box, steps)
+    assert replayer.drain() == 1
+    assert calls == [("pin", 7), ("record", 7), ("mint", 7)]
+    assert box.pending_count() == 0
+    box.close()
+    assert Outbox(path, fsync=False).open().pending_count() == 0
+
+
+def test_failed_step_is_retried_later(tmp_path):
+    box   = Outbox(str(tmp_path / "outbox.jsonl"), fsync=False).open()
+    tries = []
+
+    def flaky(job):
+        tries.append(1)
+        if len(tries) == 1:
+            raise RuntimeError("Pinata down")
+        return {"ipfs_url": "ipfs://x"}
+
+    replayer = Replayer(box, {"pin": flaky}, base_delay=0.0, max_delay=0.0)
+    box.enqueue("1", ["pin"], {}, claim=False)
+    replayer.drain()
+    assert replayer.failures == 1 and box.pending_count() == 1
+    replayer.drain()
+    assert replayer.replayed == 1 and box.pending_count() == 0
+
+
+def test_enqueue_is_idempotent(tmp_path):
+    box = Outbox(str(tmp_path / "outbox.jsonl"), fsync=False).open()
+    assert box.enqueue("1", ["pin"], {"a": 1})
+    assert not box.enqueue("1", ["pin"], {"a": 2})
+    assert box.view("1") == {"a": 1}
+
+
+def test_torn_final_line_is_ignored(tmp_path):
+    path = tmp_path / "outbox.jsonl"
+    box  = Outbox(str(path), fsync=False).open()
+    box.enqueue("1", ["pin", "mint"], {})
+    box.complete("1", "pin", {"ipfs_url": "u"})
+    box.close()
+    with open(path, "a") as f:
+        f.write('{"op":"done","key":"1","st')
+    box = Outbox(str(path), fsync=False).open()
+    assert box.view("1") == {"ipfs_url": "u"}
+    assert not box.is_done("1", "mint")
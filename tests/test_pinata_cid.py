@@ -0,0 +1,43 @@
+# tests/test_pinata_cid.py
+"""Local CIDs: content is serialized as JSON.stringify does, and sent as hashed."""
+import json
+import shutil
+import subprocess
+
+import pytest
+
+from pinata_uploader import PinataUploader, canonical_json_bytes, compute_cid
+from standins import PinataStandIn
+
+DOC = {
+    "name": "DriveLedger reading",
+    "attributes": [{"trait_type": "speed", "value": 12.0}, {"trait_type": "rpm", "value": 812.25}],
+    "tiny": 1e-07, "huge": 1e21, "big": 123456789012345680000.0, "neg": -0.5, "zero": -0.0,
+    "nan": float("nan"), "flags": [True, False, None], "text": "ünïcode \"quoted\"\n ",
+    "b": 1, "10": "index keys go first", "2": "in numeric order", "01": "not an index",
+}
+
+
+def test_numbers_and_keys_follow_json_stringify():
+    out = canonical_json_bytes(DOC).decode()
+    assert '"value":12}' in out and '"tiny":1e-7' in out and '"huge":1e+21' in out
+    assert '"big":123456789012345680000' in out and '"zero":0' in out and '"nan":null' in out
+    assert out.startswith('{"2":"in numeric order","10":"index keys go first","name"')
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node not installed")
+def test_matches_node():
+    doc  = {k: v for k, v in DOC.items() if k != "nan"}  # NaN is not valid JSON input
+    node = subprocess.run(["node", "-e", "process.stdout.write(JSON.stringify(JSON.parse(require('fs')"
+                                         ".readFileSync(0, 'utf8'))))"],
+                          input=json.dumps(doc), capture_output=True, text=True, check=True).stdout
+    assert canonical_json_bytes(doc).decode() == node
+
+
+def test_standin_hashes_the_bytes_sent():
+    with PinataStandIn() as standin:
+        uploader = PinataUploader("key", "secret", api_url=standin.url)
+        url = uploader.pin_json(DOC, "doc")
+        uploader.close()
+    assert url.endswith(compute_cid(DOC))
+    assert uploader.stats["cid_mismatch"] == 0
@@ -0,0 +1,49 @@
+# tests/test_postgrest_standin.py
+"""PostgREST stand-in upserts: merge/ignore on `on_conflict`, as Supabase does."""
+import pytest
+from postgrest.exceptions import APIError
+from supabase import create_client
+
+from standins import PostgRESTStandIn
+
+
+def test_insert_appends():
+    with PostgRESTStandIn() as standin:
+        table = create_client(standin.url, "local-key").table("car_data")
+        table.insert({"unique_id": "a"}).execute()
+        table.insert({"unique_id": "a"}).execute()
+        assert len(standin.tables["car_data"]) == 2
+
+
+def test_ignore_duplicates_keeps_first_row():
+    with PostgRESTStandIn() as standin:
+        table = create_client(standin.url, "local-key").table("car_nft_tokens")
+        rows  = [{"vin": "V1", "token_id": 1, "uri": "a"}, {"vin": "V1", "token_id": 2, "uri": "b"}]
+        table.upsert(rows, on_conflict="vin,token_id", ignore_duplicates=True).execute()
+        resp = table.upsert([{"vin": "V1", "token_id": 1, "uri": "c"}, {"vin": "V2", "token_id": 1, "uri": "d"}],
+                            on_conflict="vin,token_id", ignore_duplicates=True).execute()
+        assert resp.data == [{"vin": "V2", "token_id": 1, "uri": "d"}]
+        assert [r["uri"] for r in standin.tables["car_nft_tokens"]] == ["a", "b", "d"]
+
+
+def test_merge_duplicates_updates_row():
+    with PostgRESTStandIn() as standin:
+        table = create_client(standin.url, "local-key").table("fleet_fault_stats")
+        table.upsert({"gateway_id": "g1", "fault": "none", "count": 3, "first": 1},
+                     on_conflict="gateway_id,fault").execute()
+        table.upsert({"gateway_id": "g1", "fault": "none", "count": 5},
+                     on_conflict="gateway_id,fault").execute()
+        table.upsert({"gateway_id": "g2", "fault": "none", "count": 1},
+                     on_conflict="gateway_id,fault").execute()
+        assert standin.tables["fleet_fault_stats"] == [
+            {"gateway_id": "g1", "fault": "none", "count": 5, "first": 1},
+            {"gateway_id": "g2", "fault": "none", "count": 1},
+        ]
+
+
+def test_merge_rejects_same_key_twice_in_one_batch():
+    with PostgRESTStandIn() as standin:
+        table = create_client(standin.url, "local-key").table("car_data")
+        with pytest.raises(APIError):
+            table.upsert([{"unique_id": "a"}, {"unique_id": "a"}], on_conflict="unique_id").execute()
+        assert standin.tables["car_data"] == []
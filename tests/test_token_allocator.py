@@ -0,0 +1,49 @@
+# tests/test_token_allocator.py
+"""TokenAllocator journal recovery and per-gateway slots."""
+from token_allocator import TokenAllocator
+
+
+def _allocator(tmp_path, **kwargs):
+    return TokenAllocator(str(tmp_path / "used_ids.json"), fsync=False, **kwargs).load()
+
+
+def test_restart_without_compact_never_repeats(tmp_path):
+    ids = []
+    for _ in range(3):  # each run crashes mid-block: no compact(), no close()
+        a = _allocator(tmp_path, reserve_size=8)
+        ids += [a.allocate() for _ in range(13)]
+    assert len(set(ids)) == len(ids)
+
+
+def test_torn_journal_line_is_ignored(tmp_path):
+    a   = _allocator(tmp_path, reserve_size=4)
+    ids = [a.allocate() for _ in range(3)]
+    a.close()
+    with open(tmp_path / "used_ids.journal", "a") as f:
+        f.write("A 1")  # no newline: a write cut short by a crash
+    b = _allocator(tmp_path, reserve_size=4)
+    assert b.allocate() not in ids
+
+
+def test_compact_keeps_used_ids(tmp_path):
+    a   = _allocator(tmp_path, reserve_size=4)
+    ids = [a.allocate() for _ in range(6)]
+    a.compact()
+    a.close()
+    b = _allocator(tmp_path, reserve_size=4)
+    assert b.used >= set(ids)
+    assert b.allocate() not in ids
+
+
+def test_seeded_ids_are_skipped(tmp_path):
+    a = TokenAllocator(str(tmp_path / "used_ids.json"), fsync=False).load(extra_used=[0, 1, 2])
+    assert a.allocate() == 3
+
+
+def test_slots_are_disjoint(tmp_path):
+    a = TokenAllocator(str(tmp_path / "a.json"), fsync=False, reserve_size=5, slot=0, slots=2).load()
+    b = TokenAllocator(str(tmp_path / "b.json"), fsync=False, reserve_size=5, slot=1, slots=2).load()
+    ids_a = {a.allocate() for _ in range(30)}
+    ids_b = {b.allocate() for _ in range(30)}
+    assert not ids_a & ids_b
+    assert all(i % 2 == 0 for i in ids_a) and all(i % 2 == 1 for i in ids_b)
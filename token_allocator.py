@@ -0,0 +1,154 @@
+# token_allocator.py
+
+import json
+import os
+import threading
+from collections import deque
+
+
+class TokenAllocator:
+    """
+    Collision-free token ID allocator with an append-only journal.
+
+    State is loaded once (snapshot JSON + journal replay + any IDs passed to
+    `load()`), then kept as an in-memory set. IDs are handed out from a block
+    reserved ahead of time, so `allocate()` is a deque pop plus one journal
+    line. Journal format, one event per line:
+
+        R <start> <end>   block [start, end) reserved; next block starts at <end>
+        A <id>            <id> handed out
+
+    On restart the last reservation is replayed and its unallocated IDs are
+    reused, so nothing that was ever returned by `allocate()` is returned
+    again. `compact()` folds the journal back into the snapshot.
+
+    Several gateways minting on one contract each take a `slot` out of
+    `slots`: only IDs with `id % slots == slot` are handed out, so their ID
+    spaces never overlap without any coordination at run time.
+    """
+
+    def __init__(self, snapshot_path, journal_path=None, max_id=50_000,
+                 reserve_size=256, fsync=True, slot=0, slots=1):
+        if not 0 <= slot < slots:
+            raise ValueError(f"token slot {slot} is outside 0..{slots - 1}")
+        self.snapshot_path = snapshot_path
+        self.journal_path  = journal_path or os.path.splitext(snapshot_path)[0] + ".journal"
+        self.max_id        = max_id
+        self.reserve_size  = reserve_size
+        self.fsync         = fsync
+        self.slot          = slot
+        self.slots         = slots
+
+        self.used      = set()
+        self._cursor   = 0
+        self._reserved = deque()
+        self._journal  = None
+        self._lock     = threading.Lock()
+
+    # ─── Persistence ───────────────────────────────────────────────────────
+    def load(self, extra_used=()):
+        """Read snapshot + journal and merge `extra_used` (e.g. IDs in Supabase)."""
+        with self._lock:
+            self.used = set()
+            if os.path.exists(self.snapshot_path):
+                with open(self.snapshot_path, "r") as f:
+                    try:
+                        self.used.update(int(i) for i in json.load(f))
+                    except (json.JSONDecodeError, TypeError, ValueError):
+                        pass
+            self.used.update(int(i) for i in extra_used)
+
+            last_range = None
+            if os.path.exists(self.journal_path):
+                with open(self.journal_path, "r") as f:
+                    for line in f:
+                        parts = line.split()
+                        if len(parts) == 3 and parts[0] == "R":
+                            last_range = (int(parts[1]), int(parts[2]))
+                        elif len(parts) == 2 and parts[0] == "A":
+                            self.used.add(int(parts[1]))
+                        # anything else is a torn final write; ignore it
+
+            self._reserved.clear()
+            if last_range:
+                start, end = last_range
+                self._cursor = end
+                self._reserved.extend(i for i in range(start, end) if self._mine(i) and i not in self.used)
+            else:
+                self._cursor = 0
+
+            self._journal = open(self.journal_path, "a")
+        return self
+
+    def _append(self, line):
+        self._journal.write(line + "\n")
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+
+    def compact(self):
+        """Rewrite the snapshot with every used ID and restart the journal."""
+        with self._lock:
+            tmp = self.snapshot_path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(sorted(self.used), f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.snapshot_path)
+
+            if self._journal:
+                self._journal.close()
+            with open(self.journal_path, "w") as f:
+                start = self._reserved[0] if self._reserved else self._cursor
+                f.write(f"R {start} {self._cursor}\n")
+            self._journal = open(self.journal_path, "a")
+
+    def close(self):
+        with self._lock:
+            if self._journal:
+                self._journal.close()
+                self._journal = None
+
+    # ─── Allocation ────────────────────────────────────────────────────────
+    def _mine(self, token_id):
+        return token_id % self.slots == self.slot
+
+    def _reserve(self):
+        """Claim the next block of free IDs in this slot, wrapping once at `max_id`."""
+        for _ in range(2):
+            start = self._cursor + (self.slot - self._cursor) % self.slots
+            end   = start
+            block = []
+            while end <= self.max_id and len(block) < self.reserve_size:
+                if end not in self.used:
+                    block.append(end)
+                end += self.slots
+            if block:
+                self._append(f"R {start} {end}")
+                self._cursor = end
+                self._reserved.extend(block)
+                return
+            self._cursor = 0
+        raise RuntimeError(f"token ID space 0..{self.max_id} (slot {self.slot}/{self.slots}) exhausted")
+
+    def allocate(self):
+        """Return a token ID never returned before and not in the seeded set."""
+        with self._lock:
+            if self._journal is None:
+                raise RuntimeError("TokenAllocator.load() must be called first")
+            while True:
+                if not self._reserved:
+                    self._reserve()
+                token_id = self._reserved.popleft()
+                if token_id not in self.used:
+                    break
+            self.used.add(token_id)
+            self._append(f"A {token_id}")
+            return token_id
+
+    def mark_used(self, token_id):
+        """Record an ID claimed elsewhere so it is never handed out here."""
+        with self._lock:
+            if token_id not in self.used:
+                self.used.add(token_id)
+                self._append(f"A {token_id}")